@@ -2,13 +2,18 @@
 AI Voice Assistant Backend API
 Flask server for handling AI chat requests
 """
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 from datetime import datetime
+import atexit
+import json
 import logging
+import time
 
 from config import Config
-from services import AIService
+from services import (AdmissionController, AdmissionRejected, AIService, ContextManager,
+                      InMemoryConversationStore, LocalRouter, MetricsRegistry, RedisConversationStore,
+                      ResponseCache, SQLiteConversationStore, WarmupScheduler, connect_session_store)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -26,20 +31,96 @@ CORS(app, resources={
     }
 })
 
+# Metrics shared by the HTTP layer and the AI service
+metrics = MetricsRegistry()
+http_requests = metrics.counter(
+    'http_requests_total', 'HTTP requests by route, method and status', ['route', 'method', 'status']
+)
+http_latency = metrics.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route', ['route']
+)
+
 # Initialize AI Service
 try:
     Config.validate()
+    conversation_store = InMemoryConversationStore(
+        max_messages=Config.MAX_CONVERSATION_HISTORY,
+        max_tokens=Config.MAX_CONVERSATION_TOKENS,
+        max_conversations=Config.MAX_CONVERSATIONS,
+        idle_ttl=Config.CONVERSATION_TTL_SECONDS,
+        max_bytes=Config.MAX_HISTORY_BYTES
+    )
+    if Config.SESSION_STORE_URL:
+        conversation_store = RedisConversationStore(
+            connect_session_store(Config.SESSION_STORE_URL),
+            max_messages=Config.MAX_CONVERSATION_HISTORY,
+            max_tokens=Config.MAX_CONVERSATION_TOKENS,
+            idle_ttl=Config.CONVERSATION_TTL_SECONDS,
+            local_cache_size=Config.MAX_CONVERSATIONS
+        )
+    elif Config.CONVERSATION_DB_PATH:
+        conversation_store = SQLiteConversationStore(Config.CONVERSATION_DB_PATH, memory=conversation_store)
+        atexit.register(conversation_store.close)
     ai_service = AIService(
         api_keys=Config.GEMINI_API_KEYS,
         model=Config.GEMINI_MODEL,
         max_tokens=Config.MAX_TOKENS,
-        temperature=Config.TEMPERATURE
+        temperature=Config.TEMPERATURE,
+        timeout=Config.GEMINI_TIMEOUT_SECONDS,
+        store=conversation_store,
+        response_cache=ResponseCache(
+            max_entries=Config.RESPONSE_CACHE_SIZE,
+            ttl=Config.RESPONSE_CACHE_TTL_SECONDS,
+            path=Config.RESPONSE_CACHE_PATH
+        ) if Config.RESPONSE_CACHE_SIZE > 0 else None,
+        metrics=metrics,
+        router=LocalRouter() if Config.LOCAL_ROUTING else None,
+        context=ContextManager(
+            budget_tokens=Config.CONTEXT_TOKEN_BUDGET,
+            recent_tokens=Config.CONTEXT_RECENT_TOKENS or None
+        ) if Config.CONTEXT_TOKEN_BUDGET > 0 else None,
+        admission=AdmissionController(
+            *Config.admission_limits(),
+            queue_timeout=Config.QUEUE_TIMEOUT_SECONDS
+        ) if Config.ADMISSION_CONTROL else None
     )
+    if ai_service.response_cache:
+        atexit.register(ai_service.response_cache.save)
+    if ai_service.context:
+        atexit.register(ai_service.context.close)
     logger.info("AI Service initialized successfully")
 except Exception as e:
     logger.error(f"Failed to initialize AI Service: {e}")
     ai_service = None
 
+# Keep every API key warm in the background instead of on each page load
+warmup_scheduler = None
+if ai_service and Config.WARMUP_INTERVAL_SECONDS > 0:
+    warmup_scheduler = WarmupScheduler(ai_service, interval=Config.WARMUP_INTERVAL_SECONDS)
+    warmup_scheduler.start()
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Count and time every request by its route template"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        http_requests.inc(route, request.method, str(response.status_code))
+        http_latency.observe(time.perf_counter() - start, route)
+    return response
+
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics endpoint"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -47,17 +128,33 @@ def health_check():
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "ai_service": "ready" if ai_service else "not initialized"
+        "ai_service": "ready" if ai_service else "not initialized",
+        "conversations": ai_service.history_logs.stats() if ai_service else None,
+        "api_keys": ai_service.key_pool.stats() if ai_service else None,
+        "response_cache": ai_service.response_cache.stats() if ai_service and ai_service.response_cache else None,
+        "local_routes": ai_service.router.stats() if ai_service and ai_service.router else None,
+        "context": ai_service.context.stats() if ai_service and ai_service.context else None,
+        "admission": ai_service.admission.stats() if ai_service and ai_service.admission else None
     }), 200
 
 
 @app.route('/api/warmup', methods=['GET', 'POST', 'OPTIONS'])
 def warmup():
-    """Warmup endpoint to wake up the AI model"""
+    """
+    Warmup endpoint to wake up the AI model
+    
+    With the keep-warm scheduler running this returns immediately with the
+    current warm state (and nudges the scheduler if nothing is warm yet).
+    """
     if request.method == 'OPTIONS':
         return jsonify({}), 200
         
     try:
+        if warmup_scheduler:
+            if not warmup_scheduler.is_warm():
+                warmup_scheduler.request_run()
+            state = warmup_scheduler.status()
+            return jsonify({"success": state["warm"], "warm_state": state}), 200
         if ai_service:
             success = ai_service.warmup()
             return jsonify({"success": success}), 200
@@ -67,6 +164,17 @@ def warmup():
         return jsonify({"error": str(e)}), 500
 
 
+def too_busy(rejection):
+    """429 response for a request turned away by admission control"""
+    response = jsonify({
+        "error": "Server busy, please retry later",
+        "reason": rejection.reason,
+        "retry_after": rejection.retry_after
+    })
+    response.headers['Retry-After'] = str(rejection.retry_after)
+    return response, 429
+
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """
@@ -75,15 +183,21 @@ def chat():
     Request body:
     {
         "message": "User's message",
-        "conversation_id": "optional-session-id"
+        "conversation_id": "optional-session-id",
+        "cache": true,  # optional, false bypasses the response cache
+        "timezone": "Europe/Berlin"  # optional IANA zone for locally answered time/date
     }
     
     Response:
     {
         "response": "AI's response",
         "conversation_id": "session-id",
+        "cached": false,
+        "local": false,  # true when answered without calling Gemini
         "timestamp": "ISO timestamp"
     }
+    
+    Under overload: 429 with a Retry-After header and {"error", "reason", "retry_after"}.
     """
     try:
         # Check if AI service is available
@@ -95,11 +209,16 @@ def chat():
         # Get request data
         data = request.get_json()
         
-        if not data or 'message' not in data:
+        if not isinstance(data, dict) or 'message' not in data:
             return jsonify({
                 "error": "Missing 'message' in request body"
             }), 400
         
+        if not isinstance(data['message'], str):
+            return jsonify({
+                "error": "'message' must be a string"
+            }), 400
+        
         message = data['message'].strip()
         
         if not message:
@@ -108,20 +227,28 @@ def chat():
             }), 400
         
         conversation_id = data.get('conversation_id')
+        use_cache = bool(data.get('cache', True))
         
         logger.info(f"Processing chat request: {message[:50]}...")
         
         # Generate AI response
-        result = ai_service.generate_response(message, conversation_id)
+        result = ai_service.generate_response(
+            message, conversation_id, use_cache=use_cache, timezone=data.get('timezone')
+        )
         
         # Return response
         return jsonify({
             "response": result['response'],
             "conversation_id": result['conversation_id'],
             "model": result['model'],
+            "cached": result.get('cached', False),
+            "local": result.get('local', False),
             "timestamp": datetime.now().isoformat()
         }), 200
         
+    except AdmissionRejected as e:
+        logger.warning(f"Chat request rejected: {e}")
+        return too_busy(e)
     except Exception as e:
         logger.error(f"Error processing chat request: {e}")
         return jsonify({
@@ -130,6 +257,172 @@ def chat():
         }), 500
 
 
+def validate_batch(data):
+    """Return (requests, None) for a valid batch body, else (None, error message)."""
+    if not isinstance(data, dict) or not isinstance(data.get('requests'), list):
+        return None, "Missing 'requests' list in request body"
+    if not data['requests']:
+        return None, "Batch cannot be empty"
+    if len(data['requests']) > Config.MAX_BATCH_SIZE:
+        return None, f"Batch exceeds the limit of {Config.MAX_BATCH_SIZE} requests"
+    return data['requests'], None
+
+
+def batch_payload(results):
+    """JSON body for batch results"""
+    items = [
+        {"error": r['error'], "conversation_id": r['conversation_id']} if 'error' in r else {
+            "response": r['response'],
+            "conversation_id": r['conversation_id'],
+            "model": r['model'],
+            "cached": r.get('cached', False),
+            "local": r.get('local', False)
+        }
+        for r in results
+    ]
+    failed = sum(1 for item in items if 'error' in item)
+    return {
+        "results": items,
+        "succeeded": len(items) - failed,
+        "failed": failed,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Batch chat endpoint - run many chat messages concurrently
+    
+    Request body:
+    {
+        "requests": [
+            {"message": "User's message", "conversation_id": "optional", "cache": true, "timezone": "optional"},
+            ...
+        ]
+    }
+    
+    Response (results in request order; a failed item has "error" instead of "response"):
+    {
+        "results": [
+            {"response": "...", "conversation_id": "...", "model": "...", "cached": false, "local": false},
+            {"error": "Message cannot be empty", "conversation_id": "..."}
+        ],
+        "succeeded": 1,
+        "failed": 1,
+        "timestamp": "ISO timestamp"
+    }
+    """
+    if not ai_service:
+        return jsonify({
+            "error": "AI service not initialized. Please check API key configuration."
+        }), 503
+    
+    items, error = validate_batch(request.get_json(silent=True))
+    if error:
+        return jsonify({"error": error}), 400
+    
+    try:
+        ai_service.check_admission("batch")
+    except AdmissionRejected as e:
+        return too_busy(e)
+    
+    logger.info(f"Processing batch chat request with {len(items)} items")
+    results = ai_service.generate_batch(items, max_concurrency=Config.BATCH_CONCURRENCY or None)
+    return jsonify(batch_payload(results)), 200
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming chat endpoint - Server-Sent Events with partial AI text
+    
+    Request body: same as /api/chat
+    
+    Response (text/event-stream):
+    event: chunk   data: {"delta": "partial text", "conversation_id": "session-id"}
+    event: done    data: {"response": "full text", "conversation_id": "...", "model": "...", "timestamp": "..."}
+    event: error   data: {"error": "Failed to process request", "details": "..."}
+    """
+    if not ai_service:
+        return jsonify({
+            "error": "AI service not initialized. Please check API key configuration."
+        }), 503
+    
+    data = request.get_json()
+    
+    if not isinstance(data, dict) or 'message' not in data:
+        return jsonify({
+            "error": "Missing 'message' in request body"
+        }), 400
+    
+    if not isinstance(data['message'], str):
+        return jsonify({
+            "error": "'message' must be a string"
+        }), 400
+    
+    message = data['message'].strip()
+    
+    if not message:
+        return jsonify({
+            "error": "Message cannot be empty"
+        }), 400
+    
+    conversation_id = data.get('conversation_id')
+    use_cache = bool(data.get('cache', True))
+    timezone = data.get('timezone')
+    
+    logger.info(f"Processing streaming chat request: {message[:50]}...")
+    
+    def sse(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    
+    def event_sse(event):
+        if event.get('done'):
+            return sse('done', {
+                "response": event['response'],
+                "conversation_id": event['conversation_id'],
+                "model": event['model'],
+                "timestamp": datetime.now().isoformat()
+            })
+        return sse('chunk', event)
+    
+    # Run the stream up to its first event before responding, so a request
+    # turned away at its model call still gets a 429 (local and cached
+    # replies never are)
+    events = ai_service.generate_response_stream(message, conversation_id, use_cache, timezone)
+    first, failure = None, None
+    try:
+        first = next(events)
+    except AdmissionRejected as e:
+        return too_busy(e)
+    except Exception as e:
+        failure = e
+    
+    def generate():
+        try:
+            if failure is not None:
+                raise failure
+            yield event_sse(first)
+            for event in events:
+                yield event_sse(event)
+        except Exception as e:
+            logger.error(f"Error processing streaming chat request: {e}")
+            yield sse('error', {
+                "error": "Failed to process request",
+                "details": str(e)
+            })
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
 @app.route('/api/conversation/reset', methods=['POST'])
 def reset_conversation():
     """
@@ -0,0 +1,450 @@
+"""
+AI Voice Assistant Backend API (ASGI)
+Starlette variant of app.py for async serving, e.g.:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from datetime import datetime
+import atexit
+import json
+import logging
+import time
+
+from config import Config
+from services import (AdmissionController, AdmissionRejected, AsyncAIService, ContextManager,
+                      InMemoryConversationStore, LocalRouter, MetricsRegistry, RedisConversationStore,
+                      ResponseCache, SQLiteConversationStore, WarmupScheduler, connect_session_store)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Metrics shared by the HTTP layer and the AI service
+metrics = MetricsRegistry()
+http_requests = metrics.counter(
+    'http_requests_total', 'HTTP requests by route, method and status', ['route', 'method', 'status']
+)
+http_latency = metrics.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route', ['route']
+)
+
+# Initialize AI Service
+try:
+    Config.validate()
+    conversation_store = InMemoryConversationStore(
+        max_messages=Config.MAX_CONVERSATION_HISTORY,
+        max_tokens=Config.MAX_CONVERSATION_TOKENS,
+        max_conversations=Config.MAX_CONVERSATIONS,
+        idle_ttl=Config.CONVERSATION_TTL_SECONDS,
+        max_bytes=Config.MAX_HISTORY_BYTES
+    )
+    if Config.SESSION_STORE_URL:
+        conversation_store = RedisConversationStore(
+            connect_session_store(Config.SESSION_STORE_URL),
+            max_messages=Config.MAX_CONVERSATION_HISTORY,
+            max_tokens=Config.MAX_CONVERSATION_TOKENS,
+            idle_ttl=Config.CONVERSATION_TTL_SECONDS,
+            local_cache_size=Config.MAX_CONVERSATIONS
+        )
+    elif Config.CONVERSATION_DB_PATH:
+        conversation_store = SQLiteConversationStore(Config.CONVERSATION_DB_PATH, memory=conversation_store)
+        atexit.register(conversation_store.close)
+    ai_service = AsyncAIService(
+        api_keys=Config.GEMINI_API_KEYS,
+        model=Config.GEMINI_MODEL,
+        max_tokens=Config.MAX_TOKENS,
+        temperature=Config.TEMPERATURE,
+        timeout=Config.GEMINI_TIMEOUT_SECONDS,
+        store=conversation_store,
+        response_cache=ResponseCache(
+            max_entries=Config.RESPONSE_CACHE_SIZE,
+            ttl=Config.RESPONSE_CACHE_TTL_SECONDS,
+            path=Config.RESPONSE_CACHE_PATH
+        ) if Config.RESPONSE_CACHE_SIZE > 0 else None,
+        metrics=metrics,
+        router=LocalRouter() if Config.LOCAL_ROUTING else None,
+        context=ContextManager(
+            budget_tokens=Config.CONTEXT_TOKEN_BUDGET,
+            recent_tokens=Config.CONTEXT_RECENT_TOKENS or None
+        ) if Config.CONTEXT_TOKEN_BUDGET > 0 else None,
+        admission=AdmissionController(
+            *Config.admission_limits(),
+            queue_timeout=Config.QUEUE_TIMEOUT_SECONDS
+        ) if Config.ADMISSION_CONTROL else None
+    )
+    if ai_service.response_cache:
+        atexit.register(ai_service.response_cache.save)
+    if ai_service.context:
+        atexit.register(ai_service.context.close)
+    logger.info("Async AI Service initialized successfully")
+except Exception as e:
+    logger.error(f"Failed to initialize AI Service: {e}")
+    ai_service = None
+
+# Keep every API key warm in the background instead of on each page load
+warmup_scheduler = None
+if ai_service and Config.WARMUP_INTERVAL_SECONDS > 0:
+    warmup_scheduler = WarmupScheduler(ai_service, interval=Config.WARMUP_INTERVAL_SECONDS)
+    warmup_scheduler.start()
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting and timing every request by its route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = ["500"]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            http_requests.inc(route, scope["method"], status[0])
+            http_latency.observe(time.perf_counter() - start, route)
+
+
+async def read_json(request: Request):
+    """Parse the request body, returning None for missing/invalid JSON"""
+    try:
+        return await request.json()
+    except Exception:
+        return None
+
+
+async def metrics_endpoint(request: Request):
+    """Prometheus metrics endpoint"""
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
+
+async def health_check(request: Request):
+    """Health check endpoint"""
+    return JSONResponse({
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "ai_service": "ready" if ai_service else "not initialized",
+        "conversations": ai_service.history_logs.stats() if ai_service else None,
+        "api_keys": ai_service.key_pool.stats() if ai_service else None,
+        "response_cache": ai_service.response_cache.stats() if ai_service and ai_service.response_cache else None,
+        "local_routes": ai_service.router.stats() if ai_service and ai_service.router else None,
+        "context": ai_service.context.stats() if ai_service and ai_service.context else None,
+        "admission": ai_service.admission.stats() if ai_service and ai_service.admission else None
+    }, status_code=200)
+
+
+async def warmup(request: Request):
+    """Warmup endpoint to wake up the AI model (reports scheduler state when enabled)"""
+    if request.method == 'OPTIONS':
+        return JSONResponse({}, status_code=200)
+
+    try:
+        if warmup_scheduler:
+            if not warmup_scheduler.is_warm():
+                warmup_scheduler.request_run()
+            state = warmup_scheduler.status()
+            return JSONResponse({"success": state["warm"], "warm_state": state}, status_code=200)
+        if ai_service:
+            success = await ai_service.warmup()
+            return JSONResponse({"success": success}, status_code=200)
+        return JSONResponse({"error": "AI service not initialized"}, status_code=503)
+    except Exception as e:
+        logger.error(f"Warmup error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+def too_busy(rejection):
+    """429 response for a request turned away by admission control"""
+    return JSONResponse({
+        "error": "Server busy, please retry later",
+        "reason": rejection.reason,
+        "retry_after": rejection.retry_after
+    }, status_code=429, headers={"Retry-After": str(rejection.retry_after)})
+
+
+async def parse_chat_request(request: Request):
+    """Validate a chat request body. Returns (data, message, error_response)."""
+    if not ai_service:
+        return None, None, JSONResponse({
+            "error": "AI service not initialized. Please check API key configuration."
+        }, status_code=503)
+
+    data = await read_json(request)
+
+    if not isinstance(data, dict) or 'message' not in data:
+        return None, None, JSONResponse({
+            "error": "Missing 'message' in request body"
+        }, status_code=400)
+
+    if not isinstance(data['message'], str):
+        return None, None, JSONResponse({
+            "error": "'message' must be a string"
+        }, status_code=400)
+
+    message = data['message'].strip()
+
+    if not message:
+        return None, None, JSONResponse({
+            "error": "Message cannot be empty"
+        }, status_code=400)
+
+    return data, message, None
+
+
+async def chat(request: Request):
+    """Chat endpoint - same contract as the Flask /api/chat"""
+    try:
+        data, message, error = await parse_chat_request(request)
+        if error:
+            return error
+
+        logger.info(f"Processing chat request: {message[:50]}...")
+
+        result = await ai_service.generate_response(
+            message, data.get('conversation_id'), use_cache=bool(data.get('cache', True)),
+            timezone=data.get('timezone')
+        )
+
+        return JSONResponse({
+            "response": result['response'],
+            "conversation_id": result['conversation_id'],
+            "model": result['model'],
+            "cached": result.get('cached', False),
+            "local": result.get('local', False),
+            "timestamp": datetime.now().isoformat()
+        }, status_code=200)
+
+    except AdmissionRejected as e:
+        logger.warning(f"Chat request rejected: {e}")
+        return too_busy(e)
+    except Exception as e:
+        logger.error(f"Error processing chat request: {e}")
+        return JSONResponse({
+            "error": "Failed to process request",
+            "details": str(e)
+        }, status_code=500)
+
+
+def validate_batch(data):
+    """Return (requests, None) for a valid batch body, else (None, error message)."""
+    if not isinstance(data, dict) or not isinstance(data.get('requests'), list):
+        return None, "Missing 'requests' list in request body"
+    if not data['requests']:
+        return None, "Batch cannot be empty"
+    if len(data['requests']) > Config.MAX_BATCH_SIZE:
+        return None, f"Batch exceeds the limit of {Config.MAX_BATCH_SIZE} requests"
+    return data['requests'], None
+
+
+def batch_payload(results):
+    """JSON body for batch results"""
+    items = [
+        {"error": r['error'], "conversation_id": r['conversation_id']} if 'error' in r else {
+            "response": r['response'],
+            "conversation_id": r['conversation_id'],
+            "model": r['model'],
+            "cached": r.get('cached', False),
+            "local": r.get('local', False)
+        }
+        for r in results
+    ]
+    failed = sum(1 for item in items if 'error' in item)
+    return {
+        "results": items,
+        "succeeded": len(items) - failed,
+        "failed": failed,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+async def chat_batch(request: Request):
+    """Batch chat endpoint - same contract as the Flask /api/chat/batch"""
+    if not ai_service:
+        return JSONResponse({
+            "error": "AI service not initialized. Please check API key configuration."
+        }, status_code=503)
+
+    items, error = validate_batch(await read_json(request))
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+
+    try:
+        ai_service.check_admission("batch")
+    except AdmissionRejected as e:
+        return too_busy(e)
+
+    logger.info(f"Processing batch chat request with {len(items)} items")
+    results = await ai_service.generate_batch(items, max_concurrency=Config.BATCH_CONCURRENCY or None)
+    return JSONResponse(batch_payload(results), status_code=200)
+
+
+async def chat_stream(request: Request):
+    """Streaming chat endpoint - same SSE contract as the Flask /api/chat/stream"""
+    data, message, error = await parse_chat_request(request)
+    if error:
+        return error
+
+    conversation_id = data.get('conversation_id')
+    use_cache = bool(data.get('cache', True))
+    timezone = data.get('timezone')
+
+    logger.info(f"Processing streaming chat request: {message[:50]}...")
+
+    def sse(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    def event_sse(event):
+        if event.get('done'):
+            return sse('done', {
+                "response": event['response'],
+                "conversation_id": event['conversation_id'],
+                "model": event['model'],
+                "timestamp": datetime.now().isoformat()
+            })
+        return sse('chunk', event)
+
+    # Run the stream up to its first event before responding, so a request
+    # turned away at its model call still gets a 429 (local and cached
+    # replies never are)
+    events = ai_service.generate_response_stream(message, conversation_id, use_cache, timezone)
+    first, failure = None, None
+    try:
+        first = await events.__anext__()
+    except AdmissionRejected as e:
+        return too_busy(e)
+    except Exception as e:
+        failure = e
+
+    async def generate():
+        try:
+            if failure is not None:
+                raise failure
+            yield event_sse(first)
+            async for event in events:
+                yield event_sse(event)
+        except Exception as e:
+            logger.error(f"Error processing streaming chat request: {e}")
+            yield sse('error', {
+                "error": "Failed to process request",
+                "details": str(e)
+            })
+
+    return StreamingResponse(
+        generate(),
+        media_type='text/event-stream',
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+async def reset_conversation(request: Request):
+    """Reset conversation history"""
+    try:
+        if not ai_service:
+            return JSONResponse({"error": "AI service not initialized"}, status_code=503)
+
+        data = await read_json(request)
+
+        if not data or 'conversation_id' not in data:
+            return JSONResponse({
+                "error": "Missing 'conversation_id' in request body"
+            }, status_code=400)
+
+        success = await ai_service.areset_conversation(data['conversation_id'])
+
+        return JSONResponse({
+            "success": success,
+            "message": "Conversation reset successfully" if success else "Conversation not found"
+        }, status_code=200)
+
+    except Exception as e:
+        logger.error(f"Error resetting conversation: {e}")
+        return JSONResponse({
+            "error": "Failed to reset conversation",
+            "details": str(e)
+        }, status_code=500)
+
+
+async def get_conversation_history(request: Request):
+    """Get conversation history"""
+    try:
+        if not ai_service:
+            return JSONResponse({"error": "AI service not initialized"}, status_code=503)
+
+        data = await read_json(request)
+
+        if not data or 'conversation_id' not in data:
+            return JSONResponse({
+                "error": "Missing 'conversation_id' in request body"
+            }, status_code=400)
+
+        conversation_id = data['conversation_id']
+        history = await ai_service.aget_conversation_history(conversation_id)
+
+        return JSONResponse({
+            "conversation_id": conversation_id,
+            "history": history,
+            "message_count": len(history)
+        }, status_code=200)
+
+    except Exception as e:
+        logger.error(f"Error getting conversation history: {e}")
+        return JSONResponse({
+            "error": "Failed to get conversation history",
+            "details": str(e)
+        }, status_code=500)
+
+
+async def not_found(request: Request, exc):
+    """Handle 404 errors"""
+    return JSONResponse({"error": "Endpoint not found"}, status_code=404)
+
+
+app = Starlette(
+    routes=[
+        Route('/api/metrics', metrics_endpoint, methods=['GET']),
+        Route('/api/health', health_check, methods=['GET']),
+        Route('/api/warmup', warmup, methods=['GET', 'POST', 'OPTIONS']),
+        Route('/api/chat', chat, methods=['POST']),
+        Route('/api/chat/batch', chat_batch, methods=['POST']),
+        Route('/api/chat/stream', chat_stream, methods=['POST']),
+        Route('/api/conversation/reset', reset_conversation, methods=['POST']),
+        Route('/api/conversation/history', get_conversation_history, methods=['POST']),
+    ],
+    middleware=[
+        Middleware(MetricsMiddleware),
+        Middleware(
+            CORSMiddleware,
+            allow_origins=Config.CORS_ORIGINS,
+            allow_methods=["GET", "POST", "OPTIONS"],
+            allow_headers=["Content-Type"]
+        )
+    ],
+    exception_handlers={404: not_found}
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    logger.info(f"Starting AI Voice Assistant Backend (ASGI) on {Config.HOST}:{Config.PORT}")
+    uvicorn.run(app, host=Config.HOST, port=Config.PORT)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Overload benchmark: latency and outcomes with and without admission control
+
+Sends requests at a fixed rate above what the upstream can serve.
+The in-process fake model answers after a fixed service time while under
+its concurrency capacity and throttles (429) beyond it, as Gemini does per
+key. Without admission control excess requests spend round trips on
+throttled keys, push them into cooldown and fail as 500s, taking admitted
+work down with them; with it they queue by priority or get a 429 with
+Retry-After, and admitted requests keep a bounded latency.
+
+    python benchmarks/bench_admission.py --requests 600 --overload 2 --capacity 8
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import AdmissionController, AdmissionRejected, AIService
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ThrottleError(Exception):
+    code = 429
+
+
+class CapacityModel:
+    """Fake `client.models` serving `capacity` concurrent calls and throttling the rest"""
+
+    def __init__(self, capacity: int, service_time: float, throttle_time: float):
+        self.capacity = capacity
+        self.service_time = service_time
+        self.throttle_time = throttle_time
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, model, contents, config=None):
+        with self._lock:
+            throttled = self._in_flight >= self.capacity
+            if not throttled:
+                self._in_flight += 1
+        if throttled:
+            # A 429 still costs a round trip
+            time.sleep(self.throttle_time)
+            raise ThrottleError("429 Resource Exhausted")
+        try:
+            time.sleep(self.service_time)
+            return type("Response", (), {"text": "An answer."})()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+class CapacityClient:
+    def __init__(self, capacity: int, service_time: float, throttle_time: float):
+        self.models = CapacityModel(capacity, service_time, throttle_time)
+
+
+def run(args, admission):
+    clients = [CapacityClient(args.capacity // args.keys, args.service_time, args.throttle_time)
+               for _ in range(args.keys)]
+    service = AIService(api_keys=[""] * args.keys, clients=clients, admission=admission)
+    # Throttled keys cool down briefly so overload is not dominated by long backoffs
+    service.key_pool.base_cooldown = args.service_time
+
+    def request(i):
+        # Open loop: request i arrives at a fixed time whatever happened to earlier ones
+        time.sleep(max(0.0, begin + i / args.rate - time.perf_counter()))
+        start = time.perf_counter()
+        try:
+            service.generate_response(f"question {i}", use_cache=False)
+            outcome = "ok"
+        except AdmissionRejected:
+            outcome = "429"
+        except Exception:
+            outcome = "500"
+        return outcome, time.perf_counter() - start
+
+    begin = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.requests) as pool:
+        return list(pool.map(request, range(args.requests)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=600)
+    parser.add_argument('--overload', type=float, default=2.0, help="offered load / upstream throughput")
+    parser.add_argument('--keys', type=int, default=2)
+    parser.add_argument('--capacity', type=int, default=8, help="upstream concurrent calls, over all keys")
+    parser.add_argument('--service-time', type=float, default=0.05, help="upstream latency (s)")
+    parser.add_argument('--throttle-time', type=float, default=0.03, help="latency of a 429 reply (s)")
+    parser.add_argument('--queue', type=int, default=16, help="admission queue length")
+    parser.add_argument('--queue-timeout', type=float, default=0.5)
+    args = parser.parse_args()
+    args.rate = args.overload * args.capacity / args.service_time
+
+    logging.disable(logging.CRITICAL)
+    print(f"{args.requests} requests at {args.rate:.0f}/s ({args.overload:g}x upstream throughput: "
+          f"{args.capacity} concurrent calls of {args.service_time * 1000:.0f} ms)")
+    print(f"{'mode':<20}{'ok':>6}{'429':>6}{'500':>6}{'ok p50 ms':>11}{'ok p99 ms':>11}{'all p99 ms':>12}")
+    modes = [
+        ("no admission", None),
+        ("admission", AdmissionController(max_concurrency=args.capacity, max_queue=args.queue,
+                                          queue_timeout=args.queue_timeout)),
+    ]
+    for label, admission in modes:
+        results = run(args, admission)
+        counts = {outcome: sum(1 for o, _ in results if o == outcome) for outcome in ("ok", "429", "500")}
+        ok = [latency for outcome, latency in results if outcome == "ok"]
+        every = [latency for _, latency in results]
+        print(f"{label:<20}{counts['ok']:>6}{counts['429']:>6}{counts['500']:>6}"
+              f"{percentile(ok, 0.5) * 1000 if ok else 0:>11.1f}{percentile(ok, 0.99) * 1000 if ok else 0:>11.1f}"
+              f"{percentile(every, 0.99) * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Benchmark: batch chat throughput as API keys are added, vs one request at a time
+
+Runs the same batch through AIService.generate_batch against a local fake
+Gemini server with a fixed latency, with 1, 2 and 4 keys, and compares it
+with posting each message sequentially.
+
+    python benchmarks/bench_batch.py --items 200 --latency 0.2
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import AIService
+from bench_sync_vs_async import make_clients
+from fake_gemini_server import start_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--items', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.2, help="fake model latency (s)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    base_url = start_server(args.latency)
+    requests = [{"message": f"Evaluation prompt {i}"} for i in range(args.items)]
+
+    print(f"{args.items} items, {args.latency * 1000:.0f} ms model latency")
+    sequential = AIService(api_keys=[""], clients=make_clients(base_url, 1))
+    sample = requests[:20]
+    start = time.perf_counter()
+    for item in sample:
+        sequential.generate_response(item["message"])
+    rate = len(sample) / (time.perf_counter() - start)
+    print(f"{'one at a time':<24}{rate:>8.1f} items/s")
+
+    for keys in (1, 2, 4):
+        service = AIService(api_keys=[""] * keys, clients=make_clients(base_url, keys))
+        start = time.perf_counter()
+        results = service.generate_batch(requests)
+        elapsed = time.perf_counter() - start
+        failed = sum(1 for r in results if 'error' in r)
+        label = f"batch, {keys} key{'s' if keys > 1 else ''}"
+        print(f"{label:<24}{args.items / elapsed:>8.1f} items/s  ({failed} failed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-request cost of a fresh Gemini client vs a pooled provider
+
+Sends sequential requests to the local fake Gemini server, once building a
+new client (and connection) for every request and once through a single
+GeminiProvider whose keep-alive pool reuses the connection.
+
+    python benchmarks/bench_connection_reuse.py --requests 200 --latency 0
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import GeminiProvider
+from fake_gemini_server import start_server
+
+MESSAGES = [{"role": "user", "content": "What is the capital of France?"}]
+
+
+def bench(make_provider, requests: int) -> float:
+    """Mean seconds per request"""
+    start = time.perf_counter()
+    for _ in range(requests):
+        make_provider().generate(MESSAGES, max_tokens=50)
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.0, help="fake model latency (s)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    base_url = start_server(args.latency)
+
+    def fresh():
+        return GeminiProvider(client=GeminiProvider.create_client("bench-key", base_url=base_url))
+
+    pooled = fresh()
+    pooled.generate(MESSAGES)  # open the connection once
+
+    fresh_ms = bench(fresh, args.requests) * 1000
+    pooled_ms = bench(lambda: pooled, args.requests) * 1000
+
+    print(f"{args.requests} sequential requests, {args.latency * 1000:.0f} ms model latency")
+    print(f"new client per request : {fresh_ms:6.2f} ms/request")
+    print(f"pooled provider        : {pooled_ms:6.2f} ms/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark: prompt size and turn latency over a long session, full history vs a token budget
+
+Simulates a kiosk session against an in-process model whose latency grows
+with the prompt (a fixed cost plus a per-token prefill cost). With the full
+history the prompt grows every turn; with the context manager older turns
+are summarized in the background and the prompt stays flat.
+
+    python benchmarks/bench_context_budget.py --turns 200 --budget 1500
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import AIService, ContextManager, InMemoryConversationStore
+from services.conversation_store import estimate_tokens
+
+
+class PrefillModel:
+    """Fake `client.models` whose latency scales with the prompt's token count"""
+
+    def __init__(self, base: float, per_token: float):
+        self.base = base
+        self.per_token = per_token
+
+    def generate_content(self, model, contents, config=None):
+        tokens = sum(estimate_tokens(part.text) for content in contents for part in content.parts)
+        time.sleep(self.base + tokens * self.per_token)
+        return type("Response", (), {"text": "Sure, here is a short spoken answer to that question. " * 3})()
+
+
+class PrefillClient:
+    def __init__(self, base: float, per_token: float):
+        self.models = PrefillModel(base, per_token)
+
+
+def run_session(turns: int, context, base: float, per_token: float):
+    """(prompt tokens, seconds) per turn"""
+    service = AIService(api_keys=["bench"], clients=[PrefillClient(base, per_token)],
+                        store=InMemoryConversationStore(max_messages=None, max_tokens=None), context=context)
+    results = []
+    for i in range(turns):
+        message = f"Question {i}: what else should I know about exhibit number {i} in this museum?"
+        start = time.perf_counter()
+        conversation_id, contents = service._start_turn(message, "kiosk")
+        service._finish_turn(conversation_id, service._call_model(contents, conversation_id))
+        elapsed = time.perf_counter() - start
+        tokens = sum(estimate_tokens(part.text) for content in contents for part in content.parts)
+        results.append((tokens, elapsed))
+    if context is not None:
+        context.flush()
+        context.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--budget', type=int, default=1500)
+    parser.add_argument('--base-latency', type=float, default=0.005)
+    parser.add_argument('--per-token', type=float, default=0.00002, help='prefill seconds per prompt token')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    window = max(1, args.turns // 10)
+    print(f"{args.turns} turns, averages over the first and last {window} turns")
+    print(f"{'mode':<22}{'first tokens':>14}{'last tokens':>13}{'first ms':>10}{'last ms':>10}")
+    for label, context in (("full history", None),
+                           (f"budget {args.budget}", ContextManager(budget_tokens=args.budget))):
+        results = run_session(args.turns, context, args.base_latency, args.per_token)
+
+        def average(rows, column):
+            return sum(row[column] for row in rows) / len(rows)
+
+        first, last = results[:window], results[-window:]
+        print(f"{label:<22}{average(first, 0):>14.0f}{average(last, 0):>13.0f}"
+              f"{average(first, 1) * 1000:>10.1f}{average(last, 1) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
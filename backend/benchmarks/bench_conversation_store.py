@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark: conversation turns/sec in memory vs with the SQLite journal
+
+A turn appends the user message, reads the history (as the service does to
+build the prompt) and appends the reply. The journal is measured with its
+background batched writer, and with a flush after every turn to show what
+writing on the request path would cost.
+
+    python benchmarks/bench_conversation_store.py --turns 5000 --conversations 200
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import InMemoryConversationStore, SQLiteConversationStore
+
+
+def run_turns(store, turns: int, conversations: int, threads: int, flush_each_turn: bool = False) -> float:
+    """Turns per second"""
+
+    def turn(i):
+        conversation_id = f"conversation-{i % conversations}"
+        store.append(conversation_id, {"role": "user", "content": f"Question number {i}, please answer briefly."})
+        store.get(conversation_id)
+        store.append(conversation_id, {"role": "model", "content": "Here is a short answer. " * 4})
+        if flush_each_turn:
+            store.flush()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(turn, range(turns)))
+    return turns / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--turns', type=int, default=5000)
+    parser.add_argument('--conversations', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    results = [("in-memory", run_turns(InMemoryConversationStore(), args.turns, args.conversations, args.threads))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, flush_each_turn in (("sqlite journal", False), ("sqlite, flush per turn", True)):
+            # No linger when every turn waits for its own commit
+            store = SQLiteConversationStore(os.path.join(tmp, f"{flush_each_turn}.db"),
+                                            flush_interval=0 if flush_each_turn else 0.05)
+            rate = run_turns(store, args.turns, args.conversations, args.threads, flush_each_turn)
+            store.close()
+            stats = store.stats()
+            results.append((f"{label} ({stats['write_batches']} commits)", rate))
+
+    print(f"{args.turns} turns over {args.conversations} conversations, {args.threads} threads")
+    for label, rate in results:
+        print(f"{label:<40}{rate:>10.0f} turns/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Load benchmark: concurrent chat throughput of the sync and async AIService paths
+
+Both services talk to a local fake Gemini server with a fixed response latency.
+The sync path is driven by a thread pool (like gunicorn threads); the async path
+by a single event loop.
+
+    python benchmarks/bench_sync_vs_async.py --requests 200 --threads 16 --latency 0.2
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google import genai
+from google.genai import types
+
+from services import AIService, AsyncAIService
+from fake_gemini_server import start_server
+
+
+def make_clients(base_url: str, keys: int):
+    return [
+        genai.Client(api_key=f"bench-key-{i}", http_options=types.HttpOptions(base_url=base_url))
+        for i in range(keys)
+    ]
+
+
+def bench_sync(base_url: str, requests: int, threads: int, keys: int) -> float:
+    service = AIService(api_keys=[""] * keys, clients=make_clients(base_url, keys))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda i: service.generate_response(f"question {i}"), range(requests)))
+    return time.perf_counter() - start
+
+
+def bench_async(base_url: str, requests: int, keys: int) -> float:
+    service = AsyncAIService(api_keys=[""] * keys, clients=make_clients(base_url, keys))
+
+    async def run():
+        await asyncio.gather(*(service.generate_response(f"question {i}") for i in range(requests)))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=16, help="sync worker threads")
+    parser.add_argument('--keys', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.2, help="fake model latency (s)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    base_url = start_server(args.latency)
+
+    sync_elapsed = bench_sync(base_url, args.requests, args.threads, args.keys)
+    async_elapsed = bench_async(base_url, args.requests, args.keys)
+
+    print(f"{args.requests} requests, {args.latency * 1000:.0f} ms model latency, {args.keys} keys")
+    print(f"sync  ({args.threads:>3} threads): {sync_elapsed:6.2f}s  {args.requests / sync_elapsed:7.1f} req/s")
+    print(f"async (1 event loop): {async_elapsed:6.2f}s  {args.requests / async_elapsed:7.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
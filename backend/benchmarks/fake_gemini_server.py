@@ -0,0 +1,58 @@
+"""
+Local fake Gemini REST server for benchmarks
+Answers generateContent / streamGenerateContent after a fixed latency
+"""
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import uvicorn
+
+REPLY = "This is a canned reply from the fake model server."
+
+
+def make_app(latency: float = 0.2) -> Starlette:
+    """Build an app that mimics the Gemini generateContent endpoints"""
+
+    def payload(text):
+        return {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP"
+            }]
+        }
+
+    async def generate(request: Request):
+        method = request.path_params['method']
+        await asyncio.sleep(latency)
+        if method.endswith(':streamGenerateContent'):
+            async def events():
+                for word in REPLY.split(" "):
+                    yield f"data: {json.dumps(payload(word + ' '))}\r\n\r\n"
+            return StreamingResponse(events(), media_type='text/event-stream')
+        return JSONResponse(payload(REPLY))
+
+    return Starlette(routes=[
+        Route('/{version}/models/{method:path}', generate, methods=['POST'])
+    ])
+
+
+def start_server(latency: float = 0.2) -> str:
+    """Run the fake server in a daemon thread and return its base URL"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    config = uvicorn.Config(make_app(latency), host='127.0.0.1', port=port,
+                            log_level='warning', backlog=2048)
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
@@ -1,6 +1,7 @@
 """
 Configuration management for AI Voice Assistant Backend
 """
+import math
 import os
 from dotenv import load_dotenv
 
@@ -18,6 +19,8 @@ class Config:
     GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
     MAX_TOKENS = int(os.getenv('MAX_TOKENS', '500'))
     TEMPERATURE = float(os.getenv('TEMPERATURE', '0.7'))
+    # Per-request timeout for the pooled Gemini HTTP clients
+    GEMINI_TIMEOUT_SECONDS = float(os.getenv('GEMINI_TIMEOUT_SECONDS', '30'))
     
     # Flask Configuration
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
@@ -30,6 +33,49 @@ class Config:
     
     # Conversation Settings
     MAX_CONVERSATION_HISTORY = int(os.getenv('MAX_CONVERSATION_HISTORY', '10'))
+    MAX_CONVERSATION_TOKENS = int(os.getenv('MAX_CONVERSATION_TOKENS', '4000'))
+    MAX_CONVERSATIONS = int(os.getenv('MAX_CONVERSATIONS', '1000'))
+    CONVERSATION_TTL_SECONDS = float(os.getenv('CONVERSATION_TTL_SECONDS', '3600'))
+    MAX_HISTORY_BYTES = int(os.getenv('MAX_HISTORY_BYTES', str(50 * 1024 * 1024)))
+    # SQLite journal that keeps conversations across restarts (unset: memory only)
+    CONVERSATION_DB_PATH = os.getenv('CONVERSATION_DB_PATH') or None
+    # Session store shared by all workers: redis://, tcp:// or unix:// (takes precedence over the journal)
+    SESSION_STORE_URL = os.getenv('SESSION_STORE_URL') or None
+    # Prompt budget in estimated tokens; older turns are folded into a rolling summary (0 disables)
+    CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '0'))
+    # Tokens of recent turns always sent verbatim (0: half the budget)
+    CONTEXT_RECENT_TOKENS = int(os.getenv('CONTEXT_RECENT_TOKENS', '0'))
+    
+    # Response Cache Settings (size 0 disables the cache)
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '500'))
+    RESPONSE_CACHE_TTL_SECONDS = float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '3600'))
+    RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH') or None
+    
+    # Batch chat: most items per /api/chat/batch request, and items in flight (0: 4 per API key)
+    MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '100'))
+    BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '0'))
+    
+    # Admission control: model calls in flight (0: 4 per API key) and queued requests waiting
+    # for a slot, both for the whole server, and how long one may wait before a 429
+    ADMISSION_CONTROL = os.getenv('ADMISSION_CONTROL', 'true').lower() in ('1', 'true', 'yes')
+    MAX_CONCURRENT_REQUESTS = int(os.getenv('MAX_CONCURRENT_REQUESTS', '0'))
+    MAX_QUEUED_REQUESTS = int(os.getenv('MAX_QUEUED_REQUESTS', '64'))
+    QUEUE_TIMEOUT_SECONDS = float(os.getenv('QUEUE_TIMEOUT_SECONDS', '10'))
+    # Worker processes splitting those limits (exported by gunicorn.conf.py; uvicorn --workers reads it too)
+    WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+    
+    # Answer time/date requests locally instead of calling Gemini
+    LOCAL_ROUTING = os.getenv('LOCAL_ROUTING', 'true').lower() in ('1', 'true', 'yes')
+    
+    # Keep-warm pings per API key (0 disables the background scheduler)
+    WARMUP_INTERVAL_SECONDS = float(os.getenv('WARMUP_INTERVAL_SECONDS', '240'))
+    
+    @staticmethod
+    def admission_limits():
+        """(max_concurrency, max_queue) for one worker process, splitting the server-wide limits"""
+        workers = max(1, Config.WEB_CONCURRENCY)
+        concurrency = Config.MAX_CONCURRENT_REQUESTS or 4 * len(Config.GEMINI_API_KEYS)
+        return max(1, math.ceil(concurrency / workers)), math.ceil(Config.MAX_QUEUED_REQUESTS / workers)
     
     @staticmethod
     def validate():
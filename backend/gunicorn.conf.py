@@ -0,0 +1,42 @@
+"""
+Gunicorn configuration for AI Voice Assistant Backend
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The master exports the worker count as WEB_CONCURRENCY, so the workers split
+MAX_CONCURRENT_REQUESTS and MAX_QUEUED_REQUESTS between them.
+
+With more than one worker and no SESSION_STORE_URL, the master starts a
+SessionServer on a unix socket before forking, so every worker shares
+conversation history. Point SESSION_STORE_URL at Redis to share it across
+hosts instead.
+"""
+import os
+import tempfile
+
+bind = os.getenv('GUNICORN_BIND', f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+
+session_server = None
+
+
+def on_starting(server):
+    global session_server
+    workers = server.cfg.workers
+    # Workers split the admission limits between them (see Config.admission_limits)
+    os.environ['WEB_CONCURRENCY'] = str(workers)
+    if workers > 1 and not os.getenv('SESSION_STORE_URL'):
+        from services import SessionServer
+
+        path = os.path.join(tempfile.gettempdir(), f"voice-assistant-sessions-{os.getpid()}.sock")
+        session_server = SessionServer(f"unix://{path}").start()
+        # Workers read Config after the fork, so they all pick this up
+        os.environ['SESSION_STORE_URL'] = session_server.url
+        server.log.info(f"Sharing conversations between {workers} workers via {session_server.url}")
+
+
+def on_exit(server):
+    if session_server is not None:
+        session_server.stop()
@@ -1,6 +1,47 @@
 """
 Services package for AI Voice Assistant Backend
 """
+from .admission import AdmissionController, AdmissionRejected
 from .ai_service import AIService
+from .async_ai_service import AsyncAIService
+from .context_manager import ContextManager
+from .conversation_store import ConversationStore, InMemoryConversationStore
+from .key_pool import KeyPool
+from .llm_providers import (GeminiProvider, LLMProvider, OpenAIProvider, RetryPolicy, StubProvider,
+                            create_provider)
+from .local_router import LocalRouter
+from .metrics import MetricsRegistry
+from .resp import RespClient, SessionServer
+from .response_cache import ResponseCache
+from .shared_conversation_store import RedisConversationStore, connect_session_store
+from .single_flight import AsyncSingleFlight, SingleFlight
+from .sqlite_conversation_store import SQLiteConversationStore
+from .warmup_scheduler import WarmupScheduler
 
-__all__ = ['AIService']
+__all__ = [
+    'AdmissionController',
+    'AdmissionRejected',
+    'AIService',
+    'AsyncAIService',
+    'ContextManager',
+    'ConversationStore',
+    'InMemoryConversationStore',
+    'SQLiteConversationStore',
+    'RedisConversationStore',
+    'connect_session_store',
+    'RespClient',
+    'SessionServer',
+    'KeyPool',
+    'LLMProvider',
+    'GeminiProvider',
+    'OpenAIProvider',
+    'StubProvider',
+    'RetryPolicy',
+    'create_provider',
+    'LocalRouter',
+    'MetricsRegistry',
+    'ResponseCache',
+    'SingleFlight',
+    'AsyncSingleFlight',
+    'WarmupScheduler',
+]
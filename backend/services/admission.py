@@ -0,0 +1,246 @@
+"""
+Admission control and priority queueing for AI Voice Assistant Backend
+"""
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict, List, Optional
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Lower rank is served first: voice turns ahead of bulk jobs
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+
+class AdmissionRejected(Exception):
+    """The request was turned away; retry after `retry_after` seconds"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server busy ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """An admitted request's slot. Release it exactly once (extra calls are ignored)."""
+
+    def __init__(self, controller: "AdmissionController", priority: str, waited: float):
+        self.controller = controller
+        self.priority = priority
+        self.waited = waited
+        self.admitted_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.controller._release(self)
+
+
+class _Waiter:
+    """A queued request, ordered by priority rank then arrival"""
+
+    __slots__ = ("rank", "seq", "priority", "enqueued", "wake", "ticket", "rejected")
+
+    def __init__(self, rank: int, seq: int, priority: str, wake: Callable[[], None]):
+        self.rank = rank
+        self.seq = seq
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.wake = wake
+        self.ticket: Optional[Ticket] = None
+        self.rejected: Optional[AdmissionRejected] = None
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.rank, self.seq) < (other.rank, other.seq)
+
+
+class AdmissionController:
+    """
+    Bounds how many requests reach the model at once.
+
+    Up to `max_concurrency` requests run; the rest wait in a priority queue
+    (interactive before batch, FIFO within a priority) for at most
+    `queue_timeout` seconds. Requests are rejected straight away, with a
+    Retry-After estimate, when `max_queue` requests are already waiting
+    (a queued batch request is bumped to make room for an interactive one)
+    or when every key in `key_pool` is cooling down after throttling.
+    Rejecting early keeps latency bounded for the requests that are admitted
+    instead of letting every request time out under overload.
+    """
+
+    def __init__(self, max_concurrency: int = 16, max_queue: int = 64, queue_timeout: float = 10.0,
+                 key_pool=None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.key_pool = key_pool
+
+        self._lock = threading.Lock()
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._admitted = 0
+        self._rejected = {"queue_full": 0, "queue_timeout": 0, "throttled": 0}
+        self._queue_wait_total = 0.0
+        # Exponentially weighted moving average of how long a slot is held, in seconds
+        self._hold_time = 1.0
+
+    def check(self, priority: str = "interactive") -> None:
+        """Raise AdmissionRejected now if a request of this priority would be turned away on arrival."""
+        rank = self._rank(priority)
+        with self._lock:
+            self._check(rank)
+
+    def acquire(self, priority: str = "interactive", timeout: Optional[float] = None) -> Ticket:
+        """Block until admitted and return the Ticket, or raise AdmissionRejected."""
+        event = threading.Event()
+        ticket, waiter, bumped = self._arrive(priority, event.set)
+        if bumped:
+            bumped()
+        if ticket:
+            return ticket
+        event.wait(self.queue_timeout if timeout is None else timeout)
+        return self._settle(waiter)
+
+    async def aacquire(self, priority: str = "interactive", timeout: Optional[float] = None) -> Ticket:
+        """Like acquire(), waiting on the event loop instead of blocking a thread."""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        ticket, waiter, bumped = self._arrive(priority, wake)
+        if bumped:
+            bumped()
+        if ticket:
+            return ticket
+        try:
+            await asyncio.wait_for(granted, self.queue_timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        return self._settle(waiter)
+
+    @contextmanager
+    def admit(self, priority: str = "interactive"):
+        ticket = self.acquire(priority)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    @asynccontextmanager
+    async def aadmit(self, priority: str = "interactive"):
+        ticket = await self.aacquire(priority)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            queued = {priority: 0 for priority in PRIORITIES}
+            for waiter in self._queue:
+                queued[waiter.priority] += 1
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": queued,
+                "admitted": self._admitted,
+                "rejected": dict(self._rejected),
+                "avg_queue_wait_ms": round(self._queue_wait_total / self._admitted * 1000, 1)
+                if self._admitted else 0.0
+            }
+
+    @staticmethod
+    def _rank(priority: str) -> int:
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'. Use one of: {', '.join(PRIORITIES)}")
+        return PRIORITIES[priority]
+
+    def _retry_after(self, ahead: int) -> int:
+        """Seconds until roughly `ahead` queued requests have been served."""
+        return max(1, math.ceil((ahead + 1) * self._hold_time / self.max_concurrency))
+
+    def _reject(self, reason: str, retry_after: int) -> AdmissionRejected:
+        self._rejected[reason] += 1
+        return AdmissionRejected(reason, retry_after)
+
+    def _check(self, rank: int) -> None:
+        if self.key_pool is not None:
+            wait = self.key_pool.available_in()
+            if wait > 0:
+                raise self._reject("throttled", math.ceil(wait))
+        if (self._active >= self.max_concurrency and len(self._queue) >= self.max_queue
+                and not any(waiter.rank > rank for waiter in self._queue)):
+            raise self._reject("queue_full", self._retry_after(len(self._queue)))
+
+    def _arrive(self, priority: str, wake: Callable[[], None]):
+        """Admit at once, or enqueue. Returns (ticket, waiter, wake callback of a bumped waiter)."""
+        rank = self._rank(priority)
+        with self._lock:
+            self._check(rank)
+            if self._active < self.max_concurrency and not self._queue:
+                return self._grant(priority, 0.0), None, None
+
+            bumped = None
+            if len(self._queue) >= self.max_queue:
+                # Make room by turning away the newest request of the lowest priority
+                bumped = max(self._queue, key=lambda w: (w.rank, w.seq))
+                self._queue.remove(bumped)
+                heapq.heapify(self._queue)
+                bumped.rejected = self._reject("queue_full", self._retry_after(len(self._queue)))
+
+            waiter = _Waiter(rank, next(self._seq), priority, wake)
+            heapq.heappush(self._queue, waiter)
+        return None, waiter, bumped.wake if bumped else None
+
+    def _settle(self, waiter: _Waiter) -> Ticket:
+        """After waking or timing out: return the granted ticket or raise the rejection."""
+        with self._lock:
+            if waiter.ticket is not None:
+                return waiter.ticket
+            if waiter.rejected is None:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+                waiter.rejected = self._reject("queue_timeout", self._retry_after(len(self._queue)))
+            raise waiter.rejected
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """The caller gave up (e.g. the client disconnected): free its slot or queue entry."""
+        with self._lock:
+            ticket = waiter.ticket
+            if ticket is None and waiter.rejected is None:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+        if ticket is not None:
+            ticket.release()
+
+    def _grant(self, priority: str, waited: float) -> Ticket:
+        self._active += 1
+        self._admitted += 1
+        self._queue_wait_total += waited
+        return Ticket(self, priority, waited)
+
+    def _release(self, ticket: Ticket) -> None:
+        woken = []
+        with self._lock:
+            self._active -= 1
+            held = time.monotonic() - ticket.admitted_at
+            self._hold_time = 0.8 * self._hold_time + 0.2 * held
+            while self._queue and self._active < self.max_concurrency:
+                waiter = heapq.heappop(self._queue)
+                waiter.ticket = self._grant(waiter.priority, time.monotonic() - waiter.enqueued)
+                woken.append(waiter.wake)
+        for wake in woken:
+            wake()
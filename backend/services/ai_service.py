@@ -1,29 +1,74 @@
 """
 AI Service for handling Google Gemini API interactions
 """
-from google import genai
 from google.genai import types
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from google.genai.errors import APIError
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional, Tuple
 import logging
+import threading
 import time
 import uuid
 
+from .admission import AdmissionController, AdmissionRejected
+from .context_manager import ContextManager, count_tokens
+from .conversation_store import ConversationStore, InMemoryConversationStore
+from .key_pool import KeyPool, is_throttle_error
+from .llm_providers import GeminiProvider, RetryPolicy
+from .local_router import LocalRouter
+from .metrics import MetricsRegistry
+from .response_cache import ResponseCache
+from .single_flight import SingleFlight
+
 logger = logging.getLogger(__name__)
 
+# Instructions for folding older turns into a conversation's rolling summary
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and a voice assistant.
+Merge the new messages into the existing summary. Keep names, preferences, facts,
+decisions and open questions; drop greetings and small talk.
+Reply with the summary only, in at most {words} words."""
+
 class AIService:
-    """Service class for AI-powered responses using Gemini with Round-Robin Keys"""
+    """Service class for AI-powered responses using Gemini with a pool of API keys"""
+    
+    # Batch items in flight per API key when generate_batch is not given a limit
+    batch_concurrency_per_key = 4
     
     def __init__(self, api_keys: List[str], model: str = "gemini-2.0-flash", 
-                 max_tokens: int = 500, temperature: float = 0.7):
+                 max_tokens: int = 500, temperature: float = 0.7,
+                 clients: Optional[List] = None, store: Optional[ConversationStore] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 metrics: Optional[MetricsRegistry] = None,
+                 router: Optional[LocalRouter] = None,
+                 retry: Optional[RetryPolicy] = None, timeout: float = 30.0,
+                 context: Optional[ContextManager] = None,
+                 admission: Optional[AdmissionController] = None):
         """
-        Initialize AI Service with a list of API keys for round-robin usage.
+        Initialize AI Service with a list of API keys shared through a KeyPool.
+        
+        Each key gets a GeminiProvider with a pooled keep-alive HTTP client and a
+        `timeout` in seconds; `clients` may be passed to reuse pre-built (or
+        fake) Gemini clients, one per API key. `retry` retries transient
+        failures on the same key (throttled keys rotate instead). `store` holds conversation history and defaults to a
+        bounded in-memory store. `response_cache` enables reuse of replies to
+        repeated first-turn prompts. `router` answers deterministic requests
+        (time, date) locally instead of calling the model. `context` keeps each
+        prompt within a token budget by summarizing older turns in the
+        background (by default with this service's model). `admission` bounds
+        concurrent model calls, queueing by priority and rejecting early under
+        overload (AdmissionRejected). Instrumentation is
+        registered on `metrics` (a private registry if omitted).
         """
         self.api_keys = api_keys
-        self.current_key_index = 0
         
-        # Initialize a client for each API key
-        self.clients = [genai.Client(api_key=key) for key in api_keys]
+        # Initialize a pooled client for each API key
+        if clients is None:
+            clients = [GeminiProvider.create_client(key, timeout=timeout) for key in api_keys]
+        self.clients = clients
+        retry = retry or RetryPolicy(attempts=2, retry_throttled=False)
+        self.providers = [GeminiProvider(model=model, retry=retry, client=client) for client in clients]
+        self.key_pool = KeyPool(len(self.clients))
         
         self.model_name = model
         self.max_tokens = max_tokens
@@ -40,124 +85,527 @@ Your responses should be:
 Keep responses brief unless the user asks for detailed information."""
         
         # Store raw history for the stateless API calls
-        self.history_logs: Dict[str, List[Dict]] = {}
+        self.history_logs: ConversationStore = store if store is not None else InMemoryConversationStore()
+        
+        # Prebuilt Gemini Content per conversation, kept in step with history_logs
+        # so each turn only builds objects for new messages
+        self._contents_cache: Dict[str, List[Tuple[Dict, types.Content]]] = {}
+        self._contents_lock = threading.Lock()
+        self.history_logs.add_eviction_listener(self._on_history_evicted)
+        
+        self.response_cache = response_cache
+        self.router = router
+        self.admission = admission
+        if admission is not None and admission.key_pool is None:
+            admission.key_pool = self.key_pool
+        self.context = context
+        if context is not None and context.summarizer is None:
+            context.summarizer = self.summarize
+        if context is not None:
+            # The summary is sent inside an opening exchange, which counts against the budget too
+            context.summary_overhead_tokens = count_tokens(
+                [{"content": c.parts[0].text} for c in self._summary_contents("")])
+        
+        # Concurrent identical first-turn prompts and warmups share one upstream call
+        self._single_flight = SingleFlight()
+        
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self._upstream_latency = self.metrics.histogram(
+            'gemini_request_duration_seconds', 'Latency of upstream Gemini calls',
+            ['key_index', 'outcome']
+        )
+        self._retries = self.metrics.counter(
+            'gemini_retries_total', 'Failed Gemini attempts, by failure kind', ['reason']
+        )
+        self._key_rotations = self.metrics.counter(
+            'gemini_key_rotations_total', 'Times a request moved to another key after a failure'
+        )
+        self._local_routes = self.metrics.counter(
+            'local_routes_total', 'Requests answered locally without a model call', ['route']
+        )
+        self._batch_items = self.metrics.counter(
+            'batch_items_total', 'Items processed by generate_batch, by outcome', ['outcome']
+        )
+        self.metrics.collector(self._collect_metrics)
         
         logger.info(f"AI Service initialized with model: {model} and {len(api_keys)} keys.")
     
-    def _rotate_key(self):
-        """Rotate to the next API key in the list."""
-        self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
-        logger.info(f"Rotated to API key index: {self.current_key_index}")
-        
-    def _get_client(self):
-        return self.clients[self.current_key_index]
-
     def warmup(self) -> bool:
-        """Ping the API to warm it up without saving history."""
+        """Ping the API to warm it up without saving history (concurrent calls share one ping)."""
+        return self._single_flight.do("warmup", self._ping)
+    
+    def _ping(self) -> bool:
         try:
-            client = self._get_client()
-            client.models.generate_content(
-                model=self.model_name,
-                contents="ping"
-            )
+            self.ping_key(self.key_pool.acquire(), reserved=True)
             return True
         except Exception as e:
             logger.warning(f"Warmup failed: {e}")
-            self._rotate_key()
             return False
     
-    def generate_response(self, message: str, conversation_id: Optional[str] = None) -> Dict:
+    def ping_key(self, index: int, reserved: bool = False) -> float:
         """
-        Generate AI response for user message with round-robin retry logic.
+        Send a minimal request with one specific key and return its latency in seconds.
+        
+        Raises the upstream error on failure; the key pool records the outcome
+        either way. Pass reserved=True if the key was already acquired.
         """
+        if not reserved:
+            self.key_pool.reserve(index)
+        start = time.perf_counter()
+        try:
+            self.providers[index].ping()
+        except Exception as e:
+            self._release_key(index, start, e)
+            raise
+        self._release_key(index, start)
+        return time.perf_counter() - start
+    
+    def _acquire_key(self, tried: List[int]) -> Optional[int]:
+        """Reserve the best key not yet tried for this request."""
+        index = self.key_pool.acquire(exclude=tried)
+        if index is not None:
+            if tried:
+                self._key_rotations.inc()
+            tried.append(index)
+        return index
+    
+    def _release_key(self, index: int, start: float, error: Optional[Exception] = None) -> None:
+        """Return a key to the pool and record the attempt's latency and outcome."""
+        latency = time.perf_counter() - start
+        if error is None:
+            self.key_pool.release(index, latency=latency)
+            outcome = "ok"
+        else:
+            self.key_pool.release(index, success=False, error=error)
+            outcome = "throttled" if is_throttle_error(error) else "error"
+            self._retries.inc(outcome)
+        self._upstream_latency.observe(latency, str(index), outcome)
+    
+    def _collect_metrics(self):
+        """Scrape-time gauges for state owned by the store, caches and key pool."""
+        store = self.history_logs.stats()
+        keys = self.key_pool.stats()
+        flights = self._single_flight.stats()
+        families = [
+            ("conversations_active", "gauge", "Conversations held in the history store",
+             [({}, store["conversations"])]),
+            ("conversation_history_bytes", "gauge", "Approximate memory used by conversation history",
+             [({}, store["bytes"])]),
+            ("gemini_key_in_flight", "gauge", "In-flight requests per API key",
+             [({"key_index": str(k["index"])}, k["in_flight"]) for k in keys]),
+            ("gemini_key_throttles_total", "counter", "Throttling responses per API key",
+             [({"key_index": str(k["index"])}, k["throttles"]) for k in keys]),
+            ("single_flight_coalesced_total", "counter", "Requests that shared an in-flight upstream call",
+             [({}, flights["coalesced"])]),
+        ]
+        if self.context is not None:
+            context = self.context.stats()
+            families += [
+                ("context_compactions_total", "counter", "Rolling summaries written for long conversations",
+                 [({}, context["compactions"])]),
+                ("context_prompt_tokens", "gauge", "Estimated history tokens in the latest prompt",
+                 [({}, context["last_prompt_tokens"])]),
+            ]
+        if self.response_cache is not None:
+            cache = self.response_cache.stats()
+            families += [
+                ("response_cache_hits_total", "counter", "Response cache hits", [({}, cache["hits"])]),
+                ("response_cache_misses_total", "counter", "Response cache misses", [({}, cache["misses"])]),
+                ("response_cache_entries", "gauge", "Entries in the response cache", [({}, cache["entries"])]),
+            ]
+        return families
+    
+    def _generation_params(self) -> Dict:
+        """Generation settings shared by all model calls."""
+        return {
+            "system_prompt": self.system_prompt,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature
+        }
+    
+    def _start_turn(self, message: str, conversation_id: Optional[str]):
+        """Log the user message and build the content payload for the API."""
         if not conversation_id:
             conversation_id = self._generate_conversation_id()
             
-        if conversation_id not in self.history_logs:
-            self.history_logs[conversation_id] = []
-            
         # Log user message
-        self.history_logs[conversation_id].append({
+        self.history_logs.append(conversation_id, {
             "role": "user",
             "content": message
         })
         
         # Prepare content payload for the API
-        contents = []
-        for msg in self.history_logs[conversation_id]:
-            contents.append(
-                types.Content(role=msg["role"], parts=[types.Part.from_text(text=msg["content"])])
-            )
+        history = self.history_logs.get(conversation_id)
+        summary = None
+        if self.context is not None:
+            summary, history = self.context.select(conversation_id, history)
+        contents = self._build_contents(conversation_id, history)
+        if summary:
+            contents = self._summary_contents(summary) + contents
+        return conversation_id, contents
+    
+    @staticmethod
+    def _summary_contents(summary: str) -> List[types.Content]:
+        """Present the rolling summary as an opening exchange ahead of the verbatim turns."""
+        return [
+            types.Content(role="user", parts=[types.Part.from_text(
+                text=f"Summary of our conversation so far: {summary}")]),
+            types.Content(role="model", parts=[types.Part.from_text(text="Got it, I'll keep that in mind.")])
+        ]
+    
+    def summarize(self, summary: Optional[str], messages: List[Dict]) -> str:
+        """Fold messages into a conversation summary with the model (ContextManager's default summarizer)."""
+        transcript = "\n".join(
+            f"{'User' if m['role'] == 'user' else 'Assistant'}: {m['content']}" for m in messages
+        )
+        prompt = f"Existing summary: {summary or '(none)'}\n\nNew messages:\n{transcript}"
+        contents = [types.Content(role="user", parts=[types.Part.from_text(text=prompt)])]
+        words = self.context.max_summary_tokens * 3 // 4 if self.context else 150
+        params = {"system_prompt": SUMMARY_PROMPT.format(words=words), "max_tokens": words * 2,
+                  "temperature": 0.2}
+        # Runs on the context manager's worker thread, so use the blocking calls
+        # even when a subclass makes _call_model and _call_keys coroutines
+        with self._admit("batch"):
+            return AIService._call_keys(self, contents, "summary", None, params)
+    
+    def _build_contents(self, conversation_id: str, history: List[Dict]) -> List[types.Content]:
+        """
+        Return Gemini contents for a history, reusing cached Content objects.
+        
+        The cache is append-only: messages trimmed from the front of the
+        history are dropped from the cache, and only messages past the cached
+        tail are converted. If the cache no longer lines up with the history
+        it is rebuilt.
+        """
+        with self._contents_lock:
+            cached = self._contents_cache.get(conversation_id, [])
             
-        # Retry logic: Try each key exactly once per request if there's an error
-        attempts = 0
-        max_attempts = len(self.clients)
+            # Skip cached entries for messages the store has trimmed away
+            offset = None
+            if history:
+                for i, (msg, _) in enumerate(cached):
+                    if msg == history[0]:
+                        offset = i
+                        break
+            cached = cached[offset:] if offset is not None else []
+            
+            if len(cached) > len(history) or (cached and cached[-1][0] != history[len(cached) - 1]):
+                cached = []
+            
+            for msg in history[len(cached):]:
+                cached.append((
+                    msg,
+                    types.Content(role=msg["role"], parts=[types.Part.from_text(text=msg["content"])])
+                ))
+            self._contents_cache[conversation_id] = cached
+            
+            return [content for _, content in cached]
+    
+    def _on_history_evicted(self, conversation_id: str) -> None:
+        """Drop cached contents and summaries once a conversation leaves the store's memory."""
+        if not self.history_logs.is_cached(conversation_id):
+            with self._contents_lock:
+                self._contents_cache.pop(conversation_id, None)
+            if self.context is not None:
+                self.context.forget(conversation_id)
+    
+    def _prompt_key(self, message: str, contents: List[types.Content], use_cache: bool) -> Optional[str]:
+        """
+        Key for a stateless first-turn prompt, used for caching and coalescing.
+        Returns None when the reply depends on history or the caller opted out.
+        """
+        if not use_cache or len(contents) != 1:
+            return None
+        return ResponseCache.make_key(message, self.model_name, self.temperature, self.system_prompt)
+    
+    def _serve_from_cache(self, conversation_id: str, prompt_key: Optional[str]) -> Optional[Dict]:
+        """Complete the turn from the response cache, or return None on a miss."""
+        if prompt_key is None or self.response_cache is None:
+            return None
+        cached = self.response_cache.get(prompt_key)
+        if cached is None:
+            return None
+        result = self._finish_turn(conversation_id, cached)
+        result["cached"] = True
+        return result
+    
+    def _serve_locally(self, conversation_id: str, message: str, timezone: Optional[str]) -> Optional[Dict]:
+        """Complete the turn with a local answer for deterministic requests, or return None."""
+        if self.router is None:
+            return None
+        routed = self.router.route(message, timezone)
+        if routed is None:
+            return None
+        route, reply = routed
+        self._local_routes.inc(route)
+        result = self._finish_turn(conversation_id, reply)
+        result.update(model="local", local=True)
+        return result
+    
+    def _abandon_turn(self, conversation_id: str, message: str) -> None:
+        """Take back the user message of a turn that failed, so a retry does not log it twice."""
+        self.history_logs.discard_last(conversation_id, {"role": "user", "content": message})
+    
+    def _remember(self, prompt_key: Optional[str], assistant_message: str) -> None:
+        """Store a first-turn reply in the response cache."""
+        if prompt_key is not None and self.response_cache is not None:
+            self.response_cache.put(prompt_key, assistant_message)
+    
+    def _finish_turn(self, conversation_id: str, assistant_message: str) -> Dict:
+        """Log the assistant response and build the result payload."""
+        self.history_logs.append(conversation_id, {
+            "role": "model",  # Gemini uses 'model' instead of 'assistant' in contents
+            "content": assistant_message
+        })
+        
+        logger.info(f"Response generated successfully for conversation: {conversation_id}")
         
+        return {
+            "response": assistant_message,
+            "conversation_id": conversation_id,
+            "model": self.model_name
+        }
+    
+    def check_admission(self, priority: str = "interactive") -> None:
+        """Raise AdmissionRejected if a request of this priority would be turned away right now."""
+        if self.admission is not None:
+            self.admission.check(priority)
+    
+    def _admit(self, priority: str):
+        """Hold an admission slot for a model call (no-op without admission control)."""
+        return self.admission.admit(priority) if self.admission is not None else nullcontext()
+    
+    def generate_response(self, message: str, conversation_id: Optional[str] = None,
+                          use_cache: bool = True, timezone: Optional[str] = None,
+                          priority: str = "interactive") -> Dict:
+        """
+        Generate AI response for user message with round-robin retry logic.
+        
+        First-turn requests are served from the response cache when possible,
+        and identical ones already in flight share a single model call; pass
+        use_cache=False to always make a dedicated call. Deterministic requests
+        are answered by the local router (in the caller's `timezone`). Only
+        model calls go through admission control, at `priority` ("interactive"
+        or "batch"); local and cached replies are never turned away.
+        """
+        conversation_id, contents = self._start_turn(message, conversation_id)
+        
+        local = self._serve_locally(conversation_id, message, timezone)
+        if local:
+            return local
+        
+        prompt_key = self._prompt_key(message, contents, use_cache)
+        cached = self._serve_from_cache(conversation_id, prompt_key)
+        if cached:
+            return cached
+        
+        call = lambda: self._call_model(contents, conversation_id, prompt_key, priority=priority)
+        try:
+            if prompt_key:
+                # Identical first-turn prompts already in flight share that call's reply
+                assistant_message = self._single_flight.do(prompt_key, call)
+            else:
+                assistant_message = call()
+        except Exception:
+            self._abandon_turn(conversation_id, message)
+            raise
+        
+        return self._finish_turn(conversation_id, assistant_message)
+    
+    def _call_model(self, contents: List[types.Content], conversation_id: str,
+                    prompt_key: Optional[str] = None, params: Optional[Dict] = None,
+                    priority: str = "interactive") -> str:
+        """
+        Call Gemini once admitted at `priority`, trying each key at most once
+        (best key first), and return the reply text. `params` overrides the
+        generation settings (system prompt, max tokens, temperature).
+        """
+        with self._admit(priority):
+            return self._call_keys(contents, conversation_id, prompt_key, params)
+    
+    def _call_keys(self, contents: List[types.Content], conversation_id: str,
+                   prompt_key: Optional[str], params: Optional[Dict]) -> str:
+        tried = []
         last_error = None
         
-        while attempts < max_attempts:
-            client = self._get_client()
-            logger.info(f"Generating response for {conversation_id} using key index {self.current_key_index}")
+        while True:
+            index = self._acquire_key(tried)
+            if index is None:
+                break
+            logger.info(f"Generating response for {conversation_id} using key index {index}")
             
+            start = time.perf_counter()
             try:
-                response = client.models.generate_content(
-                    model=self.model_name,
-                    contents=contents,
-                    config=types.GenerateContentConfig(
-                        system_instruction=self.system_prompt,
-                        temperature=self.temperature,
-                        max_output_tokens=self.max_tokens,
-                    )
-                )
-                
-                assistant_message = response.text.strip()
-                
-                # Log assistant response
-                self.history_logs[conversation_id].append({
-                    "role": "model",  # Gemini uses 'model' instead of 'assistant' in contents
-                    "content": assistant_message
-                })
+                params = params or self._generation_params()
+                assistant_message = self.providers[index].generate(contents, **params)
+                self._release_key(index, start)
                 
-                logger.info(f"Response generated successfully for conversation: {conversation_id}")
-                
-                # Rotate key for the next request to balance load across all keys
-                self._rotate_key()
-                
-                return {
-                    "response": assistant_message,
-                    "conversation_id": conversation_id,
-                    "model": self.model_name
-                }
+                self._remember(prompt_key, assistant_message)
+                return assistant_message
                 
             except APIError as e:
                 # e.g., 429 Resource Exhausted, 403 Forbidden, etc.
-                logger.warning(f"API Error with key index {self.current_key_index}: {e}")
+                logger.warning(f"API Error with key index {index}: {e}")
                 last_error = e
-                self._rotate_key()
-                attempts += 1
-                if "503" in str(e) or "429" in str(e):
-                    time.sleep(1.5)
+                self._release_key(index, start, e)
             except Exception as e:
-                logger.error(f"Unexpected error with key index {self.current_key_index}: {e}")
+                logger.error(f"Unexpected error with key index {index}: {e}")
                 last_error = e
-                self._rotate_key()
-                attempts += 1
+                self._release_key(index, start, e)
                 
         # If we exhausted all keys
         logger.error(f"All API keys failed. Last error: {last_error}")
         raise Exception(f"Failed to generate AI response after trying all keys: {str(last_error)}")
     
+    def generate_response_stream(self, message: str, conversation_id: Optional[str] = None,
+                                 use_cache: bool = True, timezone: Optional[str] = None,
+                                 priority: str = "interactive") -> Iterator[Dict]:
+        """
+        Stream the AI response for a user message as it is generated.
+        
+        Yields {"delta": text, "conversation_id": id} for each partial chunk,
+        then a final {"done": True, ...} payload shaped like generate_response's
+        result once the full message has been logged to history. Keys are only
+        retried while nothing has been yielded yet. Local and cached replies
+        are yielded as a single chunk. A model stream is admitted (or rejected)
+        before its first chunk and holds the admission slot until it ends.
+        """
+        conversation_id, contents = self._start_turn(message, conversation_id)
+        
+        prompt_key = self._prompt_key(message, contents, use_cache)
+        ready = (self._serve_locally(conversation_id, message, timezone)
+                 or self._serve_from_cache(conversation_id, prompt_key))
+        if ready:
+            yield {"delta": ready["response"], "conversation_id": conversation_id}
+            ready["done"] = True
+            yield ready
+            return
+        
+        try:
+            with self._admit(priority):
+                tried = []
+                last_error = None
+            
+                while True:
+                    index = self._acquire_key(tried)
+                    if index is None:
+                        break
+                    logger.info(f"Streaming response for {conversation_id} using key index {index}")
+            
+                    chunks = []
+                    error = None
+                    start = time.perf_counter()
+                    try:
+                        for text in self.providers[index].stream(contents, **self._generation_params()):
+                            chunks.append(text)
+                            yield {"delta": text, "conversation_id": conversation_id}
+                    except Exception as e:
+                        error = e
+                    finally:
+                        # Hold the key for the whole stream, including a client disconnect
+                        self._release_key(index, start, error)
+            
+                    if error is None:
+                        assistant_message = "".join(chunks).strip()
+                        self._remember(prompt_key, assistant_message)
+                        result = self._finish_turn(conversation_id, assistant_message)
+                        result["done"] = True
+                        yield result
+                        return
+            
+                    logger.warning(f"Streaming error with key index {index}: {error}")
+                    last_error = error
+                    if chunks:
+                        # Partial output already reached the client; cannot retry transparently
+                        raise error
+            
+                logger.error(f"All API keys failed. Last error: {last_error}")
+                raise Exception(f"Failed to generate AI response after trying all keys: {str(last_error)}")
+        except Exception:
+            self._abandon_turn(conversation_id, message)
+            raise
+    
+    def generate_batch(self, requests: List[Dict], max_concurrency: Optional[int] = None) -> List[Dict]:
+        """
+        Generate responses for many messages concurrently.
+        
+        Each request is {"message": ..., "conversation_id": optional, "cache":
+        optional, "timezone": optional}. Results are returned in request order,
+        shaped like generate_response's; an item that fails gets
+        {"error": ..., "conversation_id": ...} instead of failing the batch.
+        Items sharing a conversation run one after another in order, the rest
+        in parallel with up to `max_concurrency` in flight (default:
+        batch_concurrency_per_key per API key), spread over the keys by the key pool.
+        """
+        conversation_ids, chains = self._plan_batch(requests)
+        results: List[Optional[Dict]] = [None] * len(requests)
+        
+        def run_chain(indices: List[int]) -> None:
+            for i in indices:
+                results[i] = self._run_batch_item(requests[i], conversation_ids[i])
+        
+        workers = min(max_concurrency or self._batch_concurrency(), len(chains))
+        if workers:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chat-batch") as pool:
+                list(pool.map(run_chain, chains))
+        return results
+    
+    def _batch_concurrency(self) -> int:
+        return max(1, len(self.clients) * self.batch_concurrency_per_key)
+    
+    def _plan_batch(self, requests: List[Dict]) -> Tuple[List[str], List[List[int]]]:
+        """
+        Assign every item a conversation id (new ones for items without) and
+        group item indices into chains that must run sequentially.
+        """
+        conversation_ids = []
+        chains: Dict[str, List[int]] = {}
+        for i, item in enumerate(requests):
+            conversation_id = item.get("conversation_id") if isinstance(item, dict) else None
+            conversation_id = conversation_id or self._generate_conversation_id()
+            conversation_ids.append(conversation_id)
+            chains.setdefault(conversation_id, []).append(i)
+        return conversation_ids, list(chains.values())
+    
+    @staticmethod
+    def _batch_message(item) -> str:
+        """Validate a batch item and return its message."""
+        if not isinstance(item, dict) or not isinstance(item.get("message"), str):
+            raise ValueError("Missing 'message' in batch item")
+        message = item["message"].strip()
+        if not message:
+            raise ValueError("Message cannot be empty")
+        return message
+    
+    def _batch_error(self, conversation_id: str, error: Exception) -> Dict:
+        logger.warning(f"Batch item for {conversation_id} failed: {error}")
+        self._batch_items.inc("error")
+        result = {"error": str(error), "conversation_id": conversation_id}
+        if isinstance(error, AdmissionRejected):
+            result["retry_after"] = error.retry_after
+        return result
+    
+    def _run_batch_item(self, item: Dict, conversation_id: str) -> Dict:
+        try:
+            result = self.generate_response(
+                self._batch_message(item), conversation_id,
+                use_cache=bool(item.get("cache", True)), timezone=item.get("timezone"), priority="batch"
+            )
+        except Exception as e:
+            return self._batch_error(conversation_id, e)
+        self._batch_items.inc("ok")
+        return result
+    
     def reset_conversation(self, conversation_id: str) -> bool:
         """Reset conversation history for a given ID"""
-        if conversation_id in self.history_logs:
-            del self.history_logs[conversation_id]
+        if self.history_logs.delete(conversation_id):
             logger.info(f"Conversation reset: {conversation_id}")
             return True
         return False
     
     def get_conversation_history(self, conversation_id: str) -> List[Dict]:
         """Get conversation history for a given ID"""
-        return self.history_logs.get(conversation_id, [])
+        return self.history_logs.get(conversation_id)
     
     @staticmethod
     def _generate_conversation_id() -> str:
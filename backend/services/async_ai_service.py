@@ -0,0 +1,239 @@
+"""
+Asyncio AI Service for handling Google Gemini API interactions
+"""
+from contextlib import nullcontext
+from google.genai.errors import APIError
+from google.genai import types
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+from .ai_service import AIService
+from .single_flight import AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAIService(AIService):
+    """
+    AIService variant for ASGI servers.
+
+    Model calls go through the providers' async Gemini surface (`client.aio`), and
+    waiting for a throttled key to cool down is an `asyncio.sleep`, so one
+    event loop can keep many requests in flight without tying up threads.
+    Conversation history, key selection and payload building are shared with
+    the synchronous AIService; with a store that waits on disk or the network
+    those calls run on a worker thread instead of the event loop.
+    """
+
+    # Longest time a request will wait for a cooling-down key before trying it
+    max_cooldown_wait = 1.5
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._single_flight = AsyncSingleFlight()
+
+    async def _wait_for_key(self, index: int) -> None:
+        """Yield to the event loop until the chosen key leaves its cooldown."""
+        remaining = self.key_pool.cooldown_remaining(index)
+        if remaining > 0:
+            await asyncio.sleep(min(remaining, self.max_cooldown_wait))
+
+    async def warmup(self) -> bool:
+        """Ping the API to warm it up without saving history (concurrent calls share one ping)."""
+        return await self._single_flight.do("warmup", self._ping)
+
+    async def _ping(self) -> bool:
+        index = self.key_pool.acquire()
+        start = time.perf_counter()
+        try:
+            await self.providers[index].aping()
+            self._release_key(index, start)
+            return True
+        except Exception as e:
+            logger.warning(f"Warmup failed: {e}")
+            self._release_key(index, start, e)
+            return False
+
+    async def _offload(self, func, *args):
+        """Run a call that touches the conversation store, off the event loop if the store blocks."""
+        if self.history_logs.blocking_io:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    async def areset_conversation(self, conversation_id: str) -> bool:
+        """Async counterpart of reset_conversation."""
+        return await self._offload(self.reset_conversation, conversation_id)
+
+    async def aget_conversation_history(self, conversation_id: str) -> List[Dict]:
+        """Async counterpart of get_conversation_history."""
+        return await self._offload(self.get_conversation_history, conversation_id)
+
+    def _aadmit(self, priority: str):
+        """Hold an admission slot, waiting on the event loop (no-op without admission control)."""
+        return self.admission.aadmit(priority) if self.admission is not None else nullcontext()
+
+    async def generate_response(self, message: str, conversation_id: Optional[str] = None,
+                                use_cache: bool = True, timezone: Optional[str] = None,
+                                priority: str = "interactive") -> Dict:
+        """
+        Generate AI response for user message, retrying across keys without blocking.
+        """
+        conversation_id, contents = await self._offload(self._start_turn, message, conversation_id)
+
+        local = await self._offload(self._serve_locally, conversation_id, message, timezone)
+        if local:
+            return local
+
+        prompt_key = self._prompt_key(message, contents, use_cache)
+        cached = await self._offload(self._serve_from_cache, conversation_id, prompt_key)
+        if cached:
+            return cached
+
+        call = lambda: self._call_model(contents, conversation_id, prompt_key, priority=priority)
+        try:
+            if prompt_key:
+                assistant_message = await self._single_flight.do(prompt_key, call)
+            else:
+                assistant_message = await call()
+        except Exception:
+            await self._offload(self._abandon_turn, conversation_id, message)
+            raise
+
+        return await self._offload(self._finish_turn, conversation_id, assistant_message)
+
+    async def _call_model(self, contents: List[types.Content], conversation_id: str,
+                          prompt_key: Optional[str] = None, params: Optional[Dict] = None,
+                          priority: str = "interactive") -> str:
+        """Call Gemini asynchronously once admitted at `priority`, trying each key at most once."""
+        async with self._aadmit(priority):
+            return await self._call_keys(contents, conversation_id, prompt_key, params)
+
+    async def _call_keys(self, contents: List[types.Content], conversation_id: str,
+                         prompt_key: Optional[str], params: Optional[Dict]) -> str:
+        tried = []
+        last_error = None
+
+        while True:
+            index = self._acquire_key(tried)
+            if index is None:
+                break
+            logger.info(f"Generating response for {conversation_id} using key index {index}")
+
+            start = time.perf_counter()
+            try:
+                await self._wait_for_key(index)
+                start = time.perf_counter()
+                assistant_message = await self.providers[index].agenerate(
+                    contents, **(params or self._generation_params()))
+                self._release_key(index, start)
+
+                self._remember(prompt_key, assistant_message)
+                return assistant_message
+
+            except APIError as e:
+                logger.warning(f"API Error with key index {index}: {e}")
+                last_error = e
+                self._release_key(index, start, e)
+            except Exception as e:
+                logger.error(f"Unexpected error with key index {index}: {e}")
+                last_error = e
+                self._release_key(index, start, e)
+
+        logger.error(f"All API keys failed. Last error: {last_error}")
+        raise Exception(f"Failed to generate AI response after trying all keys: {str(last_error)}")
+
+    async def generate_response_stream(self, message: str, conversation_id: Optional[str] = None,
+                                       use_cache: bool = True, timezone: Optional[str] = None,
+                                       priority: str = "interactive") -> AsyncIterator[Dict]:
+        """
+        Async counterpart of AIService.generate_response_stream with the same events.
+        """
+        conversation_id, contents = await self._offload(self._start_turn, message, conversation_id)
+
+        prompt_key = self._prompt_key(message, contents, use_cache)
+        ready = (await self._offload(self._serve_locally, conversation_id, message, timezone)
+                 or await self._offload(self._serve_from_cache, conversation_id, prompt_key))
+        if ready:
+            yield {"delta": ready["response"], "conversation_id": conversation_id}
+            ready["done"] = True
+            yield ready
+            return
+
+        try:
+            async with self._aadmit(priority):
+                tried = []
+                last_error = None
+
+                while True:
+                    index = self._acquire_key(tried)
+                    if index is None:
+                        break
+                    logger.info(f"Streaming response for {conversation_id} using key index {index}")
+
+                    chunks = []
+                    error = None
+                    start = time.perf_counter()
+                    try:
+                        await self._wait_for_key(index)
+                        start = time.perf_counter()
+                        async for text in self.providers[index].astream(contents, **self._generation_params()):
+                            chunks.append(text)
+                            yield {"delta": text, "conversation_id": conversation_id}
+                    except Exception as e:
+                        error = e
+                    finally:
+                        self._release_key(index, start, error)
+
+                    if error is None:
+                        assistant_message = "".join(chunks).strip()
+                        self._remember(prompt_key, assistant_message)
+                        result = await self._offload(self._finish_turn, conversation_id, assistant_message)
+                        result["done"] = True
+                        yield result
+                        return
+
+                    logger.warning(f"Streaming error with key index {index}: {error}")
+                    last_error = error
+                    if chunks:
+                        raise error
+
+                logger.error(f"All API keys failed. Last error: {last_error}")
+                raise Exception(f"Failed to generate AI response after trying all keys: {str(last_error)}")
+        except Exception:
+            await self._offload(self._abandon_turn, conversation_id, message)
+            raise
+
+    async def generate_batch(self, requests: List[Dict], max_concurrency: Optional[int] = None) -> List[Dict]:
+        """
+        Generate responses for many messages concurrently on the event loop.
+
+        Same contract as AIService.generate_batch: results in request order,
+        per-item errors, items of one conversation in order, and at most
+        `max_concurrency` items in flight.
+        """
+        conversation_ids, chains = self._plan_batch(requests)
+        results: List[Optional[Dict]] = [None] * len(requests)
+        limit = asyncio.Semaphore(max_concurrency or self._batch_concurrency())
+
+        async def run_item(i: int) -> Dict:
+            try:
+                message = self._batch_message(requests[i])
+                async with limit:
+                    result = await self.generate_response(
+                        message, conversation_ids[i],
+                        use_cache=bool(requests[i].get("cache", True)), timezone=requests[i].get("timezone"),
+                        priority="batch"
+                    )
+            except Exception as e:
+                return self._batch_error(conversation_ids[i], e)
+            self._batch_items.inc("ok")
+            return result
+
+        async def run_chain(indices: List[int]) -> None:
+            for i in indices:
+                results[i] = await run_item(i)
+
+        await asyncio.gather(*(run_chain(chain) for chain in chains))
+        return results
@@ -0,0 +1,161 @@
+"""
+Token-budgeted prompt context with rolling summaries for long conversations
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+import threading
+
+from .conversation_store import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# (previous summary or None, messages to fold in) -> new summary
+Summarizer = Callable[[Optional[str], List[Dict]], str]
+
+
+def count_tokens(messages: List[Dict]) -> int:
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+
+class ContextManager:
+    """
+    Keeps the prompt for each turn within `budget_tokens`.
+
+    The most recent turns (up to `recent_tokens`) are always sent verbatim.
+    Older turns are folded into a per-conversation rolling summary by
+    `summarizer` on a background thread, so no request waits for it. Until
+    their summary is ready they stay verbatim as long as the budget allows;
+    beyond that the oldest are dropped from the prompt (never from history).
+    """
+
+    def __init__(self, budget_tokens: int = 2000, recent_tokens: Optional[int] = None,
+                 summarizer: Optional[Summarizer] = None, max_workers: int = 2):
+        self.budget_tokens = budget_tokens
+        self.recent_tokens = recent_tokens if recent_tokens is not None else budget_tokens // 2
+        self.summarizer = summarizer
+        # Tokens the caller adds around a summary when presenting it
+        self.summary_overhead_tokens = 0
+
+        self._lock = threading.Lock()
+        # conversation_id -> {"summary": str, "anchor": last summarized messages}
+        self._summaries: Dict[str, Dict] = {}
+        # conversation_id -> summary job in flight
+        self._jobs: Dict[str, Future] = {}
+        self._idle = threading.Condition(self._lock)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="context-summary")
+        self._compactions = 0
+        self._failures = 0
+        self._dropped = 0
+        self._last_prompt_tokens = 0
+
+    @property
+    def max_summary_tokens(self) -> int:
+        """Length the summarizer should aim for, leaving the rest of the budget to turns."""
+        return max(50, (self.budget_tokens - self.recent_tokens) // 2)
+
+    def select(self, conversation_id: str, history: List[Dict]) -> Tuple[Optional[str], List[Dict]]:
+        """
+        Return (summary, messages to send verbatim) for a history ending in
+        the new user message, scheduling a summary update if older turns
+        are not covered yet.
+        """
+        with self._lock:
+            state = self._summaries.get(conversation_id)
+        summary = state["summary"] if state else None
+        summary_tokens = estimate_tokens(summary) + self.summary_overhead_tokens if summary else 0
+
+        # Verbatim tail, always including the new message and opening on a user turn
+        split, used = len(history), 0
+        while split > 0:
+            tokens = estimate_tokens(history[split - 1]["content"])
+            if split < len(history) and used + tokens > self.recent_tokens:
+                break
+            used += tokens
+            split -= 1
+        while split < len(history) - 1 and history[split]["role"] != "user":
+            used -= estimate_tokens(history[split]["content"])
+            split += 1
+
+        pending = history[self._summarized_until(history, state):split]
+
+        # Unsummarized turns stay in the prompt while they fit
+        room = self.budget_tokens - used - summary_tokens
+        first_kept = len(pending)
+        while first_kept > 0 and estimate_tokens(pending[first_kept - 1]["content"]) <= room:
+            room -= estimate_tokens(pending[first_kept - 1]["content"])
+            first_kept -= 1
+        while first_kept < len(pending) and pending[first_kept]["role"] != "user":
+            first_kept += 1
+
+        # Summarize only once the budget forces turns out; until then they go verbatim
+        if first_kept > 0:
+            self._schedule(conversation_id, summary, pending)
+        selected = pending[first_kept:] + history[split:]
+        with self._lock:
+            self._dropped += first_kept
+            self._last_prompt_tokens = count_tokens(selected) + summary_tokens
+        return summary, selected
+
+    def forget(self, conversation_id: str) -> None:
+        """Drop the summary (and ignore any job in flight) for a reset conversation."""
+        with self._lock:
+            self._summaries.pop(conversation_id, None)
+            self._jobs.pop(conversation_id, None)
+            self._idle.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Wait for summaries in flight."""
+        with self._idle:
+            self._idle.wait_for(lambda: not self._jobs, timeout)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "budget_tokens": self.budget_tokens,
+                "recent_tokens": self.recent_tokens,
+                "summarized_conversations": len(self._summaries),
+                "summaries_in_flight": len(self._jobs),
+                "compactions": self._compactions,
+                "summary_failures": self._failures,
+                "dropped_messages": self._dropped,
+                "last_prompt_tokens": self._last_prompt_tokens
+            }
+
+    @staticmethod
+    def _summarized_until(history: List[Dict], state: Optional[Dict]) -> int:
+        """Index of the first message after the ones the summary covers."""
+        if not state:
+            return 0
+        anchor = state["anchor"]
+        for end in range(len(history), len(anchor) - 1, -1):
+            if history[end - len(anchor):end] == anchor:
+                return end
+        # The store has trimmed past the summary, so everything left is newer
+        return 0
+
+    def _schedule(self, conversation_id: str, summary: Optional[str], pending: List[Dict]) -> None:
+        if self.summarizer is None:
+            return
+        with self._lock:
+            if conversation_id in self._jobs:
+                return
+            job = self._executor.submit(self.summarizer, summary, list(pending))
+            self._jobs[conversation_id] = job
+        job.add_done_callback(lambda done: self._finish(conversation_id, done, pending[-2:]))
+
+    def _finish(self, conversation_id: str, job: Future, anchor: List[Dict]) -> None:
+        with self._lock:
+            if self._jobs.get(conversation_id) is not job:
+                return  # forgotten while summarizing
+            del self._jobs[conversation_id]
+            self._idle.notify_all()
+            try:
+                self._summaries[conversation_id] = {"summary": job.result().strip(), "anchor": anchor}
+                self._compactions += 1
+            except Exception as e:
+                self._failures += 1
+                logger.warning(f"Summarizing conversation {conversation_id} failed: {e}")
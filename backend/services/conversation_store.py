@@ -0,0 +1,248 @@
+"""
+Conversation storage for AI Voice Assistant Backend
+"""
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Rough per-message bookkeeping overhead (dict, role string, list slot) in bytes
+MESSAGE_OVERHEAD_BYTES = 200
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) for windowing decisions."""
+    return max(1, len(text) // 4)
+
+
+def message_size(message: Dict) -> int:
+    """Approximate memory footprint of a stored message in bytes."""
+    return len(message["content"]) + MESSAGE_OVERHEAD_BYTES
+
+
+class ConversationStore:
+    """Interface for conversation history backends"""
+
+    # True if calls may wait on disk or the network (async callers run them on a thread)
+    blocking_io = False
+
+    def __init__(self):
+        self._eviction_listeners: List[Callable[[str], None]] = []
+
+    def get(self, conversation_id: str) -> List[Dict]:
+        """Return the stored messages for a conversation ([] if unknown)."""
+        raise NotImplementedError
+
+    def append(self, conversation_id: str, message: Dict) -> None:
+        """Append a message, creating the conversation if needed."""
+        raise NotImplementedError
+
+    def delete(self, conversation_id: str) -> bool:
+        """Drop a conversation. Returns False if it did not exist."""
+        raise NotImplementedError
+
+    def discard_last(self, conversation_id: str, message: Dict) -> bool:
+        """
+        Take back `message` if it is still the newest in the conversation
+        (the user turn of a request that got no reply). Returns False otherwise.
+        """
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        """Return size and eviction metrics for health reporting."""
+        raise NotImplementedError
+
+    def __contains__(self, conversation_id: str) -> bool:
+        raise NotImplementedError
+
+    def is_cached(self, conversation_id: str) -> bool:
+        """True if the conversation is held in memory (stores without a disk tier: if it exists)."""
+        return conversation_id in self
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def add_eviction_listener(self, listener: Callable[[str], None]) -> None:
+        """Register a callback invoked with the id of every dropped or trimmed conversation."""
+        self._eviction_listeners.append(listener)
+
+    def _notify(self, conversation_id: str) -> None:
+        for listener in self._eviction_listeners:
+            try:
+                listener(conversation_id)
+            except Exception as e:
+                logger.warning(f"Eviction listener failed for {conversation_id}: {e}")
+
+
+class InMemoryConversationStore(ConversationStore):
+    """
+    Bounded in-process conversation store.
+
+    Each conversation keeps at most `max_messages` messages and
+    `max_tokens` estimated tokens, trimmed oldest-first so the window always
+    starts with a user turn. Conversations are evicted least-recently-used
+    first when `max_conversations` or `max_bytes` is exceeded, and after
+    `idle_ttl` seconds without access.
+    """
+
+    def __init__(self, max_messages: int = 10, max_tokens: Optional[int] = None,
+                 max_conversations: int = 1000, idle_ttl: Optional[float] = 3600,
+                 max_bytes: Optional[int] = 50 * 1024 * 1024):
+        super().__init__()
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.max_conversations = max_conversations
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+
+        self._lock = threading.RLock()
+        # conversation_id -> {"messages": [...], "bytes": int, "tokens": int, "last_access": float}
+        self._conversations: "OrderedDict[str, Dict]" = OrderedDict()
+        self._total_bytes = 0
+        self._evictions = {"lru": 0, "ttl": 0, "memory": 0}
+        self._trimmed_messages = 0
+
+    def get(self, conversation_id: str) -> List[Dict]:
+        with self._lock:
+            expired = self._expire_idle()
+            entry = self._conversations.get(conversation_id)
+            messages = []
+            if entry is not None:
+                self._touch(conversation_id, entry)
+                messages = list(entry["messages"])
+
+        for expired_id in expired:
+            self._notify(expired_id)
+        return messages
+
+    def append(self, conversation_id: str, message: Dict) -> None:
+        evicted = []
+        with self._lock:
+            evicted += self._expire_idle()
+            entry = self._conversations.get(conversation_id)
+            if entry is None:
+                entry = {"messages": [], "bytes": 0, "tokens": 0, "last_access": 0.0}
+                self._conversations[conversation_id] = entry
+
+            entry["messages"].append(message)
+            entry["bytes"] += message_size(message)
+            entry["tokens"] += estimate_tokens(message["content"])
+            self._total_bytes += message_size(message)
+            self._touch(conversation_id, entry)
+
+            if self._trim(entry):
+                evicted.append(conversation_id)
+            evicted += self._enforce_limits(conversation_id)
+
+        for evicted_id in evicted:
+            self._notify(evicted_id)
+
+    def delete(self, conversation_id: str) -> bool:
+        with self._lock:
+            entry = self._conversations.pop(conversation_id, None)
+            if entry is None:
+                return False
+            self._total_bytes -= entry["bytes"]
+        self._notify(conversation_id)
+        return True
+
+    def discard_last(self, conversation_id: str, message: Dict) -> bool:
+        with self._lock:
+            entry = self._conversations.get(conversation_id)
+            if entry is None or not entry["messages"] or entry["messages"][-1] != message:
+                return False
+            entry["messages"].pop()
+            entry["bytes"] -= message_size(message)
+            entry["tokens"] -= estimate_tokens(message["content"])
+            self._total_bytes -= message_size(message)
+            if not entry["messages"]:
+                del self._conversations[conversation_id]
+        self._notify(conversation_id)
+        return True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "conversations": len(self._conversations),
+                "messages": sum(len(e["messages"]) for e in self._conversations.values()),
+                "bytes": self._total_bytes,
+                "max_conversations": self.max_conversations,
+                "max_bytes": self.max_bytes,
+                "evictions": dict(self._evictions),
+                "trimmed_messages": self._trimmed_messages
+            }
+
+    def __contains__(self, conversation_id: str) -> bool:
+        with self._lock:
+            return conversation_id in self._conversations
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._conversations)
+
+    def _touch(self, conversation_id: str, entry: Dict) -> None:
+        entry["last_access"] = time.monotonic()
+        self._conversations.move_to_end(conversation_id)
+
+    def _drop_front(self, entry: Dict) -> None:
+        message = entry["messages"].pop(0)
+        entry["bytes"] -= message_size(message)
+        entry["tokens"] -= estimate_tokens(message["content"])
+        self._total_bytes -= message_size(message)
+        self._trimmed_messages += 1
+
+    def _trim(self, entry: Dict) -> bool:
+        """Apply the per-conversation window. Returns True if messages were dropped."""
+        messages = entry["messages"]
+        trimmed = False
+        while len(messages) > 1 and (
+            (self.max_messages and len(messages) > self.max_messages) or
+            (self.max_tokens and entry["tokens"] > self.max_tokens)
+        ):
+            self._drop_front(entry)
+            trimmed = True
+        # Gemini expects the conversation to open with a user turn
+        while trimmed and len(messages) > 1 and messages[0]["role"] != "user":
+            self._drop_front(entry)
+        return trimmed
+
+    def _evict(self, conversation_id: str, reason: str) -> None:
+        entry = self._conversations.pop(conversation_id)
+        self._total_bytes -= entry["bytes"]
+        self._evictions[reason] += 1
+        logger.info(f"Evicted conversation {conversation_id} ({reason})")
+
+    def _expire_idle(self) -> List[str]:
+        """Drop conversations idle longer than the TTL (oldest are at the front)."""
+        if not self.idle_ttl:
+            return []
+        expired = []
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._conversations:
+            conversation_id, entry = next(iter(self._conversations.items()))
+            if entry["last_access"] > cutoff:
+                break
+            self._evict(conversation_id, "ttl")
+            expired.append(conversation_id)
+        return expired
+
+    def _enforce_limits(self, keep: str) -> List[str]:
+        """Evict least-recently-used conversations until within count and memory caps."""
+        evicted = []
+        while len(self._conversations) > 1:
+            if self.max_conversations and len(self._conversations) > self.max_conversations:
+                reason = "lru"
+            elif self.max_bytes and self._total_bytes > self.max_bytes:
+                reason = "memory"
+            else:
+                break
+            oldest = next(iter(self._conversations))
+            if oldest == keep:
+                break
+            self._evict(oldest, reason)
+            evicted.append(oldest)
+        return evicted
@@ -0,0 +1,128 @@
+"""
+Thread-safe API key pool for AI Voice Assistant Backend
+"""
+from typing import Dict, Iterable, List, Optional
+import logging
+import threading
+import time
+
+from .llm_providers import is_throttle_error
+
+logger = logging.getLogger(__name__)
+
+
+class KeyPool:
+    """
+    Hands out API key indices to concurrent requests.
+
+    Selection prefers healthy keys (not cooling down) with the fewest
+    in-flight requests, breaking ties by least recent use so load spreads
+    round-robin. Throttled keys cool down with exponential backoff and
+    recover automatically once the cooldown expires or a call succeeds.
+    """
+
+    def __init__(self, size: int, base_cooldown: float = 1.5, max_cooldown: float = 60.0):
+        self.size = size
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+
+        self._lock = threading.Lock()
+        self._in_flight = [0] * size
+        self._failures = [0] * size
+        self._cooldown_until = [0.0] * size
+        self._last_used = [0.0] * size
+        self._requests = [0] * size
+        self._throttles = [0] * size
+        self._errors = [0] * size
+        # Exponentially weighted moving average of call latency, in seconds
+        self._latency = [None] * size
+
+    def acquire(self, exclude: Iterable[int] = ()) -> Optional[int]:
+        """
+        Reserve the best available key and return its index.
+
+        Keys in `exclude` (e.g. already tried for this request) are skipped.
+        If every remaining key is cooling down, the one that recovers soonest
+        is returned. Returns None when no keys remain.
+        """
+        excluded = set(exclude)
+        with self._lock:
+            candidates = [i for i in range(self.size) if i not in excluded]
+            if not candidates:
+                return None
+
+            now = time.monotonic()
+            healthy = [i for i in candidates if self._cooldown_until[i] <= now]
+            if healthy:
+                index = min(healthy, key=lambda i: (self._in_flight[i], self._last_used[i]))
+            else:
+                index = min(candidates, key=lambda i: self._cooldown_until[i])
+
+            self._reserve(index, now)
+            return index
+
+    def reserve(self, index: int) -> int:
+        """Reserve a specific key regardless of its health (e.g. for health checks)."""
+        with self._lock:
+            self._reserve(index, time.monotonic())
+            return index
+
+    def _reserve(self, index: int, now: float) -> None:
+        self._in_flight[index] += 1
+        self._requests[index] += 1
+        self._last_used[index] = now
+
+    def release(self, index: int, success: bool = True, error: Optional[Exception] = None,
+                latency: Optional[float] = None) -> None:
+        """Return a key to the pool, updating its health from the call outcome."""
+        with self._lock:
+            self._in_flight[index] -= 1
+            if latency is not None:
+                previous = self._latency[index]
+                self._latency[index] = latency if previous is None else 0.8 * previous + 0.2 * latency
+            if success:
+                self._failures[index] = 0
+                self._cooldown_until[index] = 0.0
+                return
+
+            if error is not None and is_throttle_error(error):
+                self._failures[index] += 1
+                self._throttles[index] += 1
+                cooldown = min(self.max_cooldown, self.base_cooldown * 2 ** (self._failures[index] - 1))
+                self._cooldown_until[index] = time.monotonic() + cooldown
+                logger.warning(f"API key index {index} throttled, cooling down for {cooldown:.1f}s")
+            else:
+                self._errors[index] += 1
+
+    def cooldown_remaining(self, index: int) -> float:
+        """Seconds until a key leaves its cooldown (0 if healthy)."""
+        with self._lock:
+            return max(0.0, self._cooldown_until[index] - time.monotonic())
+
+    def available_in(self) -> float:
+        """Seconds until at least one key is out of cooldown (0 if one is healthy now)."""
+        with self._lock:
+            return max(0.0, min(self._cooldown_until) - time.monotonic()) if self.size else 0.0
+
+    def healthy_count(self) -> int:
+        """Number of keys not currently cooling down."""
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for until in self._cooldown_until if until <= now)
+
+    def stats(self) -> List[Dict]:
+        """Per-key load and health, indexed like the configured keys."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "index": i,
+                    "in_flight": self._in_flight[i],
+                    "requests": self._requests[i],
+                    "throttles": self._throttles[i],
+                    "errors": self._errors[i],
+                    "cooldown_remaining": round(max(0.0, self._cooldown_until[i] - now), 2),
+                    "latency_ms": round(self._latency[i] * 1000, 1) if self._latency[i] is not None else None
+                }
+                for i in range(self.size)
+            ]
@@ -0,0 +1,394 @@
+"""
+LLM provider layer shared by the backend services and the desktop assistant
+
+Each provider keeps one long-lived client with a pooled, keep-alive HTTP
+connection and explicit timeouts, and runs calls through a common retry
+policy. The module has no backend-internal imports so the desktop app can load
+it directly; provider SDKs are imported only when a provider is built.
+"""
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
+import asyncio
+import logging
+import os
+import random
+import time
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - only missing on very old SDK installs
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes that mean "this key is temporarily exhausted"
+THROTTLE_CODES = (429, 503)
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """Return True for rate-limit / overload errors that warrant a key cooldown."""
+    code = getattr(error, 'code', None)
+    if code in THROTTLE_CODES:
+        return True
+    message = str(error)
+    return any(str(c) in message for c in THROTTLE_CODES)
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Return True for timeouts, dropped connections and 5xx responses."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    return isinstance(code, int) and code >= 500
+
+
+def pool_limits(max_connections: int = 10, keepalive_expiry: float = 30.0):
+    """Connection pool limits for a provider's HTTP client."""
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=keepalive_expiry
+    )
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for failed provider calls.
+
+    Transient errors (timeouts, connection resets, 5xx) are always retried.
+    Throttling errors are retried only when `retry_throttled` is set; callers
+    that can move to another API key (the backend KeyPool) turn it off and
+    rotate instead of waiting.
+    """
+
+    def __init__(self, attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 retry_throttled: bool = True, sleep: Callable[[float], None] = time.sleep):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_throttled = retry_throttled
+        self.sleep = sleep
+
+    def should_retry(self, error: Exception, attempt: int) -> bool:
+        """True if a call that failed on `attempt` (1-based) should be tried again."""
+        if attempt >= self.attempts:
+            return False
+        if is_throttle_error(error):
+            return self.retry_throttled
+        return is_transient_error(error)
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def call(self, fn: Callable):
+        attempt = 1
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                delay = self.delay(attempt)
+                logger.warning(f"Retrying after {type(e).__name__} in {delay:.2f}s: {e}")
+                self.sleep(delay)
+                attempt += 1
+
+    async def acall(self, fn: Callable):
+        attempt = 1
+        while True:
+            try:
+                return await fn()
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                delay = self.delay(attempt)
+                logger.warning(f"Retrying after {type(e).__name__} in {delay:.2f}s: {e}")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+
+class LLMProvider:
+    """
+    A chat model behind a persistent client.
+
+    `messages` is the conversation so far, oldest first. generate() returns
+    the whole reply; stream() yields text deltas and only retries while
+    nothing has been yielded yet.
+    """
+
+    name = "base"
+
+    def __init__(self, model: str, retry: Optional[RetryPolicy] = None):
+        self.model = model
+        self.retry = retry or RetryPolicy()
+
+    def generate(self, messages: List, system_prompt: Optional[str] = None,
+                 max_tokens: int = 500, temperature: float = 0.7) -> str:
+        return self.retry.call(lambda: self._generate(messages, system_prompt, max_tokens, temperature))
+
+    def stream(self, messages: List, system_prompt: Optional[str] = None,
+               max_tokens: int = 500, temperature: float = 0.7) -> Iterator[str]:
+        attempt = 1
+        while True:
+            started = False
+            try:
+                for delta in self._stream(messages, system_prompt, max_tokens, temperature):
+                    if delta:
+                        started = True
+                        yield delta
+                return
+            except Exception as e:
+                if started or not self.retry.should_retry(e, attempt):
+                    raise
+                delay = self.retry.delay(attempt)
+                logger.warning(f"Retrying stream after {type(e).__name__} in {delay:.2f}s: {e}")
+                self.retry.sleep(delay)
+                attempt += 1
+
+    def ping(self) -> None:
+        """Send the smallest possible request, e.g. to open a pooled connection."""
+        self._generate([{"role": "user", "content": "ping"}], None, 1, 0.0)
+
+    def close(self) -> None:
+        pass
+
+    def _generate(self, messages, system_prompt, max_tokens, temperature) -> str:
+        raise NotImplementedError
+
+    def _stream(self, messages, system_prompt, max_tokens, temperature) -> Iterator[str]:
+        yield self._generate(messages, system_prompt, max_tokens, temperature)
+
+
+class OpenAIProvider(LLMProvider):
+    """
+    OpenAI chat completions.
+
+    With the v1 SDK the client owns a pooled httpx client (the SDK's own
+    retries are disabled in favour of the shared policy); the legacy v0 module
+    is still supported and keeps its requests session between calls.
+    """
+
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo", retry: Optional[RetryPolicy] = None,
+                 timeout: float = 30.0, max_connections: int = 10, client=None):
+        super().__init__(model, retry)
+        self.api_key = api_key
+        self.timeout = timeout
+        self.client = client
+        self._legacy = None
+        if client is None:
+            try:
+                from openai import OpenAI
+                self.client = OpenAI(
+                    api_key=api_key,
+                    timeout=timeout,
+                    max_retries=0,
+                    http_client=httpx.Client(timeout=timeout, limits=pool_limits(max_connections))
+                )
+            except ImportError:
+                import openai as legacy
+                self._legacy = legacy
+
+    def _params(self, messages, system_prompt, max_tokens, temperature) -> Dict:
+        history = [
+            {"role": "assistant" if m["role"] == "model" else m["role"], "content": m["content"]}
+            for m in messages
+        ]
+        if system_prompt:
+            history.insert(0, {"role": "system", "content": system_prompt})
+        return {"model": self.model, "messages": history, "max_tokens": max_tokens, "temperature": temperature}
+
+    def _create(self, params: Dict, stream: bool = False):
+        if self._legacy is not None:
+            return self._legacy.ChatCompletion.create(
+                **params, stream=stream, api_key=self.api_key, request_timeout=self.timeout
+            )
+        return self.client.chat.completions.create(**params, stream=stream)
+
+    def _generate(self, messages, system_prompt, max_tokens, temperature) -> str:
+        response = self._create(self._params(messages, system_prompt, max_tokens, temperature))
+        return response.choices[0].message.content.strip()
+
+    def _stream(self, messages, system_prompt, max_tokens, temperature) -> Iterator[str]:
+        stream = self._create(self._params(messages, system_prompt, max_tokens, temperature), stream=True)
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            yield delta.get("content") if self._legacy is not None else delta.content
+
+    def close(self) -> None:
+        if self.client is not None:
+            self.client.close()
+
+
+class GeminiProvider(LLMProvider):
+    """
+    Google Gemini through the google-genai client.
+
+    Messages may be plain dicts or prebuilt `types.Content` objects, which are
+    passed through untouched so callers can cache them. Async counterparts go
+    through the client's `aio` surface.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, model: str = "gemini-2.0-flash",
+                 retry: Optional[RetryPolicy] = None, timeout: float = 30.0,
+                 max_connections: int = 100, client=None):
+        super().__init__(model, retry)
+        from google.genai import types
+        self._types = types
+        self.client = client if client is not None else self.create_client(api_key, timeout, max_connections)
+
+    @staticmethod
+    def create_client(api_key: Optional[str], timeout: float = 30.0, max_connections: int = 100,
+                      base_url: Optional[str] = None):
+        """Build a genai client whose sync and async HTTP pools keep connections alive."""
+        from google import genai
+        from google.genai import types
+        options = {"timeout": int(timeout * 1000)}
+        if base_url:
+            options["base_url"] = base_url
+        if httpx is not None and "client_args" in types.HttpOptions.model_fields:
+            options["client_args"] = {"limits": pool_limits(max_connections)}
+            options["async_client_args"] = {"limits": pool_limits(max_connections)}
+        return genai.Client(api_key=api_key, http_options=types.HttpOptions(**options))
+
+    def to_contents(self, messages: List) -> List:
+        types = self._types
+        return [
+            m if isinstance(m, types.Content)
+            else types.Content(role="model" if m["role"] == "assistant" else m["role"],
+                               parts=[types.Part.from_text(text=m["content"])])
+            for m in messages
+        ]
+
+    def _config(self, system_prompt, max_tokens, temperature):
+        return self._types.GenerateContentConfig(
+            system_instruction=system_prompt,
+            temperature=temperature,
+            max_output_tokens=max_tokens,
+        )
+
+    def _generate(self, messages, system_prompt, max_tokens, temperature) -> str:
+        response = self.client.models.generate_content(
+            model=self.model,
+            contents=self.to_contents(messages),
+            config=self._config(system_prompt, max_tokens, temperature)
+        )
+        return response.text.strip()
+
+    def _stream(self, messages, system_prompt, max_tokens, temperature) -> Iterator[str]:
+        stream = self.client.models.generate_content_stream(
+            model=self.model,
+            contents=self.to_contents(messages),
+            config=self._config(system_prompt, max_tokens, temperature)
+        )
+        for chunk in stream:
+            yield chunk.text
+
+    def ping(self) -> None:
+        self.client.models.generate_content(model=self.model, contents="ping")
+
+    async def agenerate(self, messages: List, system_prompt: Optional[str] = None,
+                        max_tokens: int = 500, temperature: float = 0.7) -> str:
+        async def call():
+            response = await self.client.aio.models.generate_content(
+                model=self.model,
+                contents=self.to_contents(messages),
+                config=self._config(system_prompt, max_tokens, temperature)
+            )
+            return response.text.strip()
+        return await self.retry.acall(call)
+
+    async def astream(self, messages: List, system_prompt: Optional[str] = None,
+                      max_tokens: int = 500, temperature: float = 0.7) -> AsyncIterator[str]:
+        attempt = 1
+        while True:
+            started = False
+            try:
+                stream = await self.client.aio.models.generate_content_stream(
+                    model=self.model,
+                    contents=self.to_contents(messages),
+                    config=self._config(system_prompt, max_tokens, temperature)
+                )
+                async for chunk in stream:
+                    if chunk.text:
+                        started = True
+                        yield chunk.text
+                return
+            except Exception as e:
+                if started or not self.retry.should_retry(e, attempt):
+                    raise
+                delay = self.retry.delay(attempt)
+                logger.warning(f"Retrying stream after {type(e).__name__} in {delay:.2f}s: {e}")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def aping(self) -> None:
+        await self.client.aio.models.generate_content(model=self.model, contents="ping")
+
+
+class StubProvider(LLMProvider):
+    """
+    Offline provider returning a canned reply (or echoing the last user
+    message), streamed word by word. Useful for demos, tests and benchmarks.
+    """
+
+    name = "stub"
+
+    def __init__(self, reply: Optional[str] = None, model: str = "stub", delay: float = 0.0,
+                 retry: Optional[RetryPolicy] = None):
+        super().__init__(model, retry)
+        self.reply = reply
+        self.delay = delay
+        self.calls = 0
+
+    def _reply(self, messages) -> str:
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.reply is not None:
+            return self.reply
+        last = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        return f"You said: {last}"
+
+    def _generate(self, messages, system_prompt, max_tokens, temperature) -> str:
+        return self._reply(messages)
+
+    def _stream(self, messages, system_prompt, max_tokens, temperature) -> Iterator[str]:
+        words = self._reply(messages).split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+
+
+PROVIDERS = {
+    "openai": OpenAIProvider,
+    "gemini": GeminiProvider,
+    "stub": StubProvider,
+}
+
+# Environment variable holding each provider's API key
+API_KEY_ENV = {
+    "openai": "OPENAI_API_KEY",
+    "gemini": "GEMINI_API_KEY",
+}
+
+
+def create_provider(name: Optional[str] = None, api_key: Optional[str] = None, **kwargs) -> LLMProvider:
+    """
+    Build the provider selected by name or the LLM_PROVIDER environment
+    variable (default: openai). The API key defaults to the provider's usual
+    environment variable; LLM_MODEL overrides the default model.
+    """
+    name = (name or os.getenv("LLM_PROVIDER") or "openai").lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{name}'. Choose: {', '.join(PROVIDERS)}")
+    if os.getenv("LLM_MODEL") and "model" not in kwargs:
+        kwargs["model"] = os.getenv("LLM_MODEL")
+    if name in API_KEY_ENV:
+        kwargs["api_key"] = api_key or os.getenv(API_KEY_ENV[name])
+    return PROVIDERS[name](**kwargs)
@@ -0,0 +1,84 @@
+"""
+Local fast-path routing for deterministic requests (time, date)
+"""
+from datetime import datetime, tzinfo
+from typing import Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import re
+import threading
+
+# Polite wrappers around a bare question: "hey, could you tell me ... please"
+_PREFIX = (r"(?:(?:hey|hi|ok|okay)(?: assistant)? )?"
+           r"(?:(?:can|could|would) you (?:please )?(?:tell me )?|please (?:tell me )?|tell me |do you know )?")
+_SUFFIX = r"(?: (?:now|right now|today|please))*"
+
+
+class LocalRoute:
+    """A deterministic intent: a whole-message pattern and a reply built from the current time"""
+
+    def __init__(self, name: str, pattern: str, reply: Callable[[datetime], str]):
+        self.name = name
+        self.pattern = re.compile(_PREFIX + pattern + _SUFFIX)
+        self.reply = reply
+
+
+DEFAULT_ROUTES = [
+    LocalRoute(
+        "time",
+        r"(?:what(?:'s| is) the (?:current )?time|what time is it|the (?:current )?time)",
+        lambda now: f"The current time is {now.strftime('%I:%M %p')}"
+    ),
+    LocalRoute(
+        "date",
+        r"(?:what(?:'s| is) (?:the date|today's date|today)|what date is it|today's date|the date"
+        r"|what day is it|what day of the week is it)",
+        lambda now: f"Today is {now.strftime('%A, %B %d, %Y')}"
+    ),
+]
+
+
+def normalize(message: str) -> str:
+    """Lowercase, drop punctuation (keeping apostrophes) and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w'\s]", " ", message.lower()).split())
+
+
+class LocalRouter:
+    """
+    Answers deterministic requests without a model call.
+
+    A route only applies when it covers the whole message (allowing polite
+    wrappers), so "what time is it" is answered locally while "what time does
+    the museum open" still goes to the model. Replies use the caller's IANA
+    timezone when given, otherwise the server's local time.
+    """
+
+    def __init__(self, routes: Optional[List[LocalRoute]] = None):
+        self.routes = routes if routes is not None else DEFAULT_ROUTES
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {route.name: 0 for route in self.routes}
+        self._misses = 0
+
+    def route(self, message: str, timezone: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """Return (route name, reply) for a locally answerable message, else None."""
+        text = normalize(message)
+        for route in self.routes:
+            if route.pattern.fullmatch(text):
+                with self._lock:
+                    self._hits[route.name] += 1
+                return route.name, route.reply(datetime.now(self._zone(timezone)))
+        with self._lock:
+            self._misses += 1
+        return None
+
+    @staticmethod
+    def _zone(timezone: Optional[str]) -> Optional[tzinfo]:
+        if not timezone:
+            return None
+        try:
+            return ZoneInfo(timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            return None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"hits": dict(self._hits), "forwarded": self._misses}
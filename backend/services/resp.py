@@ -0,0 +1,497 @@
+"""
+Minimal Redis protocol (RESP) client and a local stand-in server
+
+The client implements the handful of redis-py methods the shared session
+store uses, so a real Redis (through redis-py or this client) and the
+in-process SessionServer are interchangeable.
+"""
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+import fnmatch
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RespError(Exception):
+    """Error reply from the server"""
+
+
+def encode_command(*args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode('utf-8')
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+def read_reply(stream, nested: bool = False):
+    """
+    Read one RESP value from a buffered binary stream.
+
+    Error replies raise RespError; inside arrays (e.g. EXEC results) they
+    are returned in place so the rest of the reply is still consumed.
+    """
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("Session store closed the connection")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode('utf-8')
+    if kind == b"-":
+        error = RespError(body.decode('utf-8'))
+        if nested:
+            return error
+        raise error
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(body)
+        if count < 0:
+            return None
+        return [read_reply(stream, nested=True) for _ in range(count)]
+    raise RespError(f"Unexpected reply type {kind!r}")
+
+
+def parse_address(url: str) -> Tuple[int, object]:
+    """Socket family and address for redis://, tcp:// and unix:// URLs."""
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        return socket.AF_UNIX, parsed.path
+    if parsed.scheme in ("redis", "tcp"):
+        return socket.AF_INET, (parsed.hostname or "127.0.0.1", 6379 if parsed.port is None else parsed.port)
+    raise ValueError(f"Unsupported session store URL '{url}'. Use redis://, tcp:// or unix://")
+
+
+def _score_args(mapping: Dict) -> List:
+    """ZADD arguments (score, member, ...) for a redis-py style {member: score} mapping."""
+    return [arg for member, score in mapping.items() for arg in (score, member)]
+
+
+class RespClient:
+    """
+    Thread-safe RESP client with one persistent connection per thread.
+
+    Method names and return values (bytes for strings) follow redis-py.
+    A dropped connection is reopened once before the error is raised.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+        self._family, self._address = parse_address(url)
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.socket(self._family, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self._address)
+            if self._family == socket.AF_INET:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = self._local.conn = (sock, sock.makefile('rb'))
+        return conn
+
+    def _close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+
+    def execute_many(self, commands: List[tuple]) -> List:
+        """Send commands in one write and read their replies in order."""
+        payload = b"".join(encode_command(*command) for command in commands)
+        for attempt in (1, 2):
+            try:
+                sock, stream = self._connection()
+                sock.sendall(payload)
+                break
+            except OSError:
+                self._close()
+                if attempt == 2:
+                    raise
+        replies = []
+        try:
+            for _ in commands:
+                try:
+                    replies.append(read_reply(stream))
+                except RespError as e:
+                    replies.append(e)
+        except OSError:
+            self._close()
+            raise
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def execute_command(self, *args):
+        return self.execute_many([args])[0]
+
+    def pipeline(self, transaction: bool = True) -> "RespPipeline":
+        return RespPipeline(self, transaction)
+
+    def ping(self) -> bool:
+        return self.execute_command("PING") == "PONG"
+
+    def get(self, key):
+        return self.execute_command("GET", key)
+
+    def incr(self, key) -> int:
+        return self.execute_command("INCR", key)
+
+    def rpush(self, key, *values) -> int:
+        return self.execute_command("RPUSH", key, *values)
+
+    def lrange(self, key, start: int, end: int) -> List[bytes]:
+        return self.execute_command("LRANGE", key, start, end)
+
+    def ltrim(self, key, start: int, end: int) -> bool:
+        return self.execute_command("LTRIM", key, start, end) == "OK"
+
+    def lrem(self, key, count: int, value) -> int:
+        return self.execute_command("LREM", key, count, value)
+
+    def llen(self, key) -> int:
+        return self.execute_command("LLEN", key)
+
+    def expire(self, key, seconds: int) -> bool:
+        return bool(self.execute_command("EXPIRE", key, int(seconds)))
+
+    def delete(self, *keys) -> int:
+        return self.execute_command("DEL", *keys)
+
+    def exists(self, *keys) -> int:
+        return self.execute_command("EXISTS", *keys)
+
+    def zadd(self, key, mapping: Dict) -> int:
+        return self.execute_command("ZADD", key, *_score_args(mapping))
+
+    def zrem(self, key, *members) -> int:
+        return self.execute_command("ZREM", key, *members)
+
+    def zremrangebyscore(self, key, min, max) -> int:
+        return self.execute_command("ZREMRANGEBYSCORE", key, min, max)
+
+    def zcard(self, key) -> int:
+        return self.execute_command("ZCARD", key)
+
+    def keys(self, pattern="*") -> List[bytes]:
+        return self.execute_command("KEYS", pattern)
+
+    def dbsize(self) -> int:
+        return self.execute_command("DBSIZE")
+
+
+class RespPipeline:
+    """
+    Queues commands and sends them in a single round trip on execute().
+    With `transaction` (the redis-py default) they run atomically in MULTI/EXEC.
+    """
+
+    def __init__(self, client: RespClient, transaction: bool = True):
+        self.client = client
+        self.transaction = transaction
+        self.commands: List[tuple] = []
+
+    def _queue(self, *args) -> "RespPipeline":
+        self.commands.append(args)
+        return self
+
+    def get(self, key):
+        return self._queue("GET", key)
+
+    def incr(self, key):
+        return self._queue("INCR", key)
+
+    def rpush(self, key, *values):
+        return self._queue("RPUSH", key, *values)
+
+    def lrange(self, key, start: int, end: int):
+        return self._queue("LRANGE", key, start, end)
+
+    def ltrim(self, key, start: int, end: int):
+        return self._queue("LTRIM", key, start, end)
+
+    def lrem(self, key, count: int, value):
+        return self._queue("LREM", key, count, value)
+
+    def llen(self, key):
+        return self._queue("LLEN", key)
+
+    def expire(self, key, seconds: int):
+        return self._queue("EXPIRE", key, int(seconds))
+
+    def delete(self, *keys):
+        return self._queue("DEL", *keys)
+
+    def zadd(self, key, mapping: Dict):
+        return self._queue("ZADD", key, *_score_args(mapping))
+
+    def zrem(self, key, *members):
+        return self._queue("ZREM", key, *members)
+
+    def zremrangebyscore(self, key, min, max):
+        return self._queue("ZREMRANGEBYSCORE", key, min, max)
+
+    def zcard(self, key):
+        return self._queue("ZCARD", key)
+
+    def execute(self) -> List:
+        commands, self.commands = self.commands, []
+        if not commands:
+            return []
+        if not self.transaction:
+            return self.client.execute_many(commands)
+        replies = self.client.execute_many([("MULTI",), *commands, ("EXEC",)])[-1]
+        if replies is None:
+            raise RespError("Transaction aborted")
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class SessionServer:
+    """
+    In-process stand-in for Redis, serving the session store's commands
+    (strings, lists, counters, sorted sets and expiry) to every worker over a local socket.
+
+    Meant for a single host (e.g. started by the gunicorn master); point
+    SESSION_STORE_URL at a real Redis for multi-host deployments.
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or "tcp://127.0.0.1:0"
+        family, address = parse_address(self.url)
+        self._data: Dict[bytes, object] = {}
+        self._expires: Dict[bytes, float] = {}
+        self._lock = threading.RLock()
+        self._commands = 0
+
+        if family == socket.AF_UNIX:
+            if os.path.exists(address):
+                os.unlink(address)
+            server_class = _UnixServer
+        else:
+            server_class = _TCPServer
+        self._server = server_class(address, self._make_handler())
+        if family == socket.AF_INET:
+            host, port = self._server.server_address[:2]
+            self.url = f"tcp://{host}:{port}"
+        self._thread = None
+
+    def start(self) -> "SessionServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="session-server", daemon=True)
+        self._thread.start()
+        logger.info(f"Session server listening on {self.url}")
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        family, address = parse_address(self.url)
+        if family == socket.AF_UNIX and os.path.exists(address):
+            os.unlink(address)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                transaction = None
+                while True:
+                    try:
+                        command = read_reply(self.rfile)
+                    except (ConnectionError, OSError):
+                        return
+                    name = command[0].upper()
+                    if name == b"MULTI":
+                        transaction = []
+                        reply = b"+OK\r\n"
+                    elif name == b"EXEC" and transaction is not None:
+                        reply = server.exec_transaction(transaction)
+                        transaction = None
+                    elif transaction is not None:
+                        transaction.append(command)
+                        reply = b"+QUEUED\r\n"
+                    else:
+                        reply = server.dispatch(command)
+                    self.wfile.write(reply)
+
+        return Handler
+
+    def dispatch(self, command: List[bytes]) -> bytes:
+        name = command[0].decode('utf-8').upper()
+        handler = getattr(self, f"_cmd_{name.lower()}", None)
+        if handler is None:
+            return b"-ERR unknown command '%s'\r\n" % name.encode('utf-8')
+        with self._lock:
+            self._commands += 1
+            if self._commands % 1000 == 0:
+                self._sweep()
+            try:
+                return handler(*command[1:])
+            except (TypeError, ValueError) as e:
+                return b"-ERR %s\r\n" % str(e).encode('utf-8')
+
+    def exec_transaction(self, commands: List[List[bytes]]) -> bytes:
+        """Run queued MULTI commands back to back, with no other client interleaved."""
+        with self._lock:
+            replies = [self.dispatch(command) for command in commands]
+        return b"*%d\r\n" % len(replies) + b"".join(replies)
+
+    def _sweep(self) -> None:
+        """Drop expired keys nobody has read since they expired."""
+        for key in [k for k, deadline in self._expires.items() if deadline <= time.monotonic()]:
+            self._live(key)
+
+    # Reply encoders
+    @staticmethod
+    def _int(value: int) -> bytes:
+        return b":%d\r\n" % value
+
+    @staticmethod
+    def _bulk(value: Optional[bytes]) -> bytes:
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _live(self, key: bytes):
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return self._data.get(key)
+
+    def _cmd_ping(self, *args):
+        return b"+PONG\r\n"
+
+    def _cmd_get(self, key):
+        value = self._live(key)
+        if isinstance(value, int):
+            value = str(value).encode('utf-8')
+        return self._bulk(value)
+
+    def _cmd_incr(self, key):
+        value = int(self._live(key) or 0) + 1
+        self._data[key] = value
+        return self._int(value)
+
+    def _cmd_rpush(self, key, *values):
+        items = self._live(key)
+        if items is None:
+            items = self._data[key] = []
+        items.extend(values)
+        return self._int(len(items))
+
+    def _cmd_lrange(self, key, start, end):
+        items = self._live(key) or []
+        start, end = int(start), int(end)
+        selected = items[start:] if end == -1 else items[start:end + 1]
+        return b"*%d\r\n" % len(selected) + b"".join(self._bulk(item) for item in selected)
+
+    def _cmd_ltrim(self, key, start, end):
+        items = self._live(key)
+        if items is not None:
+            start, end = int(start), int(end)
+            items[:] = items[start:] if end == -1 else items[start:end + 1]
+            if not items:
+                self._data.pop(key, None)
+        return b"+OK\r\n"
+
+    def _cmd_lrem(self, key, count, value):
+        items = self._live(key)
+        if items is None:
+            return self._int(0)
+        count = int(count)
+        # Negative counts remove from the tail, zero removes every match
+        positions = [i for i, item in enumerate(items) if item == value]
+        if count < 0:
+            positions = positions[count:]
+        elif count > 0:
+            positions = positions[:count]
+        for i in reversed(positions):
+            del items[i]
+        if not items:
+            self._data.pop(key, None)
+        return self._int(len(positions))
+
+    def _cmd_llen(self, key):
+        return self._int(len(self._live(key) or []))
+
+    def _cmd_expire(self, key, seconds):
+        if self._live(key) is None:
+            return self._int(0)
+        self._expires[key] = time.monotonic() + int(seconds)
+        return self._int(1)
+
+    def _cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._live(key) is not None:
+                removed += 1
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return self._int(removed)
+
+    def _cmd_exists(self, *keys):
+        return self._int(sum(1 for key in keys if self._live(key) is not None))
+
+    def _cmd_zadd(self, key, *pairs):
+        if not pairs or len(pairs) % 2:
+            raise ValueError("wrong number of arguments for 'zadd'")
+        members = self._live(key)
+        if members is None:
+            members = self._data[key] = {}
+        added = 0
+        for score, member in zip(pairs[::2], pairs[1::2]):
+            added += member not in members
+            members[member] = float(score)
+        return self._int(added)
+
+    def _cmd_zrem(self, key, *names):
+        members = self._live(key) or {}
+        removed = sum(1 for name in names if members.pop(name, None) is not None)
+        if key in self._data and not members:
+            self._data.pop(key, None)
+        return self._int(removed)
+
+    def _cmd_zremrangebyscore(self, key, low, high):
+        members = self._live(key) or {}
+        low, high = float(low), float(high)
+        doomed = [name for name, score in members.items() if low <= score <= high]
+        return self._cmd_zrem(key, *doomed) if doomed else self._int(0)
+
+    def _cmd_zcard(self, key):
+        return self._int(len(self._live(key) or {}))
+
+    def _cmd_keys(self, pattern):
+        pattern = pattern.decode('utf-8')
+        matches = [key for key in list(self._data)
+                   if fnmatch.fnmatchcase(key.decode('utf-8'), pattern) and self._live(key) is not None]
+        return b"*%d\r\n" % len(matches) + b"".join(self._bulk(key) for key in matches)
+
+    def _cmd_dbsize(self):
+        return self._int(sum(1 for key in list(self._data) if self._live(key) is not None))
@@ -0,0 +1,128 @@
+"""
+Response cache for repeated first-turn prompts
+"""
+from collections import OrderedDict
+from typing import Dict, Optional
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s']")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_message(message: str) -> str:
+    """Fold case, punctuation and spacing so near-identical prompts share an entry."""
+    message = _PUNCTUATION.sub(" ", message.lower())
+    return _WHITESPACE.sub(" ", message).strip()
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of model replies for stateless prompts.
+
+    Entries are keyed on the normalized message together with the model,
+    temperature and system prompt that produced them. When `path` is set the
+    cache is loaded from that JSON file at startup and rewritten every
+    `persist_every` new entries (and on `save()`).
+    """
+
+    def __init__(self, max_entries: int = 500, ttl: Optional[float] = 3600,
+                 path: Optional[str] = None, persist_every: int = 20):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.persist_every = persist_every
+
+        self._lock = threading.Lock()
+        # key -> (response, stored_at wall-clock time so entries survive restarts)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._unsaved = 0
+
+        if path:
+            self._load()
+
+    @staticmethod
+    def make_key(message: str, model: str, temperature: float, system_prompt: str) -> str:
+        """Build the cache key for a prompt and the settings that shape its reply."""
+        raw = json.dumps([normalize_message(message), model, temperature, system_prompt])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response, or None on miss/expiry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key: str, response: str) -> None:
+        """Store a response, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = (response, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            should_save = self.path and self._unsaved >= self.persist_every
+
+        if should_save:
+            self.save()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0
+            }
+
+    def save(self) -> None:
+        """Write unexpired entries to disk atomically (no-op without a path)."""
+        if not self.path:
+            return
+        with self._lock:
+            entries = [[k, v[0], v[1]] for k, v in self._entries.items() if not self._expired(v)]
+            self._unsaved = 0
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to persist response cache to {self.path}: {e}")
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable response cache {self.path}: {e}")
+            return
+
+        for key, response, stored_at in entries[-self.max_entries:]:
+            if not self._expired((response, stored_at)):
+                self._entries[key] = (response, stored_at)
+        logger.info(f"Loaded {len(self._entries)} cached responses from {self.path}")
+
+    def _expired(self, entry: tuple) -> bool:
+        return bool(self.ttl) and time.time() - entry[1] > self.ttl
@@ -0,0 +1,209 @@
+"""
+Cross-process conversation store for AI Voice Assistant Backend
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+import threading
+import time
+
+from .conversation_store import ConversationStore, estimate_tokens, message_size
+from .resp import RespClient
+
+logger = logging.getLogger(__name__)
+
+
+def connect_session_store(url: str):
+    """
+    Client for a session store URL.
+
+    redis:// uses redis-py when it is installed; otherwise (and for tcp://
+    and unix://, e.g. the SessionServer started by gunicorn.conf.py) the
+    built-in RESP client is used. Both expose the same methods.
+    """
+    if url.startswith("redis://"):
+        try:
+            import redis
+            return redis.Redis.from_url(url)
+        except ImportError:
+            logger.info("redis-py not installed, using the built-in RESP client")
+    return RespClient(url)
+
+
+class RedisConversationStore(ConversationStore):
+    """
+    Conversation store shared by every worker process through Redis (or the
+    local SessionServer stand-in).
+
+    Each conversation is a Redis list of JSON messages plus a version
+    counter, both refreshed to expire after `idle_ttl` seconds. A sorted
+    set indexes conversations by expiry time so they can be counted
+    without scanning the keyspace. An append is
+    one atomic round trip (push, trim to `max_messages`, bump the version).
+    Workers keep the conversations they served last in a small local cache;
+    a read first fetches the version only, and the cached copy is used
+    while no other worker has written since. Requests that keep landing on
+    the same worker therefore avoid re-downloading the history, and any
+    worker can still continue any conversation.
+    """
+
+    # Every call is at least one round trip to Redis
+    blocking_io = True
+
+    def __init__(self, client, max_messages: int = 10, max_tokens: Optional[int] = None,
+                 idle_ttl: Optional[float] = 3600, local_cache_size: int = 1000,
+                 prefix: str = "conversation:"):
+        super().__init__()
+        self.client = client
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.idle_ttl = idle_ttl
+        self.local_cache_size = local_cache_size
+        self.prefix = prefix
+        # Outside the prefix so no conversation ID can collide with it
+        self.index_key = prefix.rstrip(":") + "-index"
+
+        self._lock = threading.Lock()
+        # conversation_id -> (version, messages), least recently used first
+        self._cache: "OrderedDict[str, Tuple[int, List[Dict]]]" = OrderedDict()
+        self._local_hits = 0
+        self._remote_reads = 0
+        self._trimmed_messages = 0
+
+    def _keys(self, conversation_id: str) -> Tuple[str, str]:
+        key = self.prefix + conversation_id
+        return key, key + ":v"
+
+    def get(self, conversation_id: str) -> List[Dict]:
+        key, version_key = self._keys(conversation_id)
+        with self._lock:
+            cached = self._cache.get(conversation_id)
+
+        if cached is not None:
+            version = self.client.get(version_key)
+            if version is not None and int(version) == cached[0]:
+                with self._lock:
+                    self._local_hits += 1
+                    if conversation_id in self._cache:
+                        self._cache.move_to_end(conversation_id)
+                return self._window(cached[1])
+
+        version, raw = self.client.pipeline().get(version_key).lrange(key, 0, -1).execute()
+        with self._lock:
+            self._remote_reads += 1
+        if version is None:
+            self._forget(conversation_id)
+            return []
+        messages = [json.loads(item) for item in raw]
+        self._remember(conversation_id, int(version), messages)
+        return self._window(messages)
+
+    def append(self, conversation_id: str, message: Dict) -> None:
+        key, version_key = self._keys(conversation_id)
+        pipe = self.client.pipeline()
+        pipe.rpush(key, json.dumps(message))
+        if self.max_messages:
+            pipe.ltrim(key, -self.max_messages, -1)
+        pipe.incr(version_key)
+        if self.idle_ttl:
+            pipe.expire(key, int(self.idle_ttl))
+            pipe.expire(version_key, int(self.idle_ttl))
+        pipe.zadd(self.index_key, {conversation_id: time.time() + self.idle_ttl if self.idle_ttl else "+inf"})
+        replies = pipe.execute()
+        length, version = replies[0], replies[2 if self.max_messages else 1]
+        if self.max_messages and length > self.max_messages:
+            with self._lock:
+                self._trimmed_messages += length - self.max_messages
+
+        # Extend the local copy only if no other worker wrote in between
+        with self._lock:
+            cached = self._cache.get(conversation_id)
+        if cached is not None and cached[0] == version - 1:
+            messages = cached[1] + [message]
+            if self.max_messages:
+                messages = messages[-self.max_messages:]
+            self._remember(conversation_id, version, messages)
+        elif version == 1:
+            self._remember(conversation_id, version, [message])
+        else:
+            self._forget(conversation_id)
+
+    def delete(self, conversation_id: str) -> bool:
+        removed = self.client.pipeline().delete(*self._keys(conversation_id)).zrem(
+            self.index_key, conversation_id).execute()[0]
+        with self._lock:
+            self._cache.pop(conversation_id, None)
+        self._notify(conversation_id)
+        return removed > 0
+
+    def discard_last(self, conversation_id: str, message: Dict) -> bool:
+        key, version_key = self._keys(conversation_id)
+        last = self.client.lrange(key, -1, -1)
+        if not last or json.loads(last[0]) != message:
+            return False
+        # LREM from the tail removes this message even if another worker appended since
+        removed, _, remaining = self.client.pipeline().lrem(key, -1, last[0]).incr(version_key).llen(key).execute()
+        if remaining == 0:
+            self.client.pipeline().delete(key, version_key).zrem(self.index_key, conversation_id).execute()
+        self._forget(conversation_id)
+        return removed > 0
+
+    def is_cached(self, conversation_id: str) -> bool:
+        with self._lock:
+            return conversation_id in self._cache
+
+    def __contains__(self, conversation_id: str) -> bool:
+        return self.client.exists(self._keys(conversation_id)[1]) > 0
+
+    def __len__(self) -> int:
+        # Drop index entries whose conversation has expired, then count the rest
+        return self.client.pipeline().zremrangebyscore(self.index_key, "-inf", time.time()).zcard(
+            self.index_key).execute()[1]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = {
+                "backend": "shared",
+                "local_conversations": len(self._cache),
+                # Only this worker's local copies; the shared copy lives in the session store
+                "bytes": sum(message_size(m) for _, messages in self._cache.values() for m in messages),
+                "local_hits": self._local_hits,
+                "remote_reads": self._remote_reads,
+                "trimmed_messages": self._trimmed_messages
+            }
+        try:
+            stats["conversations"] = len(self)
+        except Exception as e:
+            stats["conversations"] = 0
+            stats["error"] = str(e)
+        return stats
+
+    def _window(self, messages: List[Dict]) -> List[Dict]:
+        """Apply the token cap and start the window on a user turn."""
+        start = 0
+        if self.max_tokens:
+            tokens = sum(estimate_tokens(m["content"]) for m in messages)
+            while len(messages) - start > 1 and tokens > self.max_tokens:
+                tokens -= estimate_tokens(messages[start]["content"])
+                start += 1
+        # Gemini expects the conversation to open with a user turn
+        while len(messages) - start > 1 and messages[start]["role"] != "user":
+            start += 1
+        return messages[start:]
+
+    def _remember(self, conversation_id: str, version: int, messages: List[Dict]) -> None:
+        evicted = []
+        with self._lock:
+            self._cache[conversation_id] = (version, messages)
+            self._cache.move_to_end(conversation_id)
+            while len(self._cache) > self.local_cache_size:
+                evicted.append(self._cache.popitem(last=False)[0])
+        for evicted_id in evicted:
+            self._notify(evicted_id)
+
+    def _forget(self, conversation_id: str) -> None:
+        with self._lock:
+            dropped = self._cache.pop(conversation_id, None)
+        if dropped is not None:
+            self._notify(conversation_id)
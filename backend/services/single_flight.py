@@ -0,0 +1,104 @@
+"""
+Request coalescing for identical in-flight upstream calls
+"""
+from typing import Any, Awaitable, Callable, Dict
+import asyncio
+import threading
+
+
+class _Call:
+    """A single in-flight call that followers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight block until it finishes and receive the same result (or
+    exception). Once it completes, the next call for that key runs afresh.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._executed = 0
+        self._coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._executed += 1
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executed": self._executed,
+                "coalesced": self._coalesced
+            }
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight for use on a single event loop"""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._executed = 0
+        self._coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is not None:
+            self._coalesced += 1
+            # shield so a cancelled follower does not cancel the shared call
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self._executed += 1
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unobserved failure does not log a warning
+            future.exception()
+            raise
+        finally:
+            del self._calls[key]
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._calls),
+            "executed": self._executed,
+            "coalesced": self._coalesced
+        }
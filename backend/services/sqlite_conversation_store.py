@@ -0,0 +1,294 @@
+"""
+Disk-backed conversation journal for AI Voice Assistant Backend
+"""
+from typing import Dict, List, Optional
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from .conversation_store import ConversationStore, InMemoryConversationStore
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_conversation ON messages (conversation_id, id);
+"""
+
+_STOP = object()
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Conversation store that survives restarts.
+
+    Live conversations are served from a bounded InMemoryConversationStore.
+    Every message is also appended to a SQLite journal by a background
+    writer thread that commits whatever arrives within `flush_interval` in
+    one transaction, so a request never waits on disk and one fsync covers
+    many turns. A conversation missing from memory
+    (after a restart, or once evicted) is loaded lazily from the journal on
+    first access. The journal is compacted periodically down to the messages
+    the in-memory window could still use, and conversations with no new
+    message for the in-memory store's `idle_ttl` are deleted from it then.
+    """
+
+    # Loading a conversation reads the journal, and reads wait for its pending writes
+    blocking_io = True
+
+    def __init__(self, path: str, memory: Optional[InMemoryConversationStore] = None,
+                 batch_size: int = 256, flush_interval: float = 0.05,
+                 compact_interval: Optional[float] = 600, synchronous: str = "FULL"):
+        super().__init__()
+        self.path = path
+        self.memory = memory if memory is not None else InMemoryConversationStore()
+        self.memory.add_eviction_listener(self._notify)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+
+        self._reader = self._connect(synchronous)
+        self._reader.executescript(_SCHEMA)
+        self._reader_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+        self._queue: "queue.Queue" = queue.Queue()
+        # conversation_id -> queued operations not yet committed
+        self._pending: Dict[str, int] = {}
+        self._pending_lock = threading.Lock()
+        self._written = 0
+        self._batches = 0
+        self._loads = 0
+        self._compacted = 0
+        self._expired = 0
+        self._writer = threading.Thread(
+            target=self._write_loop, args=(synchronous,), name="conversation-journal", daemon=True
+        )
+        self._writer.start()
+
+    def _connect(self, synchronous: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+        return conn
+
+    def get(self, conversation_id: str) -> List[Dict]:
+        self._ensure_loaded(conversation_id)
+        return self.memory.get(conversation_id)
+
+    def append(self, conversation_id: str, message: Dict) -> None:
+        self._ensure_loaded(conversation_id)
+        self.memory.append(conversation_id, message)
+        self._enqueue("append", conversation_id, message)
+
+    def delete(self, conversation_id: str) -> bool:
+        existed = conversation_id in self
+        self.memory.delete(conversation_id)
+        self._enqueue("delete", conversation_id)
+        return existed
+
+    def discard_last(self, conversation_id: str, message: Dict) -> bool:
+        if not self.memory.discard_last(conversation_id, message):
+            return False
+        self._enqueue("discard", conversation_id, message)
+        return True
+
+    def is_cached(self, conversation_id: str) -> bool:
+        return conversation_id in self.memory
+
+    def __contains__(self, conversation_id: str) -> bool:
+        if conversation_id in self.memory:
+            return True
+        self._wait_for_writes(conversation_id)
+        return bool(self._read_latest(conversation_id, 1))
+
+    def __len__(self) -> int:
+        self.flush()
+        with self._reader_lock:
+            return self._reader.execute("SELECT COUNT(DISTINCT conversation_id) FROM messages").fetchone()[0]
+
+    def stats(self) -> Dict:
+        stats = self.memory.stats()
+        stats.update({
+            "backend": "sqlite",
+            "path": self.path,
+            "pending_writes": self._queue.qsize(),
+            "written_messages": self._written,
+            "write_batches": self._batches,
+            "lazy_loads": self._loads,
+            "compacted_messages": self._compacted,
+            "expired_conversations": self._expired
+        })
+        return stats
+
+    def flush(self) -> None:
+        """Block until every queued write has been committed."""
+        self._queue.join()
+
+    def compact(self) -> None:
+        """Compact the journal now instead of waiting for the next interval."""
+        self._queue.put(("compact", None, None, None))
+        self.flush()
+
+    def close(self) -> None:
+        """Commit pending writes and stop the writer thread."""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        with self._reader_lock:
+            self._reader.close()
+
+    def _ensure_loaded(self, conversation_id: str) -> None:
+        """Seed the in-memory window from the journal on first access."""
+        if conversation_id in self.memory:
+            return
+        with self._load_lock:
+            if conversation_id in self.memory:
+                return
+            self._wait_for_writes(conversation_id)
+            rows = self._read_latest(conversation_id, self._window())[::-1]
+            # Gemini expects the conversation to open with a user turn
+            while rows and rows[0][0] != "user":
+                rows.pop(0)
+            if not rows:
+                return
+            for role, content in rows:
+                self.memory.append(conversation_id, {"role": role, "content": content})
+            self._loads += 1
+            logger.info(f"Loaded conversation {conversation_id} from journal ({len(rows)} messages)")
+
+    def _wait_for_writes(self, conversation_id: str) -> None:
+        """Reads must see writes (and deletes) made before the conversation left memory."""
+        with self._pending_lock:
+            pending = self._pending.get(conversation_id)
+        if pending:
+            self.flush()
+
+    def _window(self) -> int:
+        """Most messages the in-memory store keeps per conversation (-1: unbounded)."""
+        return self.memory.max_messages or -1
+
+    def _enqueue(self, kind: str, conversation_id: str, message: Optional[Dict] = None) -> None:
+        with self._pending_lock:
+            self._pending[conversation_id] = self._pending.get(conversation_id, 0) + 1
+        self._queue.put((kind, conversation_id, message, time.time()))
+
+    def _read_latest(self, conversation_id: str, limit: int) -> List[tuple]:
+        with self._reader_lock:
+            return self._reader.execute(
+                "SELECT role, content FROM messages WHERE conversation_id = ? ORDER BY id DESC LIMIT ?",
+                (conversation_id, limit)
+            ).fetchall()
+
+    def _write_loop(self, synchronous: str) -> None:
+        conn = self._connect(synchronous)
+        next_compaction = time.monotonic() + self.compact_interval if self.compact_interval else None
+        running = True
+        while running:
+            try:
+                batch = [self._queue.get(timeout=1.0)]
+            except queue.Empty:
+                batch = []
+            # Linger briefly so one commit (and fsync) covers a burst of turns
+            deadline = time.monotonic() + self.flush_interval
+            while batch and batch[-1] is not _STOP and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            ops = [op for op in batch if op is not _STOP]
+            running = len(ops) == len(batch)
+            if next_compaction and time.monotonic() >= next_compaction:
+                ops.append(("compact", None, None, None))
+                next_compaction = time.monotonic() + self.compact_interval
+            if ops:
+                try:
+                    self._commit(conn, ops)
+                except Exception as e:
+                    logger.error(f"Conversation journal write failed ({len(ops)} ops): {e}")
+                self._settle(ops)
+            for _ in batch:
+                self._queue.task_done()
+        conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, ops: List[tuple]) -> None:
+        """Apply a batch of operations in one transaction (one fsync)."""
+        conn.execute("BEGIN")
+        try:
+            for kind, conversation_id, message, created_at in ops:
+                if kind == "append":
+                    conn.execute(
+                        "INSERT INTO messages (conversation_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                        (conversation_id, message["role"], message["content"], created_at)
+                    )
+                elif kind == "delete":
+                    conn.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+                elif kind == "discard":
+                    conn.execute(
+                        "DELETE FROM messages WHERE id = (SELECT MAX(id) FROM messages WHERE conversation_id = ?)"
+                        " AND role = ? AND content = ?",
+                        (conversation_id, message["role"], message["content"])
+                    )
+                else:
+                    self._compact(conn)
+                    self._expire(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._written += sum(1 for op in ops if op[0] == "append")
+        self._batches += 1
+
+    def _settle(self, ops: List[tuple]) -> None:
+        """Forget committed (or failed) operations in the per-conversation pending counts."""
+        with self._pending_lock:
+            for _, conversation_id, _, _ in ops:
+                if conversation_id is None:
+                    continue
+                remaining = self._pending.get(conversation_id, 0) - 1
+                if remaining > 0:
+                    self._pending[conversation_id] = remaining
+                else:
+                    self._pending.pop(conversation_id, None)
+
+    def _compact(self, conn: sqlite3.Connection) -> None:
+        """Drop journaled messages older than the in-memory window."""
+        window = self._window()
+        if window < 0:
+            return
+        removed = conn.execute("""
+            DELETE FROM messages WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY conversation_id ORDER BY id DESC) AS newer
+                    FROM messages
+                ) WHERE newer > ?
+            )
+        """, (window,)).rowcount
+        self._compacted += removed
+        if removed:
+            logger.info(f"Compacted conversation journal: {removed} messages removed")
+
+    def _expire(self, conn: sqlite3.Connection) -> None:
+        """Delete conversations whose newest message is older than the idle TTL."""
+        if not self.memory.idle_ttl:
+            return
+        expired = [row[0] for row in conn.execute(
+            "SELECT conversation_id FROM messages GROUP BY conversation_id HAVING MAX(created_at) < ?",
+            (time.time() - self.memory.idle_ttl,)
+        )]
+        conn.executemany("DELETE FROM messages WHERE conversation_id = ?", [(c,) for c in expired])
+        self._expired += len(expired)
+        if expired:
+            logger.info(f"Expired {len(expired)} idle conversations from the journal")
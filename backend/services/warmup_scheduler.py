@@ -0,0 +1,96 @@
+"""
+Background keep-warm scheduler for Gemini clients
+"""
+from datetime import datetime
+from typing import Dict, Optional
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupScheduler:
+    """
+    Periodically pings every configured client from a daemon thread.
+
+    Each run records per-key latency and health in the service's key pool,
+    so `/api/warmup` can report the current warm state without making an
+    upstream call of its own.
+    """
+
+    def __init__(self, service, interval: float = 240.0):
+        self.service = service
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_run: Optional[str] = None
+        self._runs = 0
+        self._keys = [
+            {"index": i, "warm": False, "latency_ms": None, "last_ping": None, "error": None}
+            for i in range(len(service.clients))
+        ]
+
+    def start(self) -> None:
+        """Start the background thread (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="warmup-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Warmup scheduler started (interval: {self.interval}s)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+
+    def request_run(self) -> None:
+        """Ask for a ping round as soon as possible without waiting for it."""
+        self._wake.set()
+
+    def is_warm(self) -> bool:
+        """True if at least one key answered its latest ping."""
+        with self._lock:
+            return any(key["warm"] for key in self._keys)
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "warm": any(key["warm"] for key in self._keys),
+                "interval": self.interval,
+                "runs": self._runs,
+                "last_run": self._last_run,
+                "keys": [dict(key) for key in self._keys]
+            }
+
+    def run_once(self) -> None:
+        """Ping each key in turn and record the outcome."""
+        for index in range(len(self.service.clients)):
+            if self._stop.is_set():
+                return
+            now = datetime.now().isoformat()
+            try:
+                latency = self.service.ping_key(index)
+                update = {"warm": True, "latency_ms": round(latency * 1000, 1), "error": None}
+            except Exception as e:
+                logger.warning(f"Keep-warm ping failed for key index {index}: {e}")
+                update = {"warm": False, "error": str(e)}
+            with self._lock:
+                self._keys[index].update(update, last_ping=now)
+
+        with self._lock:
+            self._runs += 1
+            self._last_run = datetime.now().isoformat()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Warmup scheduler run failed: {e}")
+            self._wake.wait(self.interval)
@@ -0,0 +1,1039 @@
+#!/usr/bin/env python3
+"""
+Test script for the AI Voice Assistant backend
+Tests AIService and the Flask routes against a local fake Gemini client
+"""
+
+import sys
+import os
+import json
+import time
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('GEMINI_API_KEY_TEST', 'test-key')
+os.environ.setdefault('WARMUP_INTERVAL_SECONDS', '0')
+
+import asyncio
+import threading
+
+from services import (AdmissionController, AdmissionRejected, AIService, AsyncAIService, ContextManager, InMemoryConversationStore, KeyPool,
+                      LocalRouter, RedisConversationStore, RespClient, ResponseCache, RetryPolicy,
+                      SessionServer, SQLiteConversationStore, WarmupScheduler)
+
+
+class FakeResponse:
+    """Minimal stand-in for a Gemini GenerateContentResponse"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModels:
+    """Fake `client.models` surface returning canned replies"""
+
+    def __init__(self, reply="Hello there. How can I help?", chunk_size=6, error=None, delay=0):
+        self.reply = reply
+        self.chunk_size = chunk_size
+        self.error = error
+        self.delay = delay
+        self.calls = []
+
+    def respond(self, contents):
+        self.calls.append(contents)
+        if self.error:
+            raise self.error
+        return FakeResponse(self.reply)
+
+    def generate_content(self, model, contents, config=None):
+        time.sleep(self.delay)
+        return self.respond(contents)
+
+    def generate_content_stream(self, model, contents, config=None):
+        self.calls.append(contents)
+        if self.error:
+            raise self.error
+        for i in range(0, len(self.reply), self.chunk_size):
+            yield FakeResponse(self.reply[i:i + self.chunk_size])
+
+
+class FakeAsyncModels:
+    """Fake `client.aio.models` surface wrapping FakeModels"""
+
+    def __init__(self, models):
+        self.models = models
+
+    async def generate_content(self, model, contents, config=None):
+        await asyncio.sleep(self.models.delay)
+        return self.models.respond(contents)
+
+    async def generate_content_stream(self, model, contents, config=None):
+        chunks = list(self.models.generate_content_stream(model, contents, config))
+
+        async def stream():
+            for chunk in chunks:
+                await asyncio.sleep(0)
+                yield chunk
+        return stream()
+
+
+class FakeAio:
+    """Fake `client.aio` namespace"""
+
+    def __init__(self, models):
+        self.models = FakeAsyncModels(models)
+
+
+class ThrottleError(Exception):
+    """Stand-in for a Gemini 429 Resource Exhausted error"""
+
+    code = 429
+
+
+class FakeClient:
+    """Fake Gemini client exposing only `models`"""
+
+    def __init__(self, **kwargs):
+        self.models = FakeModels(**kwargs)
+        self.aio = FakeAio(self.models)
+
+
+def make_service(*clients, service_class=AIService, store=None, response_cache=None, router=None,
+                 context=None, admission=None):
+    """Build an AIService wired to fake clients"""
+    clients = list(clients) or [FakeClient()]
+    return service_class(
+        api_keys=[f"key-{i}" for i in range(len(clients))],
+        clients=clients,
+        store=store,
+        response_cache=response_cache,
+        router=router,
+        context=context,
+        admission=admission
+    )
+
+
+def test_generate_response():
+    """Test a blocking response is generated and logged"""
+    print("Testing generate_response...")
+    service = make_service()
+    result = service.generate_response("hi")
+    history = service.get_conversation_history(result['conversation_id'])
+    assert result['response'] == "Hello there. How can I help?"
+    assert [m['role'] for m in history] == ["user", "model"]
+    print("✓ Response generated and logged to history")
+    return True
+
+
+def test_generate_response_stream():
+    """Test streamed chunks arrive incrementally and commit once complete"""
+    print("\nTesting generate_response_stream...")
+    service = make_service()
+    stream = service.generate_response_stream("hi", "conv-1")
+
+    first = next(stream)
+    assert first['delta'] == "Hello "
+    # Nothing is committed for the model until the stream completes
+    assert len(service.get_conversation_history("conv-1")) == 1
+
+    events = [first] + list(stream)
+    deltas = "".join(e['delta'] for e in events if 'delta' in e)
+    final = events[-1]
+    assert final['done'] and final['response'] == deltas
+    assert service.get_conversation_history("conv-1")[-1]['content'] == deltas
+    print(f"✓ Streamed {len(events) - 1} chunks and committed final message")
+    return True
+
+
+def test_stream_retries_next_key():
+    """Test a stream that fails before any output retries on the next key"""
+    print("\nTesting stream key failover...")
+    service = make_service(FakeClient(error=RuntimeError("boom")), FakeClient(reply="ok"))
+    events = list(service.generate_response_stream("hi"))
+    assert events[-1]['response'] == "ok"
+    print("✓ Failed key skipped before first chunk")
+    return True
+
+
+def test_chat_stream_route():
+    """Test the /api/chat/stream route emits SSE chunk and done events"""
+    print("\nTesting /api/chat/stream...")
+    import app as backend_app
+
+    backend_app.ai_service = make_service()
+    client = backend_app.app.test_client()
+    response = client.post('/api/chat/stream', json={"message": "hi"})
+    body = response.get_data(as_text=True)
+
+    assert response.mimetype == 'text/event-stream'
+    events = [block.split("\n") for block in body.strip().split("\n\n")]
+    names = [lines[0][len("event: "):] for lines in events]
+    assert names[-1] == 'done' and set(names[:-1]) == {'chunk'}
+    done = json.loads(events[-1][1][len("data: "):])
+    assert done['response'] == "Hello there. How can I help?"
+
+    # Malformed bodies are rejected before any event is streamed
+    for body in ({"message": 42}, {"message": None}, ["hi"]):
+        for route in ('/api/chat/stream', '/api/chat'):
+            assert client.post(route, json=body).status_code == 400, (route, body)
+    print(f"✓ Received {len(events)} SSE events")
+    return True
+
+
+def test_generate_batch():
+    """Test batches fan out across keys, keep order and report per-item errors"""
+    print("\nTesting generate_batch...")
+    fakes = [FakeClient(delay=0.05), FakeClient(delay=0.05)]
+    service = make_service(*fakes)
+    requests = [{"message": f"Question {i}"} for i in range(16)]
+    requests += [{"message": f"Follow-up {i}", "conversation_id": "batch-conv"} for i in range(3)]
+    requests.append({"message": "   "})
+
+    start = time.perf_counter()
+    results = service.generate_batch(requests)
+    elapsed = time.perf_counter() - start
+    assert len(results) == 20 and all('response' in r for r in results[:19])
+    assert results[19]['error'] == "Message cannot be empty"
+    history = service.get_conversation_history("batch-conv")
+    assert [m['content'] for m in history if m['role'] == "user"] == [f"Follow-up {i}" for i in range(3)]
+    assert all(fake.models.calls for fake in fakes)
+    assert elapsed < 19 * 0.05 / 2, f"batch took {elapsed:.2f}s"
+
+    async_results = asyncio.run(make_service(service_class=AsyncAIService).generate_batch(requests))
+    assert [('error' in r) for r in async_results] == [('error' in r) for r in results]
+
+    import app as backend_app
+    backend_app.ai_service = make_service()
+    client = backend_app.app.test_client()
+    body = client.post('/api/chat/batch', json={"requests": [{"message": "hi"}, {}]}).get_json()
+    assert body['succeeded'] == 1 and body['failed'] == 1 and body['results'][1]['error']
+    assert client.post('/api/chat/batch', json={"message": "hi"}).status_code == 400
+    print(f"✓ 19 items over 2 keys in {elapsed * 1000:.0f} ms (sequential: {19 * 50} ms)")
+    return True
+
+
+def test_conversation_window():
+    """Test per-conversation history honours the message window"""
+    print("\nTesting conversation windowing...")
+    service = make_service(store=InMemoryConversationStore(max_messages=4))
+    for i in range(5):
+        service.generate_response(f"message {i}", "conv-1")
+    history = service.get_conversation_history("conv-1")
+    assert len(history) == 4
+    assert history[0] == {"role": "user", "content": "message 3"}
+    print(f"✓ History trimmed to {len(history)} messages")
+    return True
+
+
+def test_conversation_eviction():
+    """Test LRU, memory-cap and idle-TTL eviction of conversations"""
+    print("\nTesting conversation eviction...")
+    store = InMemoryConversationStore(max_conversations=2)
+    evicted = []
+    store.add_eviction_listener(evicted.append)
+    for conversation_id in ["a", "b", "c"]:
+        store.append(conversation_id, {"role": "user", "content": "hi"})
+    store.get("b")
+    store.append("d", {"role": "user", "content": "hi"})
+    assert "a" in evicted and "c" in evicted and "b" in store
+    assert store.stats()['evictions']['lru'] == 2
+
+    store = InMemoryConversationStore(max_bytes=1000)
+    for i in range(10):
+        store.append(f"conv-{i}", {"role": "user", "content": "x" * 100})
+    assert store.stats()['bytes'] <= 1000
+    assert store.stats()['evictions']['memory'] > 0
+
+    store = InMemoryConversationStore(idle_ttl=0.01)
+    store.append("old", {"role": "user", "content": "hi"})
+    time.sleep(0.02)
+    assert store.get("old") == []
+    assert store.stats()['evictions']['ttl'] == 1
+    print(f"✓ Eviction counters: {store.stats()['evictions']}")
+    return True
+
+
+def test_sqlite_conversation_store():
+    """Test conversations survive a restart and load lazily from the journal"""
+    print("\nTesting SQLite conversation store...")
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "conversations.db")
+        store = SQLiteConversationStore(path, memory=InMemoryConversationStore(max_messages=4))
+        service = make_service(store=store)
+        cid = service.generate_response("Hello")['conversation_id']
+        for i in range(3):
+            service.generate_response(f"Question {i}", cid)
+        store.close()
+        stats = store.stats()
+        assert stats['written_messages'] == 8 and stats['write_batches'] < 8
+
+        # A fresh process sees nothing in memory until the conversation is used
+        fake = FakeClient()
+        store = SQLiteConversationStore(path, memory=InMemoryConversationStore(max_messages=4))
+        service = make_service(fake, store=store)
+        assert not store.is_cached(cid) and cid in store
+        service.generate_response("And one more", cid)
+        sent = [c.parts[0].text for c in fake.models.calls[-1]]
+        assert sent == ["Question 2", "Hello there. How can I help?", "And one more"]
+        assert store.stats()['lazy_loads'] == 1
+
+        store.compact()
+        assert store.stats()['compacted_messages'] == 6
+        assert service.reset_conversation(cid) and cid not in store
+        store.close()
+
+        # Idle conversations expire from the journal as well as from memory
+        store = SQLiteConversationStore(path, memory=InMemoryConversationStore(idle_ttl=0.2))
+        store.append("idle", {"role": "user", "content": "hi"})
+        store.flush()
+        time.sleep(0.3)
+        store.append("active", {"role": "user", "content": "hi"})
+        store.compact()
+        assert "idle" not in store and "active" in store
+        # A failed turn's user message is taken back on disk too
+        assert store.discard_last("active", {"role": "user", "content": "hi"})
+        store.flush()
+        assert "active" not in store
+        assert store.stats()['expired_conversations'] == 1
+        store.close()
+    print(f"✓ History reloaded after restart: {stats['written_messages']} messages in "
+          f"{stats['write_batches']} commits")
+    return True
+
+
+def test_context_compaction():
+    """Test long conversations stay within the prompt budget via a background summary"""
+    print("\nTesting token-budgeted context compaction...")
+    from services.conversation_store import estimate_tokens
+
+    fake = FakeClient()
+    context = ContextManager(budget_tokens=80, recent_tokens=40)
+    service = make_service(fake, store=InMemoryConversationStore(max_messages=200, max_tokens=None),
+                           context=context)
+    prompt_tokens = []
+    for i in range(20):
+        message = f"Question {i}: tell me something about topic number {i}"
+        service.generate_response(message, "long-conv")
+        # Summary calls share the fake client and may land after the turn's call
+        turn_call = [call for call in fake.models.calls if call[-1].parts[0].text == message][-1]
+        sent = [c.parts[0].text for c in turn_call]
+        prompt_tokens.append(sum(estimate_tokens(text) for text in sent))
+        context.flush()
+
+    assert sent[0].startswith("Summary of our conversation so far")
+    assert sent[-1].startswith("Question 19") and "Question 0:" not in " ".join(sent)
+    assert max(prompt_tokens[5:]) <= 80, prompt_tokens
+    assert len(service.get_conversation_history("long-conv")) == 40
+    stats = context.stats()
+    assert stats['compactions'] > 0 and stats['summary_failures'] == 0
+
+    # Nothing is summarized while the whole history fits the budget
+    fake = FakeClient()
+    context = ContextManager(budget_tokens=2000)
+    service = make_service(fake, context=context)
+    for i in range(4):
+        service.generate_response(f"Question {i}", "short-conv")
+    context.flush()
+    assert context.stats()['compactions'] == 0 and len(fake.models.calls) == 4
+
+    # Summaries never block a turn
+    release = threading.Event()
+
+    def slow_summary(summary, messages):
+        release.wait(5)
+        return f"{len(messages)} earlier messages"
+
+    context = ContextManager(budget_tokens=80, recent_tokens=40, summarizer=slow_summary)
+    service = make_service(store=InMemoryConversationStore(max_messages=200, max_tokens=None), context=context)
+    start = time.perf_counter()
+    for i in range(8):
+        service.generate_response(f"Question {i}: tell me something about topic number {i}", "kiosk")
+    elapsed = time.perf_counter() - start
+    assert elapsed < 1 and context.stats()['summaries_in_flight'] == 1
+    release.set()
+    context.flush(5)
+    assert context.stats()['compactions'] == 1
+    assert service.reset_conversation("kiosk") and context.stats()['summarized_conversations'] == 0
+
+    # The async service summarizes on the worker thread with blocking calls
+    context = ContextManager(budget_tokens=80, recent_tokens=40)
+    service = make_service(store=InMemoryConversationStore(max_messages=200, max_tokens=None),
+                           context=context, service_class=AsyncAIService)
+    assert isinstance(service.summarize(None, [{"role": "user", "content": "hi"}]), str)
+
+    async def run_async():
+        for i in range(8):
+            await service.generate_response(f"Question {i}: tell me something about topic number {i}", "aio")
+    asyncio.run(run_async())
+    context.flush(5)
+    stats = context.stats()
+    assert stats['compactions'] > 0 and stats['summary_failures'] == 0, stats
+    print(f"✓ Prompt held at <= {max(prompt_tokens[5:])} tokens over 20 turns "
+          f"({stats['compactions']} summaries)")
+    return True
+
+
+def _session_worker(url, conn):
+    """Worker process: serve turns from a pipe against the shared session store"""
+    fake = FakeClient()
+    store = RedisConversationStore(RespClient(url), max_messages=6)
+    service = make_service(fake, store=store)
+    for message, conversation_id in iter(conn.recv, None):
+        service.generate_response(message, conversation_id)
+        sent = [c.parts[0].text for c in fake.models.calls[-1]]
+        conn.send((os.getpid(), sent, store.stats()['local_hits']))
+
+
+def test_shared_sessions_across_workers():
+    """Test a conversation continues whichever worker process serves each turn"""
+    print("\nTesting shared sessions across worker processes...")
+    import multiprocessing
+
+    server = SessionServer().start()
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    try:
+        for _ in range(3):
+            parent, child = context.Pipe()
+            process = context.Process(target=_session_worker, args=(server.url, child), daemon=True)
+            process.start()
+            workers.append((process, parent))
+
+        def turn(worker, message):
+            workers[worker][1].send((message, "shared-conv"))
+            assert workers[worker][1].poll(30), "worker did not answer"
+            return workers[worker][1].recv()
+
+        # Round-robin: every turn lands on a different process than the last
+        pids = set()
+        for i in range(6):
+            pid, sent, _ = turn(i % 3, f"Question {i}")
+            pids.add(pid)
+            users = [text for text in sent if text.startswith("Question")]
+            assert users == [f"Question {j}" for j in range(max(0, i - 2), i + 1)], sent
+        assert len(pids) == 3
+
+        # Back-to-back turns on one worker are served from its local copy
+        _, _, hits_before = turn(0, "Question 6")
+        _, sent, hits_after = turn(0, "Question 7")
+        assert hits_after == hits_before + 1 and sent[-1] == "Question 7"
+    finally:
+        for process, conn in workers:
+            conn.send(None)
+            process.join(10)
+        server.stop()
+
+    print(f"✓ One conversation continued across {len(pids)} worker processes")
+    return True
+
+
+def test_shared_store_metrics():
+    """Test the shared session store counts conversations and renders metrics"""
+    print("\nTesting metrics with the shared session store...")
+    server = SessionServer().start()
+    try:
+        store = RedisConversationStore(RespClient(server.url), max_messages=6)
+        service = make_service(FakeClient(), store=store)
+        service.generate_response("hi", "first")
+        service.generate_response("hello", "second")
+        body = service.metrics.render()
+        assert 'conversations_active 2' in body
+        assert 'conversation_history_bytes ' in body
+
+        # Counted from the expiry index, so resets and idle expiry are reflected
+        assert service.reset_conversation("first") and len(store) == 1
+        store.append("second", {"role": "user", "content": "again"})
+        assert not store.discard_last("second", {"role": "user", "content": "other"})
+        assert store.discard_last("second", {"role": "user", "content": "again"})
+        assert [m['content'] for m in store.get("second")] == ["hello", "Hello there. How can I help?"]
+        expiring = RedisConversationStore(RespClient(server.url), idle_ttl=1, prefix="expiring:")
+        expiring.append("old", {"role": "user", "content": "hi"})
+        assert len(expiring) == 1
+        time.sleep(1.1)
+        assert len(expiring) == 0 and len(store) == 1
+    finally:
+        server.stop()
+    print(f"✓ Rendered {len(body.splitlines())} metric lines")
+    return True
+
+
+def test_key_pool_selection():
+    """Test the pool prefers the least-loaded key and cools throttled keys down"""
+    print("\nTesting key pool selection...")
+    pool = KeyPool(3, base_cooldown=0.05)
+    first, second, third = pool.acquire(), pool.acquire(), pool.acquire()
+    assert {first, second, third} == {0, 1, 2}
+    pool.release(second)
+    assert pool.acquire() == second
+
+    pool = KeyPool(2, base_cooldown=0.05)
+    pool.release(pool.acquire(exclude=[1]), success=False, error=ThrottleError("429"))
+    assert pool.healthy_count() == 1
+    assert pool.acquire() == 1
+    pool.release(pool.acquire(exclude=[1]), success=False, error=ThrottleError("429"))
+    # Second consecutive throttle doubles the cooldown
+    assert pool.stats()[0]['cooldown_remaining'] > 0.05
+    time.sleep(0.11)
+    assert pool.healthy_count() == 2
+    print(f"✓ Key stats: {pool.stats()}")
+    return True
+
+
+def test_provider_retry_policy():
+    """Test transient failures retry on the same key while throttles rotate keys"""
+    print("\nTesting provider retry policy...")
+    flaky = FakeClient()
+    respond = flaky.models.respond
+    failures = [ConnectionError("connection reset by peer")]
+
+    def respond_after_reset(contents):
+        if failures:
+            flaky.models.calls.append(contents)
+            raise failures.pop()
+        return respond(contents)
+
+    flaky.models.respond = respond_after_reset
+    service = AIService(api_keys=["key-0"], clients=[flaky],
+                        retry=RetryPolicy(attempts=2, retry_throttled=False, sleep=lambda delay: None))
+    result = service.generate_response("Hello")
+    assert result['response'] == "Hello there. How can I help?"
+    assert len(flaky.models.calls) == 2
+
+    policy = RetryPolicy(attempts=3, retry_throttled=False)
+    assert not policy.should_retry(ThrottleError("429 Resource Exhausted"), 1)
+    assert not policy.should_retry(Exception("bad request"), 1)
+    assert not policy.should_retry(TimeoutError(), 3)
+    assert RetryPolicy(attempts=3).should_retry(ThrottleError("429 Resource Exhausted"), 1)
+    print("✓ Connection reset retried on the same key; throttles left to key rotation")
+    return True
+
+
+def test_key_pool_concurrency():
+    """Test concurrent acquire/release keeps in-flight counts balanced"""
+    print("\nTesting key pool under concurrency...")
+    pool = KeyPool(4)
+    peak = [0] * 4
+
+    def worker():
+        for _ in range(200):
+            index = pool.acquire()
+            peak[index] = max(peak[index], pool.stats()[index]['in_flight'])
+            pool.release(index)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = pool.stats()
+    assert all(s['in_flight'] == 0 for s in stats)
+    assert sum(s['requests'] for s in stats) == 1600
+    assert all(s['requests'] > 0 for s in stats)
+    print(f"✓ Requests per key: {[s['requests'] for s in stats]}")
+    return True
+
+
+def test_service_skips_throttled_key():
+    """Test a throttled key is retried elsewhere and then avoided"""
+    print("\nTesting throttled key failover...")
+    throttled = FakeClient(error=ThrottleError("429 Resource Exhausted"))
+    healthy = FakeClient(reply="ok")
+    service = make_service(throttled, healthy)
+    for _ in range(3):
+        assert service.generate_response("hi")['response'] == "ok"
+    assert len(throttled.models.calls) == 1
+    print("✓ Throttled key cooled down after one failure")
+    return True
+
+
+def test_admission_control():
+    """Test priority queueing, queue deadlines and fast rejection under overload"""
+    print("\nTesting admission control...")
+    admission = AdmissionController(max_concurrency=1, max_queue=2, queue_timeout=2)
+    running = admission.acquire("batch")
+    order = []
+
+    def waiter(priority):
+        try:
+            with admission.admit(priority):
+                order.append(priority)
+        except AdmissionRejected as e:
+            order.append(f"{priority} rejected ({e.reason})")
+
+    threads = [threading.Thread(target=waiter, args=("batch",)), threading.Thread(target=waiter, args=("batch",))]
+    for t in threads:
+        t.start()
+        time.sleep(0.05)
+    # The queue is full: an interactive request bumps the newest batch request
+    threads.append(threading.Thread(target=waiter, args=("interactive",)))
+    threads[-1].start()
+    time.sleep(0.05)
+    try:
+        admission.acquire("batch")
+        assert False, "a full queue should turn batch requests away"
+    except AdmissionRejected as e:
+        assert e.reason == "queue_full" and e.retry_after >= 1
+    running.release()
+    for t in threads:
+        t.join(5)
+    assert order == ["batch rejected (queue_full)", "interactive", "batch"], order
+
+    # Queue deadline
+    running = admission.acquire()
+    start = time.perf_counter()
+    try:
+        admission.acquire(timeout=0.1)
+        assert False, "the queue deadline should expire"
+    except AdmissionRejected as e:
+        assert e.reason == "queue_timeout" and time.perf_counter() - start < 1
+    running.release()
+
+    # Async waiters are granted in turn
+    async def run_async():
+        first = await admission.aacquire()
+        second = asyncio.ensure_future(admission.aacquire())
+        await asyncio.sleep(0.05)
+        assert not second.done()
+        first.release()
+        (await second).release()
+    asyncio.run(run_async())
+
+    # A turned-away turn is not logged, so its retry is recorded once
+    service = make_service(admission=AdmissionController(max_concurrency=1, max_queue=0))
+    service.generate_response("first", "retry-conv")
+    running = service.admission.acquire()
+    try:
+        service.generate_response("second", "retry-conv")
+        assert False, "a full server should turn the turn away"
+    except AdmissionRejected:
+        pass
+    assert len(service.get_conversation_history("retry-conv")) == 2
+    running.release()
+    service.generate_response("second", "retry-conv")
+    history = service.get_conversation_history("retry-conv")
+    assert [m['content'] for m in history if m['role'] == 'user'] == ["first", "second"], history
+
+    # Server-wide limits are split between worker processes
+    from config import Config
+    saved = Config.WEB_CONCURRENCY, Config.MAX_CONCURRENT_REQUESTS, Config.MAX_QUEUED_REQUESTS
+    try:
+        Config.WEB_CONCURRENCY, Config.MAX_CONCURRENT_REQUESTS, Config.MAX_QUEUED_REQUESTS = 4, 16, 64
+        assert Config.admission_limits() == (4, 16)
+        Config.WEB_CONCURRENCY = 1
+        assert Config.admission_limits() == (16, 64)
+    finally:
+        Config.WEB_CONCURRENCY, Config.MAX_CONCURRENT_REQUESTS, Config.MAX_QUEUED_REQUESTS = saved
+
+    # With every key throttled the service answers 429 at once instead of retrying
+    import app as backend_app
+    saved_service = backend_app.ai_service
+    try:
+        throttled = FakeClient(error=ThrottleError("429 Resource Exhausted"))
+        backend_app.ai_service = make_service(throttled, admission=AdmissionController())
+        client = backend_app.app.test_client()
+        assert client.post('/api/chat', json={"message": "hi"}).status_code == 500
+        response = client.post('/api/chat', json={"message": "hi again"})
+        assert response.status_code == 429 and int(response.headers['Retry-After']) >= 1
+        assert len(throttled.models.calls) == 1
+        assert client.post('/api/chat/stream', json={"message": "hi"}).status_code == 429
+        stats = backend_app.ai_service.admission.stats()
+        assert stats['rejected']['throttled'] == 2 and stats['active'] == 0
+
+        # Local and cached replies make no model call, so they are served even then
+        fake = FakeClient()
+        backend_app.ai_service = make_service(fake, response_cache=ResponseCache(), router=LocalRouter(),
+                                              admission=AdmissionController())
+        assert client.post('/api/chat', json={"message": "hello"}).status_code == 200
+        fake.models.error = ThrottleError("429 Resource Exhausted")
+        assert client.post('/api/chat', json={"message": "hi"}).status_code == 500
+        for message in ("hello", "what time is it?"):
+            assert client.post('/api/chat', json={"message": message}).status_code == 200
+            assert client.post('/api/chat/stream', json={"message": message}).status_code == 200
+        assert client.post('/api/chat', json={"message": "hi again"}).status_code == 429
+    finally:
+        backend_app.ai_service = saved_service
+
+    service = make_service(FakeClient(error=ThrottleError("429")), router=LocalRouter(),
+                           admission=AdmissionController(), service_class=AsyncAIService)
+    try:
+        asyncio.run(service.generate_response("hi"))
+    except Exception:
+        pass  # throttled, so the only key cools down
+    try:
+        asyncio.run(service.generate_response("hi again"))
+        assert False, "a request needing the model should be turned away"
+    except AdmissionRejected:
+        pass
+    assert asyncio.run(service.generate_response("what time is it?"))['local'] is True
+    print(f"✓ Rejections: {admission.stats()['rejected']}; throttled service answered 429 "
+          f"(Retry-After {response.headers['Retry-After']}s)")
+    return True
+
+
+def test_async_generate_response():
+    """Test the asyncio service handles concurrent requests and key failover"""
+    print("\nTesting AsyncAIService...")
+    service = make_service(FakeClient(error=ThrottleError("429")), FakeClient(reply="ok"),
+                           service_class=AsyncAIService)
+
+    async def run():
+        results = await asyncio.gather(*(service.generate_response(f"q{i}") for i in range(20)))
+        events = [e async for e in service.generate_response_stream("hi", "conv-1")]
+        return results, events
+
+    results, events = asyncio.run(run())
+    assert all(r['response'] == "ok" for r in results)
+    assert events[-1]['done'] and events[-1]['response'] == "ok"
+    assert all(s['in_flight'] == 0 for s in service.key_pool.stats())
+
+    # A store that blocks is only called from worker threads, never the event loop
+    loop_threads, store_threads = set(), set()
+
+    class BlockingStore(InMemoryConversationStore):
+        blocking_io = True
+
+        def append(self, conversation_id, message):
+            store_threads.add(threading.get_ident())
+            super().append(conversation_id, message)
+
+        def get(self, conversation_id):
+            store_threads.add(threading.get_ident())
+            return super().get(conversation_id)
+
+    service = make_service(store=BlockingStore(), service_class=AsyncAIService)
+
+    async def run_blocking():
+        loop_threads.add(threading.get_ident())
+        await service.generate_response("hi", "conv-2")
+        [e async for e in service.generate_response_stream("again", "conv-2")]
+        return await service.aget_conversation_history("conv-2")
+
+    assert len(asyncio.run(run_blocking())) == 4
+    assert store_threads and not store_threads & loop_threads
+    print(f"✓ {len(results)} concurrent async requests served")
+    return True
+
+
+def test_asgi_routes():
+    """Test the ASGI app mirrors the Flask chat contract"""
+    print("\nTesting ASGI routes...")
+    from starlette.testclient import TestClient
+    import asgi
+
+    asgi.ai_service = make_service(service_class=AsyncAIService)
+    client = TestClient(asgi.app)
+    result = client.post('/api/chat', json={"message": "hi"}).json()
+    assert result['response'] == "Hello there. How can I help?"
+    history = client.post('/api/conversation/history',
+                          json={"conversation_id": result['conversation_id']}).json()
+    assert history['message_count'] == 2
+    assert client.post('/api/chat', json={}).status_code == 400
+    for route in ('/api/chat', '/api/chat/stream'):
+        assert client.post(route, json={"message": ["hi"]}).status_code == 400
+        assert client.post(route, json="hi").status_code == 400
+    body = client.post('/api/chat/stream', json={"message": "hi"}).text
+    assert body.rstrip().split("\n\n")[-1].startswith("event: done")
+    assert client.post('/api/chat/batch', json={"requests": [{"message": "hi"}]}).json()['succeeded'] == 1
+    assert 'http_requests_total{route="/api/chat",method="POST",status="200"}' in client.get('/api/metrics').text
+    print("✓ ASGI chat, batch, history and stream routes respond")
+    return True
+
+
+def test_contents_cache():
+    """Test cached contents track appends, trims and resets"""
+    print("\nTesting incremental contents cache...")
+    fake = FakeClient()
+    service = make_service(fake, store=InMemoryConversationStore(max_messages=4))
+    for i in range(4):
+        service.generate_response(f"message {i}", "conv-1")
+    sent = fake.models.calls[-1]
+    history = service.get_conversation_history("conv-1")[:-1]
+    assert [c.parts[0].text for c in sent] == [m['content'] for m in history]
+    # The earliest surviving message reuses the Content built on a previous turn
+    assert sent[0] is fake.models.calls[-2][2]
+
+    service.reset_conversation("conv-1")
+    assert "conv-1" not in service._contents_cache
+    service.generate_response("fresh start", "conv-1")
+    assert [c.parts[0].text for c in fake.models.calls[-1]] == ["fresh start"]
+    print("✓ Cache reused across turns and invalidated on reset")
+    return True
+
+
+def test_contents_benchmark():
+    """Micro-benchmark per-turn payload overhead at 10/100/1000-turn histories"""
+    print("\nBenchmarking per-turn contents construction...")
+    from google.genai import types
+
+    for turns in (10, 100, 1000):
+        service = make_service(store=InMemoryConversationStore(max_messages=None, max_tokens=None))
+        for i in range(turns):
+            service.generate_response(f"message {i}", "conv-1")
+
+        rounds = 20
+        start = time.perf_counter()
+        for i in range(rounds):
+            conversation_id, _ = service._start_turn(f"extra {i}", "conv-1")
+            service._finish_turn(conversation_id, "reply")
+        cached = (time.perf_counter() - start) / rounds
+
+        history = service.get_conversation_history("conv-1")
+        start = time.perf_counter()
+        for _ in range(rounds):
+            [types.Content(role=m["role"], parts=[types.Part.from_text(text=m["content"])]) for m in history]
+        rebuilt = (time.perf_counter() - start) / rounds
+
+        print(f"  {turns:>4} turns: cached {cached * 1e6:8.1f} us/turn, full rebuild {rebuilt * 1e6:8.1f} us/turn")
+        if turns == 1000:
+            assert cached < rebuilt
+    print("✓ Cached turn overhead stays below a full rebuild")
+    return True
+
+
+def test_response_cache():
+    """Test repeated first-turn prompts are served from the cache"""
+    print("\nTesting response cache...")
+    fake = FakeClient()
+    service = make_service(fake, response_cache=ResponseCache(max_entries=10))
+
+    first = service.generate_response("Tell me a joke!")
+    repeat = service.generate_response("  tell me a JOKE ")
+    assert not first.get('cached') and repeat['cached']
+    assert repeat['response'] == first['response']
+    assert len(service.get_conversation_history(repeat['conversation_id'])) == 2
+
+    # Follow-up turns and opted-out requests always reach the model
+    service.generate_response("Tell me a joke!", repeat['conversation_id'])
+    service.generate_response("Tell me a joke!", use_cache=False)
+    assert len(fake.models.calls) == 3
+    stats = service.response_cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1
+    print(f"✓ Cache stats: {stats}")
+    return True
+
+
+def test_local_router():
+    """Test time/date requests are answered without calling the model"""
+    print("\nTesting local router...")
+    fake = FakeClient()
+    service = make_service(fake, router=LocalRouter())
+
+    result = service.generate_response("Hey, what time is it?", timezone="UTC")
+    assert result['local'] and result['response'].startswith("The current time is")
+    assert len(service.get_conversation_history(result['conversation_id'])) == 2
+    events = list(service.generate_response_stream("Could you tell me today's date please", timezone="Not/AZone"))
+    assert events[-1]['done'] and events[-1]['local'] and events[0]['delta'].startswith("Today is")
+    assert not fake.models.calls
+
+    # Anything beyond the bare question still goes to the model
+    result = service.generate_response("What time does the museum open?")
+    assert not result.get('local') and len(fake.models.calls) == 1
+    assert service._local_routes.value("time") == 1
+    stats = service.router.stats()
+    assert stats == {"hits": {"time": 1, "date": 1}, "forwarded": 1}
+    print(f"✓ Router stats: {stats}")
+    return True
+
+
+def test_response_cache_persistence():
+    """Test LRU/TTL eviction and on-disk persistence of cached responses"""
+    print("\nTesting response cache persistence...")
+    import tempfile
+
+    cache = ResponseCache(max_entries=2)
+    for key in ["a", "b", "c"]:
+        cache.put(key, key.upper())
+    assert cache.get("a") is None and cache.get("c") == "C"
+
+    cache = ResponseCache(ttl=0.01)
+    cache.put("a", "A")
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.json")
+        cache = ResponseCache(path=path)
+        key = ResponseCache.make_key("hello", "model", 0.7, "prompt")
+        cache.put(key, "Hi!")
+        cache.save()
+        assert ResponseCache(path=path).get(key) == "Hi!"
+    print("✓ Entries evicted by LRU/TTL and reloaded from disk")
+    return True
+
+
+def test_single_flight():
+    """Test concurrent identical prompts and warmups share one upstream call"""
+    print("\nTesting request coalescing...")
+    fake = FakeClient(delay=0.2)
+    service = make_service(fake)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.generate_response("Tell me a joke")))
+               for _ in range(5)]
+    threads += [threading.Thread(target=service.warmup) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(fake.models.calls) == 2
+    assert len({r['conversation_id'] for r in results}) == 5
+    assert all(len(service.get_conversation_history(r['conversation_id'])) == 2 for r in results)
+    stats = service._single_flight.stats()
+    assert stats['coalesced'] == 8
+    print(f"✓ 10 concurrent calls -> {len(fake.models.calls)} upstream ({stats})")
+
+    fake = FakeClient(delay=0.05)
+    service = make_service(fake, service_class=AsyncAIService)
+
+    async def run():
+        return await asyncio.gather(*(service.generate_response("Tell me a joke") for _ in range(5)))
+
+    asyncio.run(run())
+    assert len(fake.models.calls) == 1
+    print("✓ Async identical prompts coalesced into one call")
+    return True
+
+
+def test_warmup_scheduler():
+    """Test the keep-warm scheduler records per-key state and latency"""
+    print("\nTesting warmup scheduler...")
+    service = make_service(FakeClient(delay=0.01), FakeClient(error=ThrottleError("429")))
+    scheduler = WarmupScheduler(service, interval=60)
+    scheduler.run_once()
+
+    state = scheduler.status()
+    assert state['warm'] and state['runs'] == 1
+    assert state['keys'][0]['warm'] and state['keys'][0]['latency_ms'] >= 10
+    assert not state['keys'][1]['warm'] and "429" in state['keys'][1]['error']
+    assert service.key_pool.stats()[0]['latency_ms'] >= 10
+    assert service.key_pool.stats()[1]['throttles'] == 1
+    print(f"✓ Warm state: {[(k['index'], k['warm']) for k in state['keys']]}")
+    return True
+
+
+def test_warmup_route_is_immediate():
+    """Test /api/warmup answers from scheduler state without an upstream call"""
+    print("\nTesting /api/warmup with scheduler...")
+    import app as backend_app
+
+    fake = FakeClient(delay=0.5)
+    backend_app.ai_service = make_service(fake)
+    backend_app.warmup_scheduler = WarmupScheduler(backend_app.ai_service, interval=60)
+    try:
+        client = backend_app.app.test_client()
+        start = time.perf_counter()
+        body = client.post('/api/warmup').get_json()
+        elapsed = time.perf_counter() - start
+        assert elapsed < 0.1 and body['success'] is False
+        assert fake.models.calls == []
+
+        backend_app.warmup_scheduler.run_once()
+        assert client.post('/api/warmup').get_json()['success'] is True
+    finally:
+        backend_app.warmup_scheduler = None
+    print(f"✓ Warmup answered in {elapsed * 1000:.1f} ms")
+    return True
+
+
+def test_metrics():
+    """Test upstream, retry and scrape-time state metrics are rendered"""
+    print("\nTesting service metrics...")
+    service = make_service(FakeClient(error=ThrottleError("429")), FakeClient(),
+                           response_cache=ResponseCache())
+    service.generate_response("hi")
+    service.generate_response("hi")
+    body = service.metrics.render()
+
+    assert 'gemini_request_duration_seconds_count{key_index="0",outcome="throttled"} 1' in body
+    assert 'gemini_request_duration_seconds_count{key_index="1",outcome="ok"} 1' in body
+    assert 'gemini_retries_total{reason="throttled"} 1' in body
+    assert 'gemini_key_rotations_total 1' in body
+    assert 'response_cache_hits_total 1' in body
+    assert 'conversations_active 2' in body
+    print(f"✓ Rendered {len(body.splitlines())} metric lines")
+    return True
+
+
+def test_metrics_endpoint():
+    """Test /api/metrics exposes per-route request counts and latency"""
+    print("\nTesting /api/metrics...")
+    import app as backend_app
+
+    backend_app.ai_service = make_service()
+    client = backend_app.app.test_client()
+    before = backend_app.http_requests.value("/api/chat", "POST", "200")
+    client.post('/api/chat', json={"message": "hi"})
+    client.get('/api/nope')
+    response = client.get('/api/metrics')
+    body = response.get_data(as_text=True)
+
+    assert response.content_type.startswith('text/plain')
+    assert backend_app.http_requests.value("/api/chat", "POST", "200") == before + 1
+    assert 'http_requests_total{route="unmatched",method="GET",status="404"}' in body
+    assert 'http_request_duration_seconds_bucket{route="/api/chat",le="+Inf"}' in body
+    print("✓ Route metrics exposed")
+    return True
+
+
+def main():
+    """Run all tests"""
+    print("="*60)
+    print("AI Voice Assistant Backend - Test Suite")
+    print("="*60)
+
+    tests = [
+        test_generate_response,
+        test_generate_response_stream,
+        test_stream_retries_next_key,
+        test_chat_stream_route,
+        test_generate_batch,
+        test_conversation_window,
+        test_conversation_eviction,
+        test_sqlite_conversation_store,
+        test_shared_sessions_across_workers,
+        test_shared_store_metrics,
+        test_context_compaction,
+        test_key_pool_selection,
+        test_key_pool_concurrency,
+        test_provider_retry_policy,
+        test_service_skips_throttled_key,
+        test_admission_control,
+        test_async_generate_response,
+        test_asgi_routes,
+        test_contents_cache,
+        test_contents_benchmark,
+        test_response_cache,
+        test_local_router,
+        test_response_cache_persistence,
+        test_single_flight,
+        test_warmup_scheduler,
+        test_warmup_route_is_immediate,
+        test_metrics,
+        test_metrics_endpoint
+    ]
+
+    results = []
+    for test in tests:
+        try:
+            results.append(test())
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            results.append(False)
+
+    print("\n" + "="*60)
+    passed = sum(results)
+    total = len(results)
+    print(f"Test Results: {passed}/{total} tests passed")
+    print("="*60)
+
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-turn listen latency with per-turn vs one-time noise calibration
+
+Each turn the simulated user starts speaking shortly after the assistant starts
+listening. Latency is measured in seconds of microphone audio consumed from the
+start of listen() until the phrase is captured, which is what a live device
+would take (pass --realtime to also pace reads like one).
+
+    python benchmarks/bench_calibration.py --turns 10 --reaction 0.3
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_microphone import FakeMicrophone, FixedSTTBackend
+from voice_assistant import VoiceAssistant
+
+
+def measure(calibration_interval, turns, reaction, realtime):
+    assistant = VoiceAssistant(api_key=None, calibration_interval=calibration_interval)
+    mic = assistant.microphone = FakeMicrophone(realtime=realtime)
+    assistant.microphone_available = True
+    assistant.stt_backend = FixedSTTBackend("ok")
+
+    # Note how much audio went by before the recognizer started capturing
+    capture_audio = assistant.capture_audio
+    ready = []
+
+    def timed_capture(source, **kwargs):
+        ready.append(mic.now - start)
+        return capture_audio(source, **kwargs)
+
+    assistant.capture_audio = timed_capture
+
+    latencies, captured = [], 0
+    for _ in range(turns):
+        mic.user_speaks(after=reaction, duration=0.6)
+        start = mic.now
+        if assistant.listen():
+            captured += 1
+        latencies.append(mic.now - start)
+    assistant.close_microphone()
+    return sum(ready) / turns, sum(latencies) / turns, captured, assistant.tracer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--turns', type=int, default=10)
+    parser.add_argument('--reaction', type=float, default=0.3,
+                        help="seconds before the user starts speaking each turn")
+    parser.add_argument('--realtime', action='store_true', help="pace reads like a live microphone")
+    args = parser.parse_args()
+
+    results = [
+        ("every turn", measure(0, args.turns, args.reaction, args.realtime)),
+        ("once + dynamic", measure(None, args.turns, args.reaction, args.realtime))
+    ]
+
+    print(f"\n{args.turns} turns, user starts speaking {args.reaction * 1000:.0f} ms into each turn")
+    print(f"{'calibration':<16}{'ready ms':>10}{'turn ms':>10}{'captured':>10}{'calibrations':>14}")
+    for mode, (ready, latency, captured, tracer) in results:
+        calibrations = tracer.summary().get("calibration", {}).get("count", 0)
+        print(f"{mode:<16}{ready * 1000:>10.0f}{latency * 1000:>10.0f}{captured:>7}/{args.turns:<2}{calibrations:>14}")
+
+    saving = (results[0][1][0] - results[1][1][0]) * 1000
+    print(f"\nDead time saved per turn before capture starts: {saving:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
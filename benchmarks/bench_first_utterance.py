@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark: time to first utterance with whole-reply vs sentence-chunked TTS
+
+A fake LLM streams a multi-sentence reply token by token and a stub TTS engine
+"speaks" for a time proportional to the text, so the measured difference is how
+long the user waits before the assistant starts talking.
+
+    python benchmarks/bench_first_utterance.py --turns 5 --token-delay 0.03
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voice_assistant import VoiceAssistant
+
+REPLY = (
+    "Sure, here is a quick overview. The weather today is mild with light winds. "
+    "Expect some clouds in the afternoon and a chance of rain in the evening. "
+    "You may want to bring an umbrella if you are heading out later."
+)
+
+
+class StubEngine:
+    """pyttsx3 stand-in that records when speech starts"""
+
+    def __init__(self, seconds_per_char):
+        self.seconds_per_char = seconds_per_char
+        self.first_say = None
+        self._text = ""
+
+    def say(self, text):
+        if self.first_say is None:
+            self.first_say = time.perf_counter()
+        self._text = text
+
+    def runAndWait(self):
+        time.sleep(len(self._text) * self.seconds_per_char)
+
+    def stop(self):
+        pass
+
+
+def fake_stream(token_delay):
+    for token in REPLY.split(" "):
+        time.sleep(token_delay)
+        yield token + " "
+
+
+def measure(incremental, turns, token_delay, seconds_per_char):
+    assistant = VoiceAssistant(api_key=None, incremental_speech=incremental)
+    assistant.generate_ai_response = lambda text: "".join(fake_stream(token_delay)).strip()
+    assistant.generate_ai_response_stream = lambda text: fake_stream(token_delay)
+    assistant.tts_available = True
+
+    first, total = [], []
+    for _ in range(turns):
+        engine = assistant.tts_engine = StubEngine(seconds_per_char)
+        start = time.perf_counter()
+        assistant.process_command("what's the weather like")
+        first.append(engine.first_say - start)
+        total.append(time.perf_counter() - start)
+    return sum(first) / turns, sum(total) / turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--turns', type=int, default=5)
+    parser.add_argument('--token-delay', type=float, default=0.03, help="fake LLM delay per token (s)")
+    parser.add_argument('--seconds-per-char', type=float, default=0.002, help="stub TTS speaking rate")
+    args = parser.parse_args()
+
+    results = [
+        ("whole reply", measure(False, args.turns, args.token_delay, args.seconds_per_char)),
+        ("sentence-chunked", measure(True, args.turns, args.token_delay, args.seconds_per_char))
+    ]
+
+    print(f"\n{args.turns} turns, {len(REPLY.split())} tokens at {args.token_delay * 1000:.0f} ms/token")
+    print(f"{'mode':<18}{'first audio ms':>16}{'turn total ms':>16}")
+    for mode, (first, total) in results:
+        print(f"{mode:<18}{first * 1000:>16.0f}{total * 1000:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
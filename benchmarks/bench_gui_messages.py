@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Stress benchmark: chat area frame time with one widget per message vs the recycled list
+
+Injects thousands of messages into a real CustomTkinter chat area, a few per
+frame as a busy session would, and times each frame (applying the messages
+plus redrawing). Needs a display and customtkinter.
+
+    python benchmarks/bench_gui_messages.py --messages 3000 --per-frame 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import customtkinter as ctk
+
+from chat_view import VirtualMessageList
+from gui_app import MAX_CHAT_WIDGETS, ChatBubble
+from voice_tracing import percentile
+
+
+def add_widget_per_message(chat_frame, name_font, text_font):
+    """The chat area as it used to be: a new frame and two labels per message"""
+
+    def add(sender, text):
+        is_user = sender == "user"
+        frame = ctk.CTkFrame(chat_frame, fg_color="#2b2b2b" if is_user else "#3b3b3b", corner_radius=15)
+        frame.pack(fill="x", pady=5, padx=10, anchor="e" if is_user else "w")
+        ctk.CTkLabel(frame, text="You" if is_user else "Assistant", font=name_font).pack(anchor="w", padx=10)
+        ctk.CTkLabel(frame, text=text, wraplength=400, justify="left", font=text_font).pack(anchor="w", padx=10)
+
+    return lambda batch: [add(sender, text) for sender, text in batch]
+
+
+def run(mode, messages, per_frame):
+    root = ctk.CTk()
+    root.geometry("600x700")
+    chat_frame = ctk.CTkScrollableFrame(root)
+    chat_frame.pack(fill="both", expand=True)
+    canvas = chat_frame._parent_canvas
+    name_font = ctk.CTkFont(size=12, weight="bold")
+    text_font = ctk.CTkFont(size=14)
+
+    if mode == "recycled":
+        view = VirtualMessageList(lambda: ChatBubble(chat_frame, name_font, text_font), max_widgets=MAX_CHAT_WIDGETS)
+        apply = view.add_batch
+    else:
+        apply = add_widget_per_message(chat_frame, name_font, text_font)
+
+    frame_times = []
+    for start in range(0, messages, per_frame):
+        batch = [("user" if i % 2 == 0 else "assistant", f"Message {i}: " + "lorem ipsum " * (i % 7 + 1))
+                 for i in range(start, min(messages, start + per_frame))]
+        began = time.perf_counter()
+        apply(batch)
+        canvas.yview_moveto(1.0)
+        root.update()
+        frame_times.append(time.perf_counter() - began)
+
+    widgets = len(chat_frame.winfo_children())
+    root.destroy()
+    return frame_times, widgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=3000)
+    parser.add_argument('--per-frame', type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.messages} messages, {args.per_frame} per frame")
+    print(f"{'mode':<22}{'widgets':>8}{'p50 ms':>9}{'p95 ms':>9}{'last 100 ms':>13}")
+    for mode in ("widget-per-message", "recycled"):
+        frame_times, widgets = run(mode, args.messages, args.per_frame)
+        tail = sum(frame_times[-100:]) / len(frame_times[-100:])
+        print(f"{mode:<22}{widgets:>8}{percentile(frame_times, 0.5) * 1000:>9.2f}"
+              f"{percentile(frame_times, 0.95) * 1000:>9.2f}{tail * 1000:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
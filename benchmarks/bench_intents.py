@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark: indexed intent matcher vs a chain of substring scans
+
+Registers a few hundred synthetic intents (plus the built-in ones) and times
+matching typical utterances with IntentMatcher and with one
+`any(phrase in text)` check per intent, as the assistant used to do.
+
+    python benchmarks/bench_intents.py --intents 300 --rounds 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intents import DEFAULT_INTENTS, Intent, IntentMatcher
+
+WORDS = ["lights", "music", "volume", "timer", "alarm", "weather", "news", "door", "heating", "blinds",
+         "kitchen", "bedroom", "garage", "playlist", "podcast", "reminder", "calendar", "battery", "fan", "tv"]
+VERBS = ["turn on", "turn off", "open", "close", "start", "pause", "set", "check", "play", "cancel"]
+
+
+def make_intents(count, rng):
+    intents = list(DEFAULT_INTENTS)
+    for i in range(count):
+        phrases = [f"{rng.choice(VERBS)} {rng.choice(WORDS)} {i}" for _ in range(3)]
+        intents.append(Intent(f"custom_{i}", phrases, f"Done ({i})", priority=rng.randint(0, 50)))
+    return intents
+
+
+def substring_match(intents, text):
+    text = text.lower()
+    for intent in intents:
+        if any(phrase in text for phrase in intent.phrases):
+            return intent
+    return None
+
+
+def time_per_query(fn, queries, rounds):
+    start = time.perf_counter()
+    for i in range(rounds):
+        fn(queries[i % len(queries)])
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--intents', type=int, default=300)
+    parser.add_argument('--rounds', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    intents = make_intents(args.intents, rng)
+    start = time.perf_counter()
+    matcher = IntentMatcher(intents)
+    index_ms = (time.perf_counter() - start) * 1000
+
+    queries = [
+        "what time is it",
+        "could you please tell me a story about dragons and castles",
+        intents[-1].phrases[0],
+        f"hey can you {intents[len(intents) // 2].phrases[1]} please",
+        "thanks a lot"
+    ]
+
+    indexed = time_per_query(matcher.match, queries, args.rounds)
+    scanned = time_per_query(lambda text: substring_match(intents, text), queries, args.rounds)
+
+    print(f"{len(intents)} intents, {sum(len(i.phrases) for i in intents)} phrases "
+          f"(indexed in {index_ms:.1f} ms)")
+    print(f"indexed matcher  : {indexed * 1e6:8.1f} us/query")
+    print(f"substring chain  : {scanned * 1e6:8.1f} us/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Scripted audio stand-ins used by benchmarks and tests
+
+FakeMicrophone replaces speech_recognition.Microphone: the stream plays quiet
+background noise and switches to loud "speech" during windows scheduled with
+user_speaks(). Time is measured in samples read, so runs are deterministic;
+with realtime=True reads are also paced like a live device.
+"""
+import array
+import time
+import wave
+
+import speech_recognition as sr
+
+from stt_backends import STTBackend, STTStream
+from wake_word import WakeWordDetector
+
+
+def tone(seconds, level, sample_rate=16000):
+    """16-bit PCM whose RMS energy equals `level`"""
+    return array.array('h', (level if i % 2 else -level for i in range(int(seconds * sample_rate)))).tobytes()
+
+
+def write_wav(path, segments, sample_rate=16000):
+    """Write a mono 16-bit WAV from (seconds, level) segments, e.g. silence then speech"""
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        for seconds, level in segments:
+            f.writeframes(tone(seconds, level, sample_rate))
+
+
+class FixedSTTBackend(STTBackend):
+    """Returns the same transcript for any audio"""
+
+    name = "fixed"
+
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def transcribe(self, audio):
+        self.calls += 1
+        return self.text
+
+
+class EnergySTTBackend(STTBackend):
+    """Returns `text` if the audio contains anything louder than `threshold`, else nothing"""
+
+    name = "energy"
+
+    def __init__(self, text, threshold=500):
+        self.text = text
+        self.threshold = threshold
+
+    def transcribe(self, audio):
+        samples = array.array('h', audio.get_raw_data(convert_width=2))
+        if max(map(abs, samples), default=0) < self.threshold:
+            raise sr.UnknownValueError()
+        return self.text
+
+
+class ScriptedStreamingSTTBackend(STTBackend):
+    """Streaming backend that reveals one more word of `text` every `frames_per_word` frames"""
+
+    name = "scripted"
+
+    def __init__(self, text, frames_per_word=3):
+        self.words = text.split()
+        self.frames_per_word = frames_per_word
+
+    def transcribe(self, audio):
+        return " ".join(self.words)
+
+    def stream(self, sample_rate, sample_width):
+        return ScriptedSTTStream(self, sample_rate, sample_width)
+
+
+class ScriptedSTTStream(STTStream):
+    def accept(self, frame):
+        super().accept(frame)
+        revealed = len(self._frames) // self.backend.frames_per_word
+        return " ".join(self.backend.words[:revealed]) or None
+
+
+class LevelWakeWordDetector(WakeWordDetector):
+    """Treats a burst at exactly `level` (see user_speaks) as the spoken wake word"""
+
+    def __init__(self, level):
+        self.level = level
+
+    def accept(self, frame):
+        samples = array.array('h', frame)
+        return max(map(abs, samples), default=0) == self.level
+
+
+class FakeStream:
+    def __init__(self, mic):
+        self.mic = mic
+
+    def read(self, frames):
+        mic = self.mic
+        start = mic.position
+        mic.position += frames
+        if mic.realtime:
+            time.sleep(frames / mic.SAMPLE_RATE)
+
+        samples = array.array('h')
+        for i in range(start, start + frames):
+            t = i / mic.SAMPLE_RATE
+            amplitude = next((level for begin, end, level in mic.speech if begin <= t < end), mic.noise_level)
+            samples.append(amplitude if i % 2 else -amplitude)
+        return samples.tobytes()
+
+    def close(self):
+        pass
+
+
+class FakeMicrophone(sr.AudioSource):
+    SAMPLE_RATE = 16000
+    SAMPLE_WIDTH = 2
+    CHUNK = 1024
+
+    def __init__(self, noise_level=60, speech_level=4000, realtime=False):
+        self.noise_level = noise_level
+        self.speech_level = speech_level
+        self.realtime = realtime
+        self.stream = None
+        self.position = 0
+        self.speech = []
+        self.opened = 0
+
+    @property
+    def now(self):
+        """Seconds of audio read so far"""
+        return self.position / self.SAMPLE_RATE
+
+    def user_speaks(self, after=0.2, duration=0.5, level=None):
+        """Schedule a phrase starting `after` seconds from the current stream position"""
+        begin = self.now + after
+        self.speech.append((begin, begin + duration, level or self.speech_level))
+
+    def __enter__(self):
+        assert self.stream is None, "This audio source is already inside a context manager"
+        self.stream = FakeStream(self)
+        self.opened += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stream = None
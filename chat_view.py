@@ -0,0 +1,145 @@
+"""
+Virtualized chat message list for the desktop GUI
+Only the newest messages own widgets, taken from a fixed pool of recycled
+bubbles, and messages from worker threads are drawn in batches
+"""
+
+import threading
+from collections import deque
+
+
+class ChatLog:
+    """
+    Bounded message history, oldest first.
+
+    Interim transcripts ("user_partial") update a single user entry in place
+    until the final "user" transcript replaces it. Indices count every
+    message ever added, so they stay valid after old entries are dropped.
+    """
+
+    def __init__(self, max_messages=1000):
+        self.messages = deque(maxlen=max_messages)
+        self.total = 0
+        self._partial = None
+
+    @property
+    def first_index(self):
+        return self.total - len(self.messages)
+
+    def get(self, index):
+        """(sender, text) of a stored message, or None once it has been dropped"""
+        offset = index - self.first_index
+        return self.messages[offset] if 0 <= offset < len(self.messages) else None
+
+    def add(self, sender, text):
+        """Record a message; returns (index, is_new)"""
+        if sender in ("user", "user_partial") and self._partial is not None:
+            index = self._partial
+            if sender == "user":
+                self._partial = None
+            if self.get(index) is not None:
+                self.messages[index - self.first_index] = ("user", text)
+                return index, False
+
+        index = self.total
+        self.messages.append(("user" if sender == "user_partial" else sender, text))
+        self.total += 1
+        if sender == "user_partial":
+            self._partial = index
+        return index, True
+
+
+class MessageBatcher:
+    """
+    Collects messages from any thread and hands them to `flush` as one batch.
+
+    The first message of a batch schedules delivery with `schedule(ms,
+    callback)` (Tk's `after`); later ones just join the pending list, so a
+    burst of messages costs one UI callback instead of one each.
+    """
+
+    def __init__(self, schedule, flush, interval_ms=30):
+        self.schedule = schedule
+        self.flush = flush
+        self.interval_ms = interval_ms
+        self._lock = threading.Lock()
+        self._pending = []
+        self._scheduled = False
+
+    def push(self, sender, text):
+        with self._lock:
+            self._pending.append((sender, text))
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.schedule(self.interval_ms, self._deliver)
+
+    def _deliver(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._scheduled = False
+        if batch:
+            self.flush(batch)
+
+
+class VirtualMessageList:
+    """
+    Shows the newest `max_widgets` messages of a ChatLog.
+
+    Bubbles come from `make_bubble()` and must provide show(sender, text)
+    (place at the bottom), update(text) and hide(). Once the pool is full the
+    oldest bubble is moved to the bottom for each new message, so the widget
+    count stays constant however long the session runs, and a batch larger
+    than the pool only draws its tail. `scroll_to_end` runs once per batch.
+    """
+
+    def __init__(self, make_bubble, log=None, max_widgets=50, scroll_to_end=None):
+        self.make_bubble = make_bubble
+        self.log = log or ChatLog()
+        self.max_widgets = max_widgets
+        self.scroll_to_end = scroll_to_end
+        self.widgets = 0
+        # (message index, bubble) in display order; indices are contiguous
+        self._shown = deque()
+
+    def add(self, sender, text):
+        self.add_batch([(sender, text)])
+
+    def add_batch(self, messages):
+        updated = set()
+        for sender, text in messages:
+            index, is_new = self.log.add(sender, text)
+            if not is_new:
+                updated.add(index)
+
+        start = max(self.log.first_index, self.log.total - self.max_widgets)
+        spare = []
+        while self._shown and self._shown[0][0] < start:
+            spare.append(self._shown.popleft()[1])
+
+        first_new = self._shown[-1][0] + 1 if self._shown else start
+        for index in range(first_new, self.log.total):
+            bubble = spare.pop() if spare else self._new_bubble()
+            bubble.show(*self.log.get(index))
+            self._shown.append((index, bubble))
+        for bubble in spare:
+            bubble.hide()
+
+        for index in updated:
+            if self._shown and self._shown[0][0] <= index < first_new:
+                self._shown[index - self._shown[0][0]][1].update(self.log.get(index)[1])
+
+        if self.scroll_to_end and messages:
+            self.scroll_to_end()
+
+    def _new_bubble(self):
+        self.widgets += 1
+        return self.make_bubble()
+
+    def stats(self):
+        return {
+            "messages": self.log.total,
+            "stored": len(self.log.messages),
+            "shown": len(self._shown),
+            "widgets": self.widgets
+        }
@@ -3,12 +3,51 @@ import threading
 import os
 from datetime import datetime
 from PIL import Image
+from chat_view import MessageBatcher, VirtualMessageList
+from llm_providers import create_provider
 from voice_assistant import VoiceAssistant
+from voice_tracing import CallbackSink, JsonlSink, Tracer, format_turn
 
 # Configuration
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
+# Message bubbles kept alive in the chat area; older ones are recycled
+MAX_CHAT_WIDGETS = 50
+
+
+class ChatBubble:
+    """A recyclable message bubble: a frame with a sender name and the text"""
+
+    def __init__(self, parent, name_font, text_font):
+        self.frame = ctk.CTkFrame(parent, corner_radius=15)
+        self.name_label = ctk.CTkLabel(self.frame, text="", font=name_font)
+        self.name_label.pack(anchor="w", padx=10, pady=(5, 0))
+        self.content_label = ctk.CTkLabel(self.frame, text="", wraplength=400, justify="left", font=text_font)
+        self.content_label.pack(anchor="w", padx=10, pady=(0, 5))
+        self.sender = None
+
+    def show(self, sender, text):
+        """Restyle for the sender if needed and move to the bottom of the chat"""
+        is_user = sender == "user"
+        if sender != self.sender:
+            self.frame.configure(fg_color="#2b2b2b" if is_user else "#3b3b3b")
+            self.name_label.configure(
+                text="You" if is_user else "Assistant",
+                text_color="#3498db" if is_user else "#2ecc71"
+            )
+            self.sender = sender
+        self.content_label.configure(text=text)
+        self.frame.pack_forget()
+        self.frame.pack(fill="x", pady=5, padx=10, anchor="e" if is_user else "w")
+
+    def update(self, text):
+        self.content_label.configure(text=text)
+
+    def hide(self):
+        self.frame.pack_forget()
+
+
 class VoiceAssistantGUI(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -61,6 +100,16 @@ class VoiceAssistantGUI(ctk.CTk):
         self.chat_frame.grid(row=1, column=0, padx=20, pady=20, sticky="nsew")
         self.chat_frame.grid_columnconfigure(0, weight=1)
 
+        # Only the newest messages get widgets; worker-thread messages are drawn in batches
+        name_font = ctk.CTkFont(size=12, weight="bold")
+        text_font = ctk.CTkFont(size=14)
+        self.message_list = VirtualMessageList(
+            lambda: ChatBubble(self.chat_frame, name_font, text_font),
+            max_widgets=MAX_CHAT_WIDGETS,
+            scroll_to_end=self.scroll_to_end
+        )
+        self.message_batcher = MessageBatcher(self.after, self.message_list.add_batch)
+
     def create_footer(self):
         """Create the footer with controls"""
         self.footer_frame = ctk.CTkFrame(self, corner_radius=0)
@@ -78,10 +127,22 @@ class VoiceAssistantGUI(ctk.CTk):
     def init_assistant(self):
         """Initialize the backend voice assistant"""
         try:
+            # Show each turn's stage latencies in the status bar
+            self.tracer = Tracer(sinks=[CallbackSink(lambda turn: self.update_status_safe(format_turn(turn)))])
+            trace_file = os.getenv("VOICE_TRACE_FILE")
+            if trace_file:
+                self.tracer.add_sink(JsonlSink(trace_file))
+            calibration_interval = os.getenv("VOICE_CALIBRATION_INTERVAL")
+
             self.assistant = VoiceAssistant(
                 api_key=self.api_key,
                 status_callback=self.update_status_safe,
-                chat_callback=self.add_message_safe
+                chat_callback=self.add_message_safe,
+                tracer=self.tracer,
+                incremental_speech=os.getenv("VOICE_INCREMENTAL_TTS", "").lower() in ("1", "true", "yes"),
+                calibration_interval=float(calibration_interval) if calibration_interval else None,
+                streaming_recognition=os.getenv("VOICE_STREAMING_STT", "").lower() in ("1", "true", "yes"),
+                llm_provider=create_provider() if os.getenv("LLM_PROVIDER") else None
             )
         except Exception as e:
             self.update_status_safe(f"Error initializing: {e}")
@@ -108,7 +169,10 @@ class VoiceAssistantGUI(ctk.CTk):
         """Thread worker to run the assistant loop"""
         if self.assistant:
             try:
-                self.assistant.run()
+                if os.getenv("VOICE_PIPELINED", "").lower() in ("1", "true", "yes"):
+                    self.assistant.run_pipelined()
+                else:
+                    self.assistant.run()
             except Exception as e:
                 self.update_status_safe(f"Error: {e}")
             finally:
@@ -121,44 +185,12 @@ class VoiceAssistantGUI(ctk.CTk):
         self.after(0, lambda: self.status_label.configure(text=text))
 
     def add_message_safe(self, sender, text):
-        """Thread-safe message addition"""
-        self.after(0, lambda: self._add_message(sender, text))
-
-    def _add_message(self, sender, text):
-        """Internal method to add message widget"""
-        is_user = sender == "user"
-        
-        # Message container
-        msg_frame = ctk.CTkFrame(
-            self.chat_frame,
-            fg_color="#2b2b2b" if is_user else "#3b3b3b",
-            corner_radius=15
-        )
-        msg_frame.pack(fill="x", pady=5, padx=10, anchor="e" if is_user else "w")
+        """Thread-safe message addition, batched into one UI update"""
+        self.message_batcher.push(sender, text)
 
-        # Label
-        sender_name = "You" if is_user else "Assistant"
-        color = "#3498db" if is_user else "#2ecc71"
-        
-        name_label = ctk.CTkLabel(
-            msg_frame, 
-            text=sender_name, 
-            font=ctk.CTkFont(size=12, weight="bold"),
-            text_color=color
-        )
-        name_label.pack(anchor="w", padx=10, pady=(5, 0))
-
-        content_label = ctk.CTkLabel(
-            msg_frame, 
-            text=text, 
-            wraplength=400, 
-            justify="left",
-            font=ctk.CTkFont(size=14)
-        )
-        content_label.pack(anchor="w", padx=10, pady=(0, 5))
-        
-        # Scroll to bottom
-        # self.chat_frame._parent_canvas.yview_moveto(1.0) # This can be tricky in ctk; usually auto-scroll works or needs update
+    def scroll_to_end(self):
+        """Scroll the chat to the newest message once pending layout is done"""
+        self.after_idle(lambda: self.chat_frame._parent_canvas.yview_moveto(1.0))
 
 
 if __name__ == "__main__":
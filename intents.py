@@ -0,0 +1,135 @@
+"""
+Declarative intent table for local replies
+Intent phrases are indexed by word, so matching an utterance costs a few
+dictionary lookups no matter how many intents are registered
+"""
+
+import re
+from datetime import datetime
+
+# Words as the speech recognizer spells them, keeping contractions ("what's")
+WORD = re.compile(r"[\w']+")
+
+# Polite wrappers around a bare fast-path request: "hey, could you tell me ... please"
+_POLITE_PREFIX = (r"(?:(?:hey|hi|ok|okay) )?"
+                  r"(?:(?:can|could|would) you (?:please )?(?:tell me )?|please (?:tell me )?|tell me |do you know )?")
+_POLITE_SUFFIX = r"(?: (?:now|right now|today|please))*"
+
+
+class Intent:
+    """
+    A named set of trigger phrases with a reply handler.
+
+    Phrases match whole words, case-insensitively and ignoring punctuation;
+    a trailing '*' matches any word ending ("thank*" matches "thanks"). When several intents match, the highest
+    priority wins. fast_path is a regex for utterances answered locally even
+    when an LLM is available; it must cover the whole utterance (polite
+    wrappers like "could you tell me ... please" allowed), so "what time is
+    it" is answered locally while "what time does the museum open" still
+    goes to the LLM. ends_conversation marks exit commands.
+    """
+
+    def __init__(self, name, phrases, handler, priority=0, fast_path=None, ends_conversation=False):
+        self.name = name
+        self.phrases = list(phrases)
+        self.handler = handler
+        self.priority = priority
+        self.fast_path = re.compile(_POLITE_PREFIX + f"(?:{fast_path})" + _POLITE_SUFFIX) if fast_path else None
+        self.ends_conversation = ends_conversation
+
+    def respond(self, text):
+        return self.handler(text) if callable(self.handler) else self.handler
+
+
+def _phrase_words(phrase):
+    """Phrase -> tuple of (word, is_prefix) pairs"""
+    return tuple((word.rstrip("*"), word.endswith("*")) for word in phrase.lower().split())
+
+
+class IntentMatcher:
+    """
+    Indexes every intent phrase by its first word.
+
+    An utterance is tokenized once and each token looks up only the phrases
+    starting with it, so matching cost depends on the utterance length rather
+    than on how many intents are registered.
+    """
+
+    def __init__(self, intents):
+        self.intents = list(intents)
+        self._index = {}
+        self._prefixed = []
+        for intent in self.intents:
+            for phrase in intent.phrases:
+                words = _phrase_words(phrase)
+                first, is_prefix = words[0]
+                if is_prefix:
+                    self._prefixed.append((first, words, intent))
+                else:
+                    self._index.setdefault(first, []).append((words, intent))
+        self._fast_paths = sorted((intent for intent in self.intents if intent.fast_path),
+                                  key=lambda intent: -intent.priority)
+
+    def match(self, text):
+        """Highest-priority intent mentioned in the text (earliest on ties), or None"""
+        tokens = WORD.findall(text.lower())
+        best = None
+        for position, token in enumerate(tokens):
+            candidates = self._index.get(token, [])
+            if self._prefixed:
+                candidates = candidates + [(words, intent) for stem, words, intent in self._prefixed
+                                           if token.startswith(stem)]
+            for words, intent in candidates:
+                if (best is None or intent.priority > best.priority) and _matches_at(tokens, position, words):
+                    best = intent
+        return best
+
+    def match_fast_path(self, text):
+        """Highest-priority intent whose fast_path covers the whole utterance, or None"""
+        utterance = " ".join(WORD.findall(text.lower()))
+        for intent in self._fast_paths:
+            if intent.fast_path.fullmatch(utterance):
+                return intent
+        return None
+
+    def respond(self, text):
+        """Reply of the matching intent, or None"""
+        intent = self.match(text)
+        return intent.respond(text) if intent else None
+
+
+def _matches_at(tokens, position, words):
+    if position + len(words) > len(tokens):
+        return False
+    for token, (word, is_prefix) in zip(tokens[position:], words):
+        if token != word and not (is_prefix and token.startswith(word)):
+            return False
+    return True
+
+
+def _current_time(text):
+    return f"The current time is {datetime.now().strftime('%I:%M %p')}"
+
+
+def _current_date(text):
+    return f"Today's date is {datetime.now().strftime('%B %d, %Y')}"
+
+
+# Built-in intents; exit commands outrank everything else
+DEFAULT_INTENTS = [
+    Intent("exit", ["exit", "quit", "stop", "goodbye"], "Goodbye! Have a great day!",
+           priority=100, fast_path=r"exit|quit|stop|goodbye", ends_conversation=True),
+    Intent("greeting", ["hello", "hi", "hey"], "Hello! How can I help you today?", priority=60),
+    Intent("how_are_you", ["how are you", "how do you do"],
+           "I'm doing well, thank you for asking! How can I assist you?", priority=50),
+    Intent("time", ["what time", "the time", "time is it", "current time"], _current_time, priority=40,
+           fast_path=r"what(?:'s| is) the (?:current )?time|what time is it|(?:the )?(?:current )?time"),
+    Intent("date", ["the date", "today's date", "what date", "what day is it"], _current_date, priority=30,
+           fast_path=r"what(?:'s| is) (?:the date|today's date|today)|what date is it|today's date|the date"
+                     r"|what day is it|what day of the week is it"),
+    Intent("farewell", ["bye"], "Goodbye! Have a great day!", priority=25),
+    Intent("thanks", ["thank*"], "You're welcome! Is there anything else I can help you with?", priority=20),
+    Intent("help", ["help"],
+           "I can help you with various tasks. Try asking me about the time, date, or just have a conversation!",
+           priority=10),
+]
@@ -0,0 +1,19 @@
+"""
+LLM provider layer for the desktop apps
+The implementation lives with the backend (backend/services/llm_providers.py),
+where the backend imports it from its own package. This module loads that
+file under the name `llm_providers` without importing the rest of the
+backend's services package or touching sys.path.
+"""
+
+import importlib.util
+import os
+import sys
+
+_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend", "services", "llm_providers.py")
+
+_spec = importlib.util.spec_from_file_location(__name__, _PATH)
+_module = importlib.util.module_from_spec(_spec)
+# The import system hands callers whatever is in sys.modules once this module finishes
+sys.modules[__name__] = _module
+_spec.loader.exec_module(_module)
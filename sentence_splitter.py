@@ -0,0 +1,77 @@
+"""
+Sentence chunking for incremental text-to-speech
+Splits text, or a stream of text deltas, into sentences/clauses that can be spoken
+as soon as each one is complete
+"""
+
+import re
+
+# End of a sentence: terminal punctuation (plus closing quotes/brackets) then whitespace
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+')
+# Clause boundary used to break up sentences that run past max_chars
+CLAUSE_END = re.compile(r'[,;:]\s+')
+# Abbreviations whose trailing period does not end a sentence
+ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "prof", "st", "vs", "etc", "e.g", "i.e", "approx", "no"}
+
+
+def _is_abbreviation(text, end):
+    """True if the punctuation run ending before `end` follows a known abbreviation"""
+    match = re.search(r'([A-Za-z.]+)\.["\')\]]*\s+$', text[:end])
+    return bool(match) and match.group(1).lower() in ABBREVIATIONS
+
+
+class SentenceBuffer:
+    """
+    Accumulates streamed text and releases it one complete sentence at a time.
+
+    feed() returns the sentences completed by a delta; flush() returns whatever
+    is left once the stream ends. Sentences longer than max_chars are broken at
+    the last clause boundary (comma, semicolon, colon) so the first audio never
+    waits on a very long sentence.
+    """
+
+    def __init__(self, max_chars=150):
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, delta):
+        self._buffer += delta
+        chunks = []
+        while True:
+            chunk = self._next_chunk()
+            if chunk is None:
+                return chunks
+            chunks.append(chunk)
+
+    def flush(self):
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+    def _next_chunk(self):
+        for match in SENTENCE_END.finditer(self._buffer):
+            if not _is_abbreviation(self._buffer, match.end()):
+                return self._take(match.end())
+
+        if len(self._buffer) > self.max_chars:
+            clauses = list(CLAUSE_END.finditer(self._buffer, 0, self.max_chars))
+            if clauses:
+                return self._take(clauses[-1].end())
+        return None
+
+    def _take(self, end):
+        chunk, self._buffer = self._buffer[:end].strip(), self._buffer[end:]
+        return chunk or self._next_chunk()
+
+
+def split_sentences(text, max_chars=150):
+    """Split a complete text into speakable sentences/clauses"""
+    buffer = SentenceBuffer(max_chars)
+    return buffer.feed(text) + buffer.flush()
+
+
+def iter_sentences(deltas, max_chars=150):
+    """Yield sentences from an iterable of text deltas as soon as each is complete"""
+    buffer = SentenceBuffer(max_chars)
+    for delta in deltas:
+        yield from buffer.feed(delta)
+    yield from buffer.flush()
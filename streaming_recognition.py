@@ -0,0 +1,104 @@
+"""
+Streaming speech recognition with energy-based voice activity detection
+Frames are handed to the STT backend while the user is still talking, and the
+phrase is closed as soon as a short run of silence follows the speech
+"""
+
+import array
+import math
+from collections import deque
+
+import speech_recognition as sr
+
+
+def frame_energy(frame, sample_width):
+    """RMS energy of a raw PCM frame"""
+    samples = array.array('h', sr.AudioData(frame, 16000, sample_width).get_raw_data(convert_width=2))
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+class EnergyVAD:
+    """
+    Frame-level speech detector: a frame is speech when its energy exceeds
+    both the calibrated threshold and `ratio` times a noise floor that keeps
+    adapting on non-speech frames.
+    """
+
+    def __init__(self, threshold=300.0, ratio=2.0, adapt=0.05):
+        self.threshold = threshold
+        self.ratio = ratio
+        self.adapt = adapt
+        self.noise_floor = threshold / ratio
+
+    def is_speech(self, frame, sample_width=2):
+        energy = frame_energy(frame, sample_width)
+        speech = energy > max(self.threshold, self.noise_floor * self.ratio)
+        if not speech:
+            self.noise_floor += self.adapt * (energy - self.noise_floor)
+        return speech
+
+
+class StreamingRecognizer:
+    """
+    Reads frames from an open audio source and streams them to an STT backend session.
+
+    capture() waits for `min_speech` seconds of voiced audio, replays the last
+    `pre_roll` seconds so the first syllable is not clipped, then feeds every
+    frame to the backend session, reporting interim hypotheses through
+    `on_partial`. The phrase ends after `end_silence` seconds without speech
+    (or at `phrase_time_limit`); the returned session's finish() yields the
+    final transcript.
+    """
+
+    def __init__(self, end_silence=0.5, min_speech=0.1, pre_roll=0.3, timeout=5, phrase_time_limit=10):
+        self.end_silence = end_silence
+        self.min_speech = min_speech
+        self.pre_roll = pre_roll
+        self.timeout = timeout
+        self.phrase_time_limit = phrase_time_limit
+
+    def capture(self, source, backend, energy_threshold, on_partial=None, timeout=None):
+        """Stream one phrase into a backend session (raises sr.WaitTimeoutError)"""
+        timeout = self.timeout if timeout is None else timeout
+        seconds_per_frame = source.CHUNK / source.SAMPLE_RATE
+        width = source.SAMPLE_WIDTH
+        vad = EnergyVAD(energy_threshold)
+
+        # Wait for speech, keeping a little audio from just before it started
+        pre_roll = deque(maxlen=max(1, math.ceil(self.pre_roll / seconds_per_frame)))
+        waited = voiced = 0.0
+        while voiced < self.min_speech:
+            frame = source.stream.read(source.CHUNK)
+            pre_roll.append(frame)
+            voiced = voiced + seconds_per_frame if vad.is_speech(frame, width) else 0.0
+            waited += seconds_per_frame
+            if timeout and waited > timeout and voiced == 0.0:
+                raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+
+        session = backend.stream(source.SAMPLE_RATE, width)
+        last_partial = None
+
+        def feed(frame):
+            nonlocal last_partial
+            partial = session.accept(frame)
+            if partial and partial != last_partial:
+                last_partial = partial
+                if on_partial:
+                    on_partial(partial)
+
+        for frame in pre_roll:
+            feed(frame)
+
+        # Stream until the speaker pauses
+        length = len(pre_roll) * seconds_per_frame
+        silence = 0.0
+        while silence < self.end_silence:
+            if self.phrase_time_limit and length >= self.phrase_time_limit:
+                break
+            frame = source.stream.read(source.CHUNK)
+            feed(frame)
+            length += seconds_per_frame
+            silence = 0.0 if vad.is_speech(frame, width) else silence + seconds_per_frame
+        return session
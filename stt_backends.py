@@ -0,0 +1,185 @@
+"""
+Pluggable speech-to-text backends for the voice assistant
+Google's web recognizer is the default; Vosk and faster-whisper run fully offline on CPU
+"""
+
+import json
+import os
+from functools import lru_cache
+
+import speech_recognition as sr
+
+# Offline engines are optional dependencies
+try:
+    import vosk
+except ImportError:
+    vosk = None
+
+try:
+    import numpy as np
+    from faster_whisper import WhisperModel
+except ImportError:
+    WhisperModel = None
+
+
+class STTStream:
+    """
+    Incremental recognition session fed with raw audio frames as they arrive.
+
+    accept() returns the current interim hypothesis (or None); finish()
+    returns the final transcript. This default buffers the frames and
+    transcribes them in one go, for engines without a streaming API.
+    """
+
+    def __init__(self, backend, sample_rate, sample_width):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self._frames = []
+
+    def accept(self, frame):
+        self._frames.append(frame)
+        return None
+
+    def finish(self):
+        audio = sr.AudioData(b"".join(self._frames), self.sample_rate, self.sample_width)
+        return self.backend.transcribe(audio)
+
+
+class STTBackend:
+    """
+    Converts captured audio (sr.AudioData) to text.
+
+    Implementations raise sr.UnknownValueError when nothing intelligible was
+    heard and sr.RequestError when the engine itself fails, matching the
+    speech_recognition recognizers so callers handle every backend alike.
+    """
+
+    name = "base"
+
+    def transcribe(self, audio):
+        raise NotImplementedError
+
+    def stream(self, sample_rate, sample_width):
+        """Start an incremental session (buffered unless the engine can stream)"""
+        return STTStream(self, sample_rate, sample_width)
+
+
+class GoogleSTTBackend(STTBackend):
+    """Google Web Speech API (network round-trip per utterance)"""
+
+    name = "google"
+
+    def __init__(self, recognizer=None, language="en-US"):
+        self.recognizer = recognizer or sr.Recognizer()
+        self.language = language
+
+    def transcribe(self, audio):
+        return self.recognizer.recognize_google(audio, language=self.language)
+
+
+@lru_cache(maxsize=None)
+def load_vosk_model(model_path="model"):
+    """Load a Vosk model once per path (shared by recognition and wake word spotting)"""
+    if vosk is None:
+        raise ImportError("Vosk requires the 'vosk' package: pip install vosk")
+    if not os.path.isdir(model_path):
+        raise FileNotFoundError(
+            f"Vosk model not found at '{model_path}'. "
+            "Download one from https://alphacephei.com/vosk/models and set VOSK_MODEL_PATH."
+        )
+    vosk.SetLogLevel(-1)
+    return vosk.Model(model_path)
+
+
+class VoskSTTBackend(STTBackend):
+    """Offline Kaldi-based recognition; the model is loaded once and reused"""
+
+    name = "vosk"
+    sample_rate = 16000
+
+    def __init__(self, model_path="model"):
+        self.model = load_vosk_model(model_path)
+
+    def transcribe(self, audio):
+        recognizer = vosk.KaldiRecognizer(self.model, self.sample_rate)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get("text", "")
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+    def stream(self, sample_rate, sample_width):
+        return VoskSTTStream(self, sample_rate, sample_width)
+
+
+class VoskSTTStream(STTStream):
+    """Decodes frames as they arrive, exposing Vosk's partial results"""
+
+    def __init__(self, backend, sample_rate, sample_width):
+        super().__init__(backend, sample_rate, sample_width)
+        self._recognizer = vosk.KaldiRecognizer(backend.model, sample_rate)
+        self._segments = []
+
+    def accept(self, frame):
+        data = sr.AudioData(frame, self.sample_rate, self.sample_width).get_raw_data(convert_width=2)
+        if self._recognizer.AcceptWaveform(data):
+            # Vosk found a pause inside the phrase; keep the finished segment
+            self._segments.append(json.loads(self._recognizer.Result()).get("text", ""))
+            partial = ""
+        else:
+            partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        return " ".join(part for part in self._segments + [partial] if part) or None
+
+    def finish(self):
+        self._segments.append(json.loads(self._recognizer.FinalResult()).get("text", ""))
+        text = " ".join(part for part in self._segments if part)
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class WhisperSTTBackend(STTBackend):
+    """Offline Whisper recognition via faster-whisper (CTranslate2, int8 on CPU)"""
+
+    name = "whisper"
+    sample_rate = 16000
+
+    def __init__(self, model_size="base.en", language="en", cpu_threads=0):
+        if WhisperModel is None:
+            raise ImportError("Whisper backend requires 'faster-whisper': pip install faster-whisper")
+        self.model = WhisperModel(model_size, device="cpu", compute_type="int8", cpu_threads=cpu_threads)
+        self.language = language
+
+    def transcribe(self, audio):
+        raw = audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2)
+        samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+        try:
+            segments, _ = self.model.transcribe(samples, language=self.language, beam_size=1)
+            text = " ".join(segment.text.strip() for segment in segments).strip()
+        except Exception as e:
+            raise sr.RequestError(f"Whisper transcription failed: {e}")
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+STT_BACKENDS = {
+    backend.name: backend for backend in (GoogleSTTBackend, VoskSTTBackend, WhisperSTTBackend)
+}
+
+
+def create_stt_backend(name=None, recognizer=None):
+    """
+    Build the backend selected by name or the STT_BACKEND environment variable.
+
+    Offline backends read VOSK_MODEL_PATH / WHISPER_MODEL for their models.
+    """
+    name = (name or os.getenv("STT_BACKEND") or "google").lower()
+    if name == "google":
+        return GoogleSTTBackend(recognizer, language=os.getenv("STT_LANGUAGE", "en-US"))
+    if name == "vosk":
+        return VoskSTTBackend(os.getenv("VOSK_MODEL_PATH", "model"))
+    if name == "whisper":
+        return WhisperSTTBackend(os.getenv("WHISPER_MODEL", "base.en"))
+    raise ValueError(f"Unknown STT backend '{name}'. Choose one of: {', '.join(STT_BACKENDS)}")
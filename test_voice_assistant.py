@@ -6,11 +6,28 @@ Tests basic functionality without requiring microphone or API keys
 
 import sys
 import os
+import json
+import tempfile
+import threading
+import time
+import speech_recognition as sr
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
 
 from voice_assistant import VoiceAssistant
+from chat_view import ChatLog, MessageBatcher, VirtualMessageList
+from intents import DEFAULT_INTENTS, Intent, IntentMatcher
+from llm_providers import OpenAIProvider, RetryPolicy, StubProvider
+from fake_microphone import (
+    EnergySTTBackend, FakeMicrophone, FixedSTTBackend, LevelWakeWordDetector,
+    ScriptedStreamingSTTBackend, write_wav
+)
+from sentence_splitter import iter_sentences, split_sentences
+from stt_backends import GoogleSTTBackend, create_stt_backend
+from voice_pipeline import VoicePipeline
+from voice_tracing import CallbackSink, JsonlSink, Tracer, format_turn, percentile
 
 
 def test_initialization():
@@ -93,6 +110,554 @@ def test_tts_engine():
         return False
 
 
+def test_latency_tracing():
+    """Test per-stage latency spans, turn sinks and summaries"""
+    print("\nTesting latency tracing...")
+    try:
+        turns = []
+        trace_path = os.path.join(tempfile.mkdtemp(), "trace.jsonl")
+        tracer = Tracer(sinks=[CallbackSink(turns.append), JsonlSink(trace_path)])
+        assistant = VoiceAssistant(api_key=None, tracer=tracer)
+        assistant.tts_available = False  # keep the test silent
+
+        for _ in range(3):
+            tracer.start_turn()
+            assistant.process_command("hello there")
+            tracer.end_turn()
+
+        with open(trace_path, encoding="utf-8") as f:
+            logged = [json.loads(line) for line in f]
+        summary = tracer.summary()
+
+        if len(turns) != 3 or len(logged) != 3:
+            print(f"✗ Expected 3 traced turns, got {len(turns)} (file: {len(logged)})")
+            return False
+        if "llm" not in turns[0]["spans"] or summary["llm"]["count"] != 3:
+            print(f"✗ LLM span not recorded: {turns[0]}")
+            return False
+        if not format_turn(turns[-1]).startswith("Last turn"):
+            print(f"✗ Unexpected turn summary: {format_turn(turns[-1])}")
+            return False
+
+        # Nearest rank: the median of 5 is the 3rd value, p95 of 30 the 29th
+        if percentile([1, 2, 3, 4, 5], 0.5) != 3 or percentile(list(range(1, 31)), 0.95) != 29:
+            print("✗ Percentiles are not nearest-rank")
+            return False
+
+        # Turns ended by an error or an exit command are closed too
+        heard = iter([RuntimeError("device lost"), "exit"])
+
+        def listen():
+            item = next(heard)
+            if isinstance(item, Exception):
+                raise item
+            return item
+
+        assistant.listen = listen
+        assistant.microphone_available = True
+        assistant.run()
+        if len(turns) != 5 or tracer._turn is not None:
+            print(f"✗ Error and exit turns left open: {len(turns)} traced")
+            return False
+
+        print(f"✓ Traced {len(turns)} turns (LLM p50: {summary['llm']['p50_ms']}ms)")
+        print(tracer.report())
+        return True
+    except Exception as e:
+        print(f"✗ Latency tracing failed: {e}")
+        return False
+
+
+class FakeTTSEngine:
+    """Stand-in for pyttsx3 that 'speaks' for a time proportional to the text"""
+
+    def __init__(self, seconds_per_char=0.01):
+        self.seconds_per_char = seconds_per_char
+        self.spoken = []
+        self.interrupted = []
+        self._text = None
+        self._stopped = threading.Event()
+
+    def say(self, text):
+        self._text = text
+        self._stopped.clear()
+
+    def runAndWait(self):
+        if self._stopped.wait(len(self._text) * self.seconds_per_char):
+            self.interrupted.append(self._text)
+        else:
+            self.spoken.append(self._text)
+
+    def stop(self):
+        self._stopped.set()
+
+
+class FakeAudioSource:
+    """Replays scripted (delay, phrase) pairs as captured 'audio'"""
+
+    def __init__(self, script):
+        self.script = list(script)
+
+    def capture(self):
+        if not self.script:
+            time.sleep(0.01)
+            return None
+        delay, phrase = self.script.pop(0)
+        time.sleep(delay)
+        return phrase
+
+
+def test_pipelined_barge_in():
+    """Test the pipelined run mode with barge-in using fake audio and TTS"""
+    print("\nTesting pipelined listen/think/speak loop...")
+    try:
+        assistant = VoiceAssistant(api_key=None)
+        engine = FakeTTSEngine()
+        assistant.tts_engine = engine
+        assistant.tts_available = True
+        turns = []
+        assistant.tracer.add_sink(turns.append)
+
+        # Interrupt the greeting, let the time reply finish, then say goodbye
+        source = FakeAudioSource([(0.1, "hello"), (0.1, "what time is it"), (1.0, "goodbye")])
+        pipeline = VoicePipeline(assistant, capture=source.capture, recognize=lambda audio: audio)
+
+        runner = threading.Thread(target=pipeline.run, daemon=True)
+        runner.start()
+        runner.join(10)
+
+        if runner.is_alive():
+            print("✗ Pipeline did not shut down after the exit command")
+            return False
+        if pipeline.interruptions < 1 or not engine.interrupted:
+            print(f"✗ Expected speech to be interrupted (spoken: {engine.spoken})")
+            return False
+        if not any(text.startswith("The current time is") for text in engine.spoken):
+            print(f"✗ Reply to the latest question was not spoken: {engine.spoken}")
+            return False
+        if engine.spoken[-1] != "Goodbye! Have a great day!":
+            print(f"✗ Expected farewell last, got: {engine.spoken}")
+            return False
+        # One turn per utterance, each with its own spans
+        if len(turns) != 3 or not all("llm" in turn["spans"] for turn in turns[:2]):
+            print(f"✗ Expected 3 traced turns with LLM spans, got: {turns}")
+            return False
+        if "tts" not in turns[1]["spans"] or "llm" in turns[2]["spans"]:
+            print(f"✗ Spans attributed to the wrong turn: {turns}")
+            return False
+
+        print(f"✓ Pipeline interrupted {len(engine.interrupted)} utterance(s), spoke: {engine.spoken}")
+        return True
+    except Exception as e:
+        print(f"✗ Pipelined loop failed: {e}")
+        return False
+
+
+def test_barge_in_echo_guard():
+    """Test the assistant's own voice does not barge in while louder speech still does"""
+    print("\nTesting barge-in echo guard...")
+    try:
+        assistant = VoiceAssistant(api_key=None)
+        mic = assistant.microphone = FakeMicrophone()
+        assistant.microphone_available = True
+        pipeline = VoicePipeline(assistant)
+        source = assistant.open_microphone()
+        calibrated = assistant.recognizer.energy_threshold
+        echo_level = int(calibrated * 2)
+
+        def captured(level):
+            mic.user_speaks(after=0.1, duration=0.5, level=level)
+            try:
+                return pipeline._capture_from(source) is not None
+            except sr.WaitTimeoutError:
+                return False
+
+        with pipeline._echo_guard():
+            echo_heard = captured(echo_level)
+            speech_heard = captured(mic.speech_level)
+        if echo_heard or not speech_heard:
+            print(f"✗ While speaking: echo captured={echo_heard}, speech captured={speech_heard}")
+            return False
+        if assistant.recognizer.energy_threshold != calibrated:
+            print(f"✗ Threshold not restored: {assistant.recognizer.energy_threshold} != {calibrated}")
+            return False
+        if not captured(echo_level):
+            print("✗ The same level was not captured once the assistant stopped talking")
+            return False
+        assistant.close_microphone()
+
+        print(f"✓ Echo at {echo_level} ignored while speaking (threshold {calibrated:.0f} x {pipeline.echo_margin:g})")
+        return True
+    except Exception as e:
+        print(f"✗ Echo guard failed: {e}")
+        return False
+
+
+def test_incremental_speech():
+    """Test sentence splitting and sentence-by-sentence TTS from a streamed reply"""
+    print("\nTesting incremental speech...")
+    try:
+        sentences = split_sentences("Hi there! Dr. Lee said it costs 3.5 dollars. Anything else?")
+        if sentences != ["Hi there!", "Dr. Lee said it costs 3.5 dollars.", "Anything else?"]:
+            print(f"✗ Unexpected sentence split: {sentences}")
+            return False
+        streamed = list(iter_sentences(["Hel", "lo. How a", "re you? Fi", "ne"]))
+        if streamed != ["Hello.", "How are you?", "Fine"]:
+            print(f"✗ Unexpected streamed split: {streamed}")
+            return False
+
+        assistant = VoiceAssistant(api_key=None, incremental_speech=True)
+        engine = FakeTTSEngine(seconds_per_char=0)
+        assistant.tts_engine = engine
+        assistant.tts_available = True
+
+        # The first sentence must be spoken before the stream has finished
+        said_before_end = []
+
+        def deltas():
+            for delta in ["First sentence. ", "Second ", "sentence. ", "Third."]:
+                yield delta
+            said_before_end.extend(engine.spoken)
+
+        text = assistant.speak_stream(deltas())
+        if engine.spoken != ["First sentence.", "Second sentence.", "Third."]:
+            print(f"✗ Unexpected utterances: {engine.spoken}")
+            return False
+        if said_before_end[:2] != ["First sentence.", "Second sentence."] or text != " ".join(engine.spoken):
+            print(f"✗ Speech did not start before the stream ended: {said_before_end}")
+            return False
+
+        print(f"✓ Spoke {len(engine.spoken)} sentences incrementally")
+        return True
+    except Exception as e:
+        print(f"✗ Incremental speech failed: {e}")
+        return False
+
+
+def test_persistent_microphone():
+    """Test that the microphone stays open and is calibrated once, not every turn"""
+    print("\nTesting one-time microphone calibration...")
+    try:
+        assistant = VoiceAssistant(api_key=None)
+        mic = assistant.microphone = FakeMicrophone()
+        assistant.microphone_available = True
+        assistant.stt_backend = FixedSTTBackend("hello")
+
+        assistant.open_microphone()
+        heard = []
+        for _ in range(3):
+            mic.user_speaks(after=0.2, duration=0.5)
+            heard.append(assistant.listen())
+        assistant.close_microphone()
+
+        calibrations = assistant.tracer.summary()["calibration"]["count"]
+        if heard != ["hello"] * 3:
+            print(f"✗ Expected three recognized phrases, got {heard}")
+            return False
+        if mic.opened != 1 or calibrations != 1:
+            print(f"✗ Microphone opened {mic.opened}x and calibrated {calibrations}x over 3 turns")
+            return False
+        if mic.stream is not None:
+            print("✗ Microphone was not released")
+            return False
+
+        print("✓ Microphone opened and calibrated once across 3 turns")
+        return True
+    except Exception as e:
+        print(f"✗ Persistent microphone failed: {e}")
+        return False
+
+
+def test_stt_backends():
+    """Test backend selection and recognition of recorded WAV files through a fake backend"""
+    print("\nTesting speech-to-text backends...")
+    try:
+        if not isinstance(create_stt_backend("google"), GoogleSTTBackend):
+            print("✗ 'google' did not select the Google backend")
+            return False
+        try:
+            create_stt_backend("unknown")
+            print("✗ Unknown backend name was accepted")
+            return False
+        except ValueError:
+            pass
+
+        # An offline backend that cannot load (missing package/model) falls back to Google
+        os.environ["STT_BACKEND"] = "vosk"
+        os.environ["VOSK_MODEL_PATH"] = os.path.join(tempfile.mkdtemp(), "missing-model")
+        try:
+            assistant = VoiceAssistant(api_key=None)
+        finally:
+            del os.environ["STT_BACKEND"], os.environ["VOSK_MODEL_PATH"]
+        if not isinstance(assistant.stt_backend, GoogleSTTBackend):
+            print(f"✗ Expected Google fallback, got {assistant.stt_backend.name}")
+            return False
+
+        folder = tempfile.mkdtemp()
+        speech_path = os.path.join(folder, "speech.wav")
+        silence_path = os.path.join(folder, "silence.wav")
+        write_wav(speech_path, [(0.2, 0), (0.6, 4000), (0.2, 0)])
+        write_wav(silence_path, [(1.0, 30)])
+
+        assistant.stt_backend = EnergySTTBackend("turn on the lights")
+        heard = []
+        for path in (speech_path, silence_path):
+            with sr.AudioFile(path) as source:
+                heard.append(assistant.recognize(assistant.recognizer.record(source)))
+
+        if heard != ["turn on the lights", None]:
+            print(f"✗ Unexpected transcripts: {heard}")
+            return False
+
+        print("✓ Backends selectable; recorded WAV files recognized through the backend")
+        return True
+    except Exception as e:
+        print(f"✗ STT backends failed: {e}")
+        return False
+
+
+def test_streaming_recognition():
+    """Test interim hypotheses and VAD endpointing against whole-phrase capture"""
+    print("\nTesting streaming recognition...")
+    try:
+        def end_of_speech_gap(streaming):
+            messages = []
+            assistant = VoiceAssistant(
+                api_key=None,
+                chat_callback=lambda sender, text: messages.append((sender, text)),
+                streaming_recognition=streaming,
+                stt_backend=ScriptedStreamingSTTBackend("what is the weather today")
+            )
+            mic = assistant.microphone = FakeMicrophone()
+            assistant.microphone_available = True
+            assistant.open_microphone()
+            # A constant test tone would drag the adaptive threshold up mid-phrase
+            assistant.recognizer.dynamic_energy_threshold = False
+
+            mic.user_speaks(after=0.2, duration=1.0)
+            text = assistant.listen()
+            assistant.close_microphone()
+            # Audio consumed after the user stopped talking before the phrase closed
+            return text, mic.now - mic.speech[-1][1], messages
+
+        text, streamed_gap, messages = end_of_speech_gap(True)
+        _, blob_gap, _ = end_of_speech_gap(False)
+        partials = [t for sender, t in messages if sender == "user_partial"]
+
+        if text != "what is the weather today":
+            print(f"✗ Unexpected final transcript: {text}")
+            return False
+        if len(partials) < 2 or not "what is the weather today".startswith(partials[0]):
+            print(f"✗ Expected growing interim hypotheses, got {partials}")
+            return False
+        if streamed_gap >= blob_gap:
+            print(f"✗ Streaming endpoint ({streamed_gap:.2f}s) not faster than whole-phrase ({blob_gap:.2f}s)")
+            return False
+
+        print(f"✓ {len(partials)} interim results; phrase closed {streamed_gap * 1000:.0f} ms after speech "
+              f"(whole-phrase capture: {blob_gap * 1000:.0f} ms)")
+        return True
+    except Exception as e:
+        print(f"✗ Streaming recognition failed: {e}")
+        return False
+
+
+def test_wake_word_gating():
+    """Test that background noise never reaches STT until the wake word is spotted"""
+    print("\nTesting wake word gating...")
+    try:
+        stt = FixedSTTBackend("what time is it")
+        assistant = VoiceAssistant(api_key=None, stt_backend=stt, wake_word_detector=LevelWakeWordDetector(7000))
+        mic = assistant.microphone = FakeMicrophone()
+        assistant.microphone_available = True
+        assistant.open_microphone()
+
+        # Ten bursts of background chatter, then the wake word followed by a command
+        for i in range(10):
+            mic.user_speaks(after=0.3 + i, duration=0.4)
+        mic.user_speaks(after=10.5, duration=0.3, level=7000)
+        mic.user_speaks(after=10.9, duration=0.6)
+
+        heard = [assistant.listen() for _ in range(3)]
+        assistant.close_microphone()
+        stats = assistant.wake_word_spotter.stats()
+
+        if "what time is it" not in heard or stt.calls != 1:
+            print(f"✗ Expected exactly one STT call after the wake word, got {stt.calls} ({heard})")
+            return False
+        if stats["detections"] != 1 or stats["frames_scored"] >= stats["frames_read"]:
+            print(f"✗ Unexpected spotter stats: {stats}")
+            return False
+
+        print(f"✓ 1 STT call for 11 bursts; detector scored {stats['frames_scored']}/{stats['frames_read']} frames")
+        return True
+    except Exception as e:
+        print(f"✗ Wake word gating failed: {e}")
+        return False
+
+
+def test_intent_matcher():
+    """Test word-boundary intent matching, priorities and the LLM fast path"""
+    print("\nTesting intent matcher...")
+    try:
+        matcher = IntentMatcher(DEFAULT_INTENTS + [
+            Intent("lights", ["turn on the light*"], "Lights on", priority=70)
+        ])
+        cases = [
+            ("Hello there!", "greeting"),
+            ("this is it", None),                       # no "hi" inside "this"
+            ("sometimes I wonder", None),               # no "time" inside "sometimes"
+            ("thanks so much", "thanks"),
+            ("hi, please stop", "exit"),                # exit outranks greeting
+            ("could you turn on the lights", "lights"),
+            ("what's the date today", "date")
+        ]
+        for text, expected in cases:
+            intent = matcher.match(text)
+            if (intent.name if intent else None) != expected:
+                print(f"✗ '{text}' matched {intent.name if intent else None}, expected {expected}")
+                return False
+
+        # With an LLM configured, fast-path intents are answered without calling it
+        llm = StubProvider()
+        assistant = VoiceAssistant(api_key="sk-test", llm_provider=llm)
+        reply = assistant.generate_ai_response("what time is it")
+        if (not reply.startswith("The current time is") or len(assistant.conversation_history) != 2
+                or llm.calls):
+            print(f"✗ Fast path did not answer locally: {reply}")
+            return False
+
+        # Questions that only mention the time or date still go to the LLM
+        for text in ("what time does the museum open", "tell me the date of the moon landing",
+                     "what day is it in Tokyo tomorrow"):
+            if assistant.local_response(text) is not None:
+                print(f"✗ '{text}' was answered locally")
+                return False
+        for text in ("Could you tell me the time, please?", "what's the date today"):
+            if assistant.local_response(text) is None:
+                print(f"✗ '{text}' was not answered locally")
+                return False
+        assistant.generate_ai_response("what time does the museum open")
+        if llm.calls != 1:
+            print("✗ A specific time question did not reach the LLM")
+            return False
+
+        print(f"✓ {len(cases)} utterances matched; bare time questions answered locally with an API key")
+        return True
+    except Exception as e:
+        print(f"✗ Intent matcher failed: {e}")
+        return False
+
+
+def test_llm_providers():
+    """Test the shared provider layer: history mapping, retries and streaming"""
+    print("\nTesting LLM providers...")
+    try:
+        class FakeCompletions:
+            def __init__(self):
+                self.calls = []
+
+            def create(self, stream=False, **params):
+                self.calls.append(params)
+                if len(self.calls) == 1:
+                    raise ConnectionError("connection reset by peer")
+                message = type("Message", (), {"content": " Sure thing. "})
+                return type("Response", (), {"choices": [type("Choice", (), {"message": message})]})
+
+        completions = FakeCompletions()
+        client = type("Client", (), {"chat": type("Chat", (), {"completions": completions})})
+        provider = OpenAIProvider("sk-test", client=client, retry=RetryPolicy(sleep=lambda delay: None))
+        reply = provider.generate([{"role": "user", "content": "hi"}, {"role": "model", "content": "hello"}],
+                                  system_prompt="Be brief.")
+        roles = [m["role"] for m in completions.calls[-1]["messages"]]
+        if reply != "Sure thing." or len(completions.calls) != 2 or roles != ["system", "user", "assistant"]:
+            print(f"✗ OpenAI provider returned {reply!r} after {len(completions.calls)} calls, roles {roles}")
+            return False
+
+        # The assistant streams through whichever provider it was given
+        llm = StubProvider()
+        assistant = VoiceAssistant(api_key=None, llm_provider=llm)
+        deltas = list(assistant.generate_ai_response_stream("tell me a story"))
+        if "".join(deltas) != "You said: tell me a story" or len(deltas) < 2 or llm.calls != 1:
+            print(f"✗ Unexpected stream: {deltas}")
+            return False
+        if assistant.conversation_history[-1]["content"] != "You said: tell me a story":
+            print("✗ Streamed reply missing from history")
+            return False
+
+        print(f"✓ Reset connection retried; stub streamed {len(deltas)} deltas")
+        return True
+    except Exception as e:
+        print(f"✗ LLM providers failed: {e}")
+        return False
+
+
+class FakeBubble:
+    """Records what a chat bubble would display"""
+
+    def __init__(self, order):
+        self.order = order
+        self.content = None
+
+    def show(self, sender, text):
+        self.content = (sender, text)
+        if self in self.order:
+            self.order.remove(self)
+        self.order.append(self)
+
+    def update(self, text):
+        self.content = (self.content[0], text)
+
+    def hide(self):
+        self.order.remove(self)
+
+
+def test_virtual_message_list():
+    """Stress the chat view: thousands of messages keep a fixed widget pool"""
+    print("\nTesting virtual message list...")
+    try:
+        order = []
+        scheduled = []
+        view = VirtualMessageList(lambda: FakeBubble(order), log=ChatLog(max_messages=500), max_widgets=40)
+        batcher = MessageBatcher(lambda ms, callback: scheduled.append(callback), view.add_batch)
+
+        frame_times = []
+        for turn in range(2500):
+            batcher.push("user_partial", "question")
+            batcher.push("user_partial", f"question {turn} in")
+            batcher.push("user", f"question {turn} in full")
+            batcher.push("assistant", f"answer {turn}")
+            if turn % 5 == 4:
+                start = time.perf_counter()
+                while scheduled:
+                    scheduled.pop()()
+                frame_times.append(time.perf_counter() - start)
+
+        stats = view.stats()
+        shown = [bubble.content for bubble in order]
+        if stats["widgets"] != 40 or stats["stored"] != 500 or stats["messages"] != 5000:
+            print(f"✗ Unexpected stats: {stats}")
+            return False
+        if shown[-2:] != [("user", "question 2499 in full"), ("assistant", "answer 2499")] or len(shown) != 40:
+            print(f"✗ Wrong bubbles on screen: {shown[-2:]}")
+            return False
+
+        # A partial transcript on screen is updated in place
+        view.add("user_partial", "what is")
+        view.add("user", "what is the weather")
+        if order[-1].content != ("user", "what is the weather") or view.stats()["widgets"] != 40:
+            print("✗ Final transcript did not replace the partial bubble")
+            return False
+
+        worst = max(frame_times) * 1000
+        print(f"✓ {stats['messages']} messages in {len(frame_times)} frames with {stats['widgets']} widgets "
+              f"(worst frame {worst:.2f} ms)")
+        return True
+    except Exception as e:
+        print(f"✗ Virtual message list failed: {e}")
+        return False
+
+
 def main():
     """Run all tests"""
     print("="*60)
@@ -103,7 +668,18 @@ def main():
         test_initialization,
         test_fallback_responses,
         test_conversation_history,
-        test_tts_engine
+        test_tts_engine,
+        test_latency_tracing,
+        test_pipelined_barge_in,
+        test_barge_in_echo_guard,
+        test_incremental_speech,
+        test_persistent_microphone,
+        test_stt_backends,
+        test_streaming_recognition,
+        test_wake_word_gating,
+        test_intent_matcher,
+        test_llm_providers,
+        test_virtual_message_list
     ]
     
     results = []
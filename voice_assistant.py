@@ -8,35 +8,63 @@ import speech_recognition as sr
 import pyttsx3
 import os
 import sys
+import time
 from datetime import datetime
 from dotenv import load_dotenv
 
+from intents import DEFAULT_INTENTS, IntentMatcher
+from sentence_splitter import iter_sentences, split_sentences
+from stt_backends import GoogleSTTBackend, STTStream, create_stt_backend
+from streaming_recognition import StreamingRecognizer
+from wake_word import WakeWordSpotter, create_wake_word_detector
+from voice_pipeline import VoicePipeline
+from voice_tracing import JsonlSink, Tracer
+# The LLM provider layer (pooled clients, retries, streaming) is shared with the backend
+from llm_providers import OpenAIProvider, create_provider
+
 # Load environment variables
 load_dotenv()
 
-# Handle different OpenAI library versions
-try:
-    from openai import OpenAI
-    OPENAI_V1 = True
-    openai_module = None  # Not needed for v1
-except ImportError:
-    import openai as openai_module
-    OpenAI = None
-    OPENAI_V1 = False
-
 
     # Initialize the voice assistant
         
 class VoiceAssistant:
     """Main Voice Assistant class"""
     
-    def __init__(self, api_key=None, status_callback=None, chat_callback=None):
+    def __init__(self, api_key=None, status_callback=None, chat_callback=None, tracer=None,
+                 incremental_speech=False, calibration_interval=None, stt_backend=None,
+                 streaming_recognition=False, wake_word_detector=None, llm_provider=None):
         """Initialize the voice assistant with necessary components"""
         self.status_callback = status_callback
         self.chat_callback = chat_callback
         self.is_running = False
+        self.is_speaking = False
+        self._speech_interrupted = False
+        # Speak sentence by sentence (streaming the LLM reply) instead of all at once
+        self.incremental_speech = incremental_speech
+        # Per-stage latency tracing (calibration, capture, STT, LLM, TTS)
+        self.tracer = tracer or Tracer()
         # Initialize speech recognition
         self.recognizer = sr.Recognizer()
+        # Let the energy threshold follow ambient noise while listening, so the
+        # microphone only needs an explicit calibration when it is first opened
+        self.recognizer.dynamic_energy_threshold = True
+        # Seconds between explicit recalibrations (None: only on open, 0: every turn)
+        self.calibration_interval = calibration_interval
+        self._source = None
+        self._calibrated_at = None
+        
+        # Speech-to-text engine (selected by STT_BACKEND; Google if it cannot load)
+        try:
+            self.stt_backend = stt_backend or create_stt_backend(recognizer=self.recognizer)
+        except Exception as e:
+            print(f"Warning: STT backend initialization failed: {e}")
+            print("Falling back to Google speech recognition.")
+            self.stt_backend = GoogleSTTBackend(self.recognizer)
+        # Stream frames to the backend while the user talks and end the phrase
+        # after a short pause (VAD endpointing) instead of recognizing afterwards
+        self.streaming_recognition = streaming_recognition
+        self.streaming_recognizer = StreamingRecognizer()
         
         # Try to initialize microphone (may fail if PyAudio not available)
         try:
@@ -60,23 +88,30 @@ class VoiceAssistant:
             self.tts_engine = None
             self.tts_available = False
         
-        # Initialize OpenAI API
+        # Chat model: OpenAI by default, or any provider passed in; one client
+        # (and its pooled connection) is kept for the assistant's lifetime
         self.api_key = api_key or os.getenv('OPENAI_API_KEY')
-        if self.api_key:
-            if OPENAI_V1:
-                self.openai_client = OpenAI(api_key=self.api_key)
-            else:
-                openai_module.api_key = self.api_key
-                self.openai_client = None
-        else:
-            self.openai_client = None
+        if llm_provider is None and self.api_key:
+            llm_provider = OpenAIProvider(self.api_key)
+        self.llm = llm_provider
         
         # Conversation history
         self.conversation_history = []
         
+        # Local intents (fallback replies and fast-path commands)
+        self.intents = IntentMatcher(DEFAULT_INTENTS)
+        
         # Wake word
         self.wake_word = "assistant"
         
+        # Optional local keyword spotting so speech recognition only runs after the wake word
+        try:
+            detector = wake_word_detector or create_wake_word_detector(self.wake_word)
+        except Exception as e:
+            print(f"Warning: Wake word detector initialization failed: {e}")
+            detector = None
+        self.wake_word_spotter = WakeWordSpotter(detector) if detector else None
+        
         print("Voice Assistant initialized successfully!")
         
     def speak(self, text):
@@ -88,9 +123,64 @@ class VoiceAssistant:
         if self.status_callback:
             self.status_callback("Speaking...")
 
-        if self.tts_available and self.tts_engine:
-            self.tts_engine.say(text)
-            self.tts_engine.runAndWait()
+        self._speak_chunks(split_sentences(text) if self.incremental_speech else [text])
+    
+    def speak_stream(self, deltas):
+        """
+        Speak a streamed response sentence by sentence as the deltas arrive,
+        so the first sentence plays before the rest has been generated.
+        Returns the full text.
+        """
+        sentences = []
+        
+        def collect():
+            for sentence in iter_sentences(self.tracer.timed_iter("llm", deltas)):
+                sentences.append(sentence)
+                yield sentence
+        
+        self._speak_chunks(collect())
+        text = " ".join(sentences)
+        
+        print(f"Assistant: {text}")
+        if self.chat_callback:
+            self.chat_callback("assistant", text)
+        return text
+    
+    def say(self, text):
+        """Voice text without echoing it to the console or GUI"""
+        self._speak_chunks([text], trace_first_audio=False)
+    
+    def _speak_chunks(self, chunks, trace_first_audio=True):
+        """Feed chunks to the TTS engine one at a time until done or interrupted"""
+        started = time.perf_counter()
+        spoken = 0.0
+        self.is_speaking = True
+        self._speech_interrupted = False
+        try:
+            for chunk in chunks:
+                # Keep draining after an interruption so streamed replies complete
+                if self._speech_interrupted or not (self.tts_available and self.tts_engine):
+                    continue
+                if not spoken:
+                    if trace_first_audio:
+                        self.tracer.record("first_audio", time.perf_counter() - started)
+                    if self.status_callback:
+                        self.status_callback("Speaking...")
+                say_start = time.perf_counter()
+                self.tts_engine.say(chunk)
+                self.tts_engine.runAndWait()
+                spoken += time.perf_counter() - say_start
+        finally:
+            self.is_speaking = False
+            if spoken:
+                self.tracer.record("tts", spoken)
+    
+    def stop_speaking(self):
+        """Interrupt an utterance that is currently being spoken"""
+        if self.is_speaking:
+            self._speech_interrupted = True
+            if self.tts_engine:
+                self.tts_engine.stop()
     
     def listen(self):
         """Listen for voice input and convert to text"""
@@ -98,39 +188,113 @@ class VoiceAssistant:
             print("Microphone not available")
             return None
             
-        with self.microphone as source:
-            print("Listening...")
-            if self.status_callback:
-                self.status_callback("Listening...")
-                
-            # Adjust for ambient noise
+        if self._source is None:
+            source = self.open_microphone()
+        else:
+            source = self._source
+            if self.calibration_due():
+                self.calibrate(source)
+        if not self.wake_word_heard(source):
+            return None
+        print("Listening...")
+        if self.status_callback:
+            self.status_callback("Listening...")
+            
+        try:
+            audio = self.capture_audio(source)
+        except sr.WaitTimeoutError:
+            return None
+        except Exception:
+            # Reopen the device on the next turn rather than reuse a broken stream
+            self.close_microphone()
+            raise
+            
+        return self.recognize(audio)
+    
+    def open_microphone(self):
+        """Open the microphone stream once and keep it open across turns"""
+        if self._source is None:
+            self._source = self.microphone.__enter__()
+            self.calibrate(self._source)
+        return self._source
+    
+    def close_microphone(self):
+        """Release the persistent microphone stream"""
+        if self._source is not None:
+            self._source = None
+            self.microphone.__exit__(None, None, None)
+    
+    def calibrate(self, source):
+        """Estimate the ambient noise level for the energy threshold"""
+        with self.tracer.span("calibration"):
             self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-            try:
-                audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=10)
-                print("Processing speech...")
-                if self.status_callback:
-                    self.status_callback("Thinking...")
-                
-                text = self.recognizer.recognize_google(audio)
-                print(f"You said: {text}")
-                return text
-            except sr.WaitTimeoutError:
-                return None
-            except sr.UnknownValueError:
-                print("Could not understand audio")
-                return None
-            except sr.RequestError as e:
-                print(f"Could not request results; {e}")
-                return None
+        self._calibrated_at = time.monotonic()
+    
+    def calibration_due(self):
+        """True if the periodic recalibration interval has elapsed"""
+        if self.calibration_interval is None or self._calibrated_at is None:
+            return False
+        return time.monotonic() - self._calibrated_at >= self.calibration_interval
+    
+    def wake_word_heard(self, source, timeout=5):
+        """Wait for the wake word when a detector is configured (always True otherwise)"""
+        if not self.wake_word_spotter:
+            return True
+        if self.status_callback:
+            self.status_callback(f"Say '{self.wake_word}' to start")
+        return self.wake_word_spotter.wait(source, self.recognizer.energy_threshold, timeout=timeout)
+    
+    def capture_audio(self, source, timeout=5, phrase_time_limit=10):
+        """
+        Record one phrase from an open audio source (raises sr.WaitTimeoutError).
+        In streaming mode this returns the STT session the phrase was streamed into.
+        """
+        with self.tracer.span("capture"):
+            if self.streaming_recognition:
+                return self.streaming_recognizer.capture(
+                    source, self.stt_backend, self.recognizer.energy_threshold,
+                    on_partial=self._show_partial, timeout=timeout
+                )
+            return self.recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
+    
+    def _show_partial(self, text):
+        """Forward an interim hypothesis while the user is still speaking"""
+        if self.chat_callback:
+            self.chat_callback("user_partial", text)
+    
+    def recognize(self, audio):
+        """Convert captured audio (or a streamed STT session) to text, returning None if nothing was understood"""
+        print("Processing speech...")
+        if self.status_callback:
+            self.status_callback("Thinking...")
+        
+        try:
+            with self.tracer.span("stt"):
+                if isinstance(audio, STTStream):
+                    text = audio.finish()
+                else:
+                    text = self.stt_backend.transcribe(audio)
+            print(f"You said: {text}")
+            return text
+        except sr.UnknownValueError:
+            print("Could not understand audio")
+            return None
+        except sr.RequestError as e:
+            print(f"Could not request results; {e}")
+            return None
     
     def generate_ai_response(self, user_input):
-        """Generate AI response using OpenAI API"""
+        """Generate AI response using the configured LLM provider"""
         if self.status_callback:
             self.status_callback("Thinking...")
-        if not self.api_key:
+        if self.llm is None:
             # Fallback responses if no API key
             return self.generate_fallback_response(user_input)
         
+        local = self.local_response(user_input)
+        if local:
+            return local
+        
         try:
             # Add user message to conversation history
             self.conversation_history.append({
@@ -138,71 +302,90 @@ class VoiceAssistant:
                 "content": user_input
             })
             
-            # Generate response using OpenAI
-            if OPENAI_V1 and self.openai_client:
-                # New OpenAI library (v1.0+)
-                response = self.openai_client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful voice assistant. Provide concise and friendly responses."},
-                        *self.conversation_history
-                    ],
-                    max_tokens=150,
-                    temperature=0.7
-                )
-                assistant_message = response.choices[0].message.content.strip()
-            else:
-                # Old OpenAI library (v0.x)
-                response = openai_module.ChatCompletion.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful voice assistant. Provide concise and friendly responses."},
-                        *self.conversation_history
-                    ],
-                    max_tokens=150,
-                    temperature=0.7
-                )
-                assistant_message = response.choices[0].message.content.strip()
+            assistant_message = self.llm.generate(self.conversation_history, **self._completion_params())
             
-            # Add assistant response to conversation history
+            self._remember_reply(assistant_message)
+            return assistant_message
+            
+        except Exception as e:
+            print(f"Error generating AI response: {e}")
+            return "I'm having trouble processing that right now. Could you try again?"
+    
+    def generate_ai_response_stream(self, user_input):
+        """Generate an AI response as a stream of text deltas"""
+        if self.status_callback:
+            self.status_callback("Thinking...")
+        if self.llm is None:
+            yield self.generate_fallback_response(user_input)
+            return
+        
+        local = self.local_response(user_input)
+        if local:
+            yield local
+            return
+        
+        parts = []
+        try:
             self.conversation_history.append({
-                "role": "assistant",
-                "content": assistant_message
+                "role": "user",
+                "content": user_input
             })
             
-            # Keep conversation history manageable (last 10 messages)
-            if len(self.conversation_history) > 10:
-                self.conversation_history = self.conversation_history[-10:]
+            for delta in self.llm.stream(self.conversation_history, **self._completion_params()):
+                parts.append(delta)
+                yield delta
             
-            return assistant_message
+            self._remember_reply("".join(parts).strip())
             
         except Exception as e:
             print(f"Error generating AI response: {e}")
-            return "I'm having trouble processing that right now. Could you try again?"
+            if not parts:
+                yield "I'm having trouble processing that right now. Could you try again?"
+    
+    def _completion_params(self):
+        """Generation settings shared by the blocking and streaming calls"""
+        return {
+            "system_prompt": "You are a helpful voice assistant. Provide concise and friendly responses.",
+            "max_tokens": 150,
+            "temperature": 0.7
+        }
+    
+    def _remember_reply(self, assistant_message):
+        """Add the assistant's reply to the history, keeping it manageable (last 10 messages)"""
+        self.conversation_history.append({
+            "role": "assistant",
+            "content": assistant_message
+        })
+        if len(self.conversation_history) > 10:
+            self.conversation_history = self.conversation_history[-10:]
     
     def generate_fallback_response(self, user_input):
         """Generate basic responses without AI API"""
-        user_input_lower = user_input.lower()
-        
-        # Simple pattern matching for common queries
-        if any(word in user_input_lower for word in ['hello', 'hi', 'hey']):
-            return "Hello! How can I help you today?"
-        elif any(word in user_input_lower for word in ['how are you', 'how do you do']):
-            return "I'm doing well, thank you for asking! How can I assist you?"
-        elif 'time' in user_input_lower:
-            current_time = datetime.now().strftime("%I:%M %p")
-            return f"The current time is {current_time}"
-        elif 'date' in user_input_lower:
-            current_date = datetime.now().strftime("%B %d, %Y")
-            return f"Today's date is {current_date}"
-        elif any(word in user_input_lower for word in ['bye', 'goodbye', 'exit', 'quit']):
-            return "Goodbye! Have a great day!"
-        elif 'thank' in user_input_lower:
-            return "You're welcome! Is there anything else I can help you with?"
-        elif 'help' in user_input_lower:
-            return "I can help you with various tasks. Try asking me about the time, date, or just have a conversation!"
-        else:
-            return "I understand you said: " + user_input + ". How can I help you with that?"
+        response = self.intents.respond(user_input)
+        if response:
+            return response
+        return "I understand you said: " + user_input + ". How can I help you with that?"
+    
+    def local_response(self, user_input):
+        """Answer bare fast-path requests (time, date, ...) locally without calling the LLM"""
+        intent = self.intents.match_fast_path(user_input)
+        if not intent:
+            return None
+        response = intent.respond(user_input)
+        if self.llm is not None:
+            # Keep the exchange in the history so later LLM turns see it
+            self.conversation_history.append({"role": "user", "content": user_input})
+            self._remember_reply(response)
+        return response
+    
+    def is_exit_command(self, text):
+        """True if the text asks the assistant to shut down"""
+        intent = self.intents.match(text)
+        return bool(intent and intent.ends_conversation)
+    
+    def strip_wake_word(self, text):
+        """Remove the wake word from recognized text"""
+        return text.replace(self.wake_word, "").replace(self.wake_word.capitalize(), "").strip()
     
     def process_command(self, text):
         """Process voice command and take appropriate action"""
@@ -213,16 +396,18 @@ class VoiceAssistant:
         if self.chat_callback:
             self.chat_callback("user", text)
         
-        text_lower = text.lower()
-        
         # Check for exit commands
-        if any(word in text_lower for word in ['exit', 'quit', 'stop', 'goodbye']):
+        if self.is_exit_command(text):
             self.speak("Goodbye! Have a great day!")
             return True
         
         # Generate and speak response
-        response = self.generate_ai_response(text)
-        self.speak(response)
+        if self.incremental_speech:
+            self.speak_stream(self.generate_ai_response_stream(text))
+        else:
+            with self.tracer.span("llm"):
+                response = self.generate_ai_response(text)
+            self.speak(response)
         
         return False
     
@@ -238,29 +423,45 @@ class VoiceAssistant:
         listening_mode = True
         self.is_running = True
         
-        while self.is_running:
-            try:
-                # Listen for input
-                text = self.listen()
+        try:
+            while self.is_running:
+                try:
+                    # Listen for input
+                    self.tracer.start_turn()
+                    text = self.listen()
                 
-                if text:
-                    # Check if wake word is present or we're in continuous listening mode
-                    if listening_mode or self.wake_word in text.lower():
-                        # Remove wake word from text
-                        text = text.replace(self.wake_word, "").replace(self.wake_word.capitalize(), "").strip()
+                    if text:
+                        # Check if wake word is present or we're in continuous listening mode
+                        if listening_mode or self.wake_word in text.lower():
+                            # Remove wake word from text
+                            text = self.strip_wake_word(text)
                         
-                        if text:
-                            # Process the command
-                            should_exit = self.process_command(text)
-                            if should_exit:
-                                break
+                            if text:
+                                # Process the command
+                                should_exit = self.process_command(text)
+                                if should_exit:
+                                    break
                 
-            except KeyboardInterrupt:
-                self.speak("Shutting down. Goodbye!")
-                break
-            except Exception as e:
-                print(f"Error: {e}")
-                continue
+                except KeyboardInterrupt:
+                    self.speak("Shutting down. Goodbye!")
+                    break
+                except Exception as e:
+                    print(f"Error: {e}")
+                    continue
+                finally:
+                    # Close the turn on exit and error paths too, so it is not merged into the next one
+                    self.tracer.end_turn()
+        finally:
+            # Release the persistent microphone stream
+            self.close_microphone()
+    
+    def run_pipelined(self, barge_in=True):
+        """
+        Run with capture, recognition, LLM and TTS as concurrent workers.
+        Keeps listening while thinking and speaking; with barge_in, new
+        speech interrupts the reply being spoken.
+        """
+        VoicePipeline(self, barge_in=barge_in).run()
 
 
 def main():
@@ -271,16 +472,38 @@ def main():
     
     # Check for API key
     api_key = os.getenv('OPENAI_API_KEY')
-    if not api_key:
+    if not api_key and not os.getenv('LLM_PROVIDER'):
         print("\nWarning: OPENAI_API_KEY not found in environment variables.")
         print("The assistant will work with limited functionality.")
         print("To enable AI features, set your OpenAI API key:")
         print("export OPENAI_API_KEY='your-api-key-here'\n")
     
+    # Optional periodic recalibration on top of the dynamic energy threshold
+    calibration_interval = os.getenv('VOICE_CALIBRATION_INTERVAL')
+    
+    # Optional per-turn latency log, one JSON object per line
+    tracer = Tracer()
+    trace_file = os.getenv('VOICE_TRACE_FILE')
+    if trace_file:
+        tracer.add_sink(JsonlSink(trace_file))
+    
     try:
         # Create and run assistant
-        assistant = VoiceAssistant(api_key=api_key)
-        assistant.run()
+        assistant = VoiceAssistant(
+            api_key=api_key,
+            tracer=tracer,
+            incremental_speech=os.getenv('VOICE_INCREMENTAL_TTS', '').lower() in ('1', 'true', 'yes'),
+            calibration_interval=float(calibration_interval) if calibration_interval else None,
+            streaming_recognition=os.getenv('VOICE_STREAMING_STT', '').lower() in ('1', 'true', 'yes'),
+            llm_provider=create_provider() if os.getenv('LLM_PROVIDER') else None
+        )
+        if os.getenv('VOICE_PIPELINED', '').lower() in ('1', 'true', 'yes'):
+            assistant.run_pipelined()
+        else:
+            assistant.run()
+        if tracer.summary():
+            print("\nLatency per stage:")
+            print(tracer.report())
     except Exception as e:
         print(f"Failed to start voice assistant: {e}")
         sys.exit(1)
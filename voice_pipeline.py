@@ -0,0 +1,249 @@
+"""
+Pipelined run mode for the voice assistant
+Capture, recognition, LLM and TTS run as separate workers connected by queues,
+so the assistant keeps listening while it thinks and speaks
+"""
+
+import queue
+import threading
+from contextlib import contextmanager
+
+import speech_recognition as sr
+
+from sentence_splitter import iter_sentences
+
+
+# Marks the end of a queue; each worker forwards it downstream before exiting
+_STOP = object()
+
+
+class VoicePipeline:
+    """
+    Runs a VoiceAssistant as four concurrent workers:
+
+        capture -> audio queue -> recognition -> text queue -> LLM -> speech queue -> TTS
+
+    Every utterance is tagged with a generation number. With barge_in enabled,
+    speech captured while the assistant is talking stops the TTS engine and
+    bumps the generation, so replies that were queued or still being generated
+    for earlier utterances are dropped instead of spoken. The microphone also
+    hears the assistant's own voice, so while it talks the energy threshold
+    for capture is raised `echo_margin` times above the calibrated level;
+    only speech louder than the echo is captured and can barge in. When the assistant uses
+    incremental speech, the LLM worker streams the reply and queues each
+    sentence as soon as it is complete.
+
+    Each utterance is traced as one turn, from the end of its capture until
+    its reply has been spoken (or dropped); workers record their spans into
+    the turn of the item they are handling, so overlapping turns stay apart.
+
+    `capture` and `recognize` default to the assistant's microphone and speech
+    recognizer; tests can pass callables that replay scripted audio instead.
+    """
+
+    def __init__(self, assistant, capture=None, recognize=None, barge_in=True, capture_timeout=1,
+                 echo_margin=4.0):
+        self.assistant = assistant
+        self.capture = capture
+        self.recognize = recognize or assistant.recognize
+        self.barge_in = barge_in
+        self.capture_timeout = capture_timeout
+        self.echo_margin = echo_margin
+        self.tracer = assistant.tracer
+
+        self.audio_queue = queue.Queue()
+        self.text_queue = queue.Queue()
+        self.speech_queue = queue.Queue()
+
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._echo_guarded = False
+        self.interruptions = 0
+
+    @property
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def run(self):
+        """Start the workers and block until the pipeline shuts down"""
+        if self.capture is None and not self.assistant.microphone_available:
+            print("Error: Microphone not available. Cannot run voice assistant.")
+            print("Please install PyAudio and ensure a microphone is connected.")
+            return
+
+        self.assistant.is_running = True
+        workers = [
+            threading.Thread(target=target, name=f"voice-{name}", daemon=True)
+            for name, target in [
+                ("capture", self._capture_worker),
+                ("recognition", self._recognition_worker),
+                ("llm", self._llm_worker),
+                ("tts", self._tts_worker)
+            ]
+        ]
+        for worker in workers:
+            worker.start()
+
+        self.speech_queue.put((self.generation, None, "Hello! I'm listening. Just start speaking.", "reply"))
+
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(0.1)
+        except KeyboardInterrupt:
+            self.stop()
+            print("Shutting down. Goodbye!")
+
+    def stop(self):
+        """Ask the workers to finish; the capture worker exits on its next poll"""
+        self.assistant.is_running = False
+        self.assistant.stop_speaking()
+
+    def interrupt(self):
+        """Barge in: stop the current utterance and drop replies still queued"""
+        with self._lock:
+            self._generation += 1
+            self.interruptions += 1
+        self.assistant.stop_speaking()
+
+    @contextmanager
+    def _echo_guard(self):
+        """Raise the capture energy threshold while the assistant's own voice reaches the microphone"""
+        recognizer = self.assistant.recognizer
+        if self.echo_margin <= 1:
+            yield
+            return
+        calibrated = recognizer.energy_threshold
+        recognizer.energy_threshold = calibrated * self.echo_margin
+        self._echo_guarded = True
+        try:
+            yield
+        finally:
+            self._echo_guarded = False
+            # Also drops any adaptation to the echo made while listening
+            recognizer.energy_threshold = calibrated
+
+    def _capture_worker(self):
+        try:
+            if self.capture is not None:
+                self._capture_loop(self.capture)
+            else:
+                source = self.assistant.open_microphone()
+                self._capture_loop(lambda: self._capture_from(source))
+        except Exception as e:
+            print(f"Error in capture worker: {e}")
+            self.stop()
+        finally:
+            if self.capture is None:
+                self.assistant.close_microphone()
+            self.audio_queue.put(_STOP)
+
+    def _capture_from(self, source):
+        # Calibrating now would take the assistant's voice for ambient noise
+        if self.assistant.calibration_due() and not self._echo_guarded:
+            self.assistant.calibrate(source)
+        if not self.assistant.wake_word_heard(source, timeout=self.capture_timeout):
+            return None
+        return self.assistant.capture_audio(source, timeout=self.capture_timeout)
+
+    def _capture_loop(self, capture):
+        # Listening never stops here, so capture time is not part of any turn
+        with self.tracer.use_turn(None):
+            while self.assistant.is_running:
+                try:
+                    audio = capture()
+                except sr.WaitTimeoutError:
+                    continue
+                if audio is None:
+                    continue
+                if self.barge_in and self.assistant.is_speaking:
+                    self.interrupt()
+                self.audio_queue.put((self.tracer.start_turn(), audio))
+
+    def _recognition_worker(self):
+        while True:
+            item = self.audio_queue.get()
+            if item is _STOP:
+                break
+            turn, audio = item
+            try:
+                with self.tracer.use_turn(turn):
+                    text = self.recognize(audio)
+            except Exception as e:
+                print(f"Error recognizing speech: {e}")
+                text = None
+            if text:
+                text = self.assistant.strip_wake_word(text)
+            if text:
+                self.text_queue.put((self.generation, turn, text))
+            else:
+                self.tracer.end_turn(turn)
+        self.text_queue.put(_STOP)
+
+    def _llm_worker(self):
+        while True:
+            item = self.text_queue.get()
+            if item is _STOP:
+                break
+            generation, turn, text = item
+            try:
+                with self.tracer.use_turn(turn):
+                    self._reply(generation, turn, text)
+            except Exception as e:
+                print(f"Error: {e}")
+            finally:
+                # The TTS worker closes the turn once everything queued before this is spoken
+                self.speech_queue.put((generation, turn, None, "end"))
+        self.speech_queue.put(_STOP)
+
+    def _reply(self, generation, turn, text):
+        if self.assistant.chat_callback:
+            self.assistant.chat_callback("user", text)
+
+        if self.assistant.is_exit_command(text):
+            self.speech_queue.put((generation, turn, "Goodbye! Have a great day!", "exit"))
+        elif self.assistant.incremental_speech:
+            self._stream_reply(generation, turn, text)
+        else:
+            with self.tracer.span("llm"):
+                response = self.assistant.generate_ai_response(text)
+            self.speech_queue.put((generation, turn, response, "reply"))
+
+    def _stream_reply(self, generation, turn, text):
+        """Queue each sentence of a streamed reply as soon as it is complete"""
+        stream = self.assistant.generate_ai_response_stream(text)
+        sentences = []
+        for sentence in iter_sentences(self.tracer.timed_iter("llm", stream)):
+            sentences.append(sentence)
+            self.speech_queue.put((generation, turn, sentence, "sentence"))
+
+        reply = " ".join(sentences)
+        print(f"Assistant: {reply}")
+        if self.assistant.chat_callback:
+            self.assistant.chat_callback("assistant", reply)
+
+    def _tts_worker(self):
+        while True:
+            item = self.speech_queue.get()
+            if item is _STOP:
+                break
+            generation, turn, text, kind = item
+            if kind == "end":
+                self.tracer.end_turn(turn)
+                continue
+            if kind == "exit":
+                with self.tracer.use_turn(turn), self._echo_guard():
+                    self.assistant.speak(text)
+                self.stop()
+                continue
+            if not self.assistant.is_running or generation < self.generation:
+                continue
+            with self.tracer.use_turn(turn), self._echo_guard():
+                if kind == "sentence":
+                    # Already shown by the LLM worker; just voice it
+                    self.assistant.say(text)
+                else:
+                    self.assistant.speak(text)
+            if self.assistant.status_callback and self.assistant.is_running and self.speech_queue.empty():
+                self.assistant.status_callback("Listening...")
@@ -0,0 +1,193 @@
+"""
+Per-stage latency tracing for the voice assistant pipeline
+Records spans (calibration, capture, STT, LLM, TTS) per turn and summarizes them
+"""
+
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# Pipeline stages in the order they run within a turn
+STAGES = ["calibration", "capture", "stt", "llm", "first_audio", "tts"]
+STAGE_LABELS = {
+    "calibration": "Calibrate",
+    "capture": "Capture",
+    "stt": "STT",
+    "llm": "LLM",
+    "first_audio": "First audio",
+    "tts": "TTS"
+}
+
+# use_turn() not in effect: record into the turn started last
+_CURRENT = object()
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class JsonlSink:
+    """Appends each finished turn as one JSON line to a file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, turn):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(turn) + "\n")
+
+
+class CallbackSink:
+    """Forwards each finished turn to a callback (e.g. a GUI status bar)"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def __call__(self, turn):
+        self.callback(turn)
+
+
+class Tracer:
+    """
+    Collects per-turn stage spans and keeps recent durations for summaries
+
+    Spans go to the turn started last, unless the recording thread has
+    picked a turn with use_turn(); the pipelined run mode uses that to keep
+    overlapping turns apart.
+    """
+
+    def __init__(self, sinks=None, history=1000):
+        self.sinks = list(sinks or [])
+        self._lock = threading.Lock()
+        self._durations = {}
+        self._history = history
+        self._turn = None
+        self._turn_count = 0
+        self._open = {}
+        self._local = threading.local()
+
+    def add_sink(self, sink):
+        """Register a callable receiving each finished turn dict"""
+        self.sinks.append(sink)
+
+    def start_turn(self):
+        """Begin a new turn; spans recorded until end_turn() belong to it. Returns its number"""
+        with self._lock:
+            self._turn_count += 1
+            self._turn = self._open[self._turn_count] = {
+                "turn": self._turn_count,
+                "started": datetime.now().isoformat(),
+                "spans": {},
+                "_start": time.perf_counter()
+            }
+            return self._turn_count
+
+    def end_turn(self, number=None):
+        """Finish the given turn (default: the one started last) and hand it to the sinks"""
+        with self._lock:
+            if number is None:
+                number = self._turn["turn"] if self._turn is not None else None
+            turn = self._open.pop(number, None)
+            if turn is not None and turn is self._turn:
+                self._turn = None
+        if turn is None:
+            return None
+        turn["total_ms"] = round((time.perf_counter() - turn.pop("_start")) * 1000, 1)
+        for sink in self.sinks:
+            try:
+                sink(turn)
+            except Exception as e:
+                print(f"Warning: trace sink failed: {e}")
+        return turn
+
+    def record(self, stage, seconds):
+        """Record a duration for a stage (added to the current turn if any)"""
+        ms = round(seconds * 1000, 1)
+        with self._lock:
+            durations = self._durations.get(stage)
+            if durations is None:
+                durations = self._durations[stage] = deque(maxlen=self._history)
+            durations.append(ms)
+            number = getattr(self._local, "turn", _CURRENT)
+            turn = self._turn if number is _CURRENT else self._open.get(number)
+            if turn is not None:
+                spans = turn["spans"]
+                spans[stage] = round(spans.get(stage, 0) + ms, 1)
+
+    @contextmanager
+    def use_turn(self, number):
+        """Record spans from this thread into turn `number` (None: into no turn) within the block"""
+        previous = getattr(self._local, "turn", _CURRENT)
+        self._local.turn = number
+        try:
+            yield
+        finally:
+            self._local.turn = previous
+
+    @contextmanager
+    def span(self, stage):
+        """Time the enclosed block as one span of the given stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def timed_iter(self, stage, iterable):
+        """Yield from iterable, recording the total time spent waiting on it as one span"""
+        waited = 0.0
+        iterator = iter(iterable)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    waited += time.perf_counter() - start
+                yield item
+        finally:
+            self.record(stage, waited)
+
+    def summary(self):
+        """p50/p95/mean in ms for each stage seen so far"""
+        with self._lock:
+            snapshot = {stage: list(values) for stage, values in self._durations.items()}
+        ordered = [s for s in STAGES if s in snapshot] + sorted(s for s in snapshot if s not in STAGES)
+        return {
+            stage: {
+                "count": len(snapshot[stage]),
+                "p50_ms": percentile(snapshot[stage], 0.50),
+                "p95_ms": percentile(snapshot[stage], 0.95),
+                "mean_ms": round(sum(snapshot[stage]) / len(snapshot[stage]), 1)
+            }
+            for stage in ordered
+        }
+
+    def report(self):
+        """Human-readable per-stage latency table"""
+        lines = [f"{'stage':<12}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}"]
+        for stage, stats in self.summary().items():
+            lines.append(
+                f"{stage:<12}{stats['count']:>7}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['mean_ms']:>10.1f}"
+            )
+        return "\n".join(lines)
+
+
+def format_turn(turn):
+    """Compact one-line description of a turn, e.g. for a status bar"""
+    parts = [f"{STAGE_LABELS.get(stage, stage)} {ms:.0f}ms" for stage, ms in turn["spans"].items()]
+    return f"Last turn {turn['total_ms']:.0f}ms: " + " · ".join(parts)
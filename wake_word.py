@@ -0,0 +1,119 @@
+"""
+Local wake word spotting on raw microphone frames
+Full speech recognition only runs once the wake word has been heard
+"""
+
+import json
+import os
+
+import speech_recognition as sr
+
+from stt_backends import load_vosk_model, vosk
+from streaming_recognition import EnergyVAD
+
+
+class WakeWordDetector:
+    """
+    Keyword spotter fed with raw PCM frames.
+
+    start() is called before each listening period; accept() returns True on
+    the frame where the wake word is recognized.
+    """
+
+    def start(self, sample_rate, sample_width):
+        pass
+
+    def accept(self, frame):
+        raise NotImplementedError
+
+
+class VoskWakeWordDetector(WakeWordDetector):
+    """
+    Spots the wake word with Vosk restricted to a two-entry grammar (the wake
+    word or "[unk]"), which decodes far faster than open-vocabulary recognition.
+    """
+
+    def __init__(self, wake_word, model_path="model"):
+        self.wake_word = wake_word.lower()
+        self.model = load_vosk_model(model_path)
+        self._recognizer = None
+        self._sample_width = 2
+
+    def start(self, sample_rate, sample_width):
+        grammar = json.dumps([self.wake_word, "[unk]"])
+        self._recognizer = vosk.KaldiRecognizer(self.model, sample_rate, grammar)
+        self._sample_width = sample_width
+
+    def accept(self, frame):
+        data = sr.AudioData(frame, 16000, self._sample_width).get_raw_data(convert_width=2)
+        if self._recognizer.AcceptWaveform(data):
+            text = json.loads(self._recognizer.Result()).get("text", "")
+        else:
+            text = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        if self.wake_word in text.split():
+            self._recognizer.Reset()
+            return True
+        return False
+
+
+class WakeWordSpotter:
+    """
+    Reads the microphone until the detector fires.
+
+    Only frames the energy VAD marks as voiced (plus a short hangover so the
+    detector sees the end of each word) are handed to the detector; silence is
+    skipped entirely, so an idle kiosk costs almost no CPU.
+    """
+
+    def __init__(self, detector, hangover=0.3):
+        self.detector = detector
+        self.hangover = hangover
+        self.frames_read = 0
+        self.frames_scored = 0
+        self.detections = 0
+
+    def wait(self, source, energy_threshold, timeout=None):
+        """True once the wake word is heard, False if `timeout` seconds pass first"""
+        seconds_per_frame = source.CHUNK / source.SAMPLE_RATE
+        vad = EnergyVAD(energy_threshold)
+        self.detector.start(source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+
+        waited = 0.0
+        hangover = 0.0
+        while not timeout or waited < timeout:
+            frame = source.stream.read(source.CHUNK)
+            self.frames_read += 1
+            waited += seconds_per_frame
+
+            if vad.is_speech(frame, source.SAMPLE_WIDTH):
+                hangover = self.hangover
+            elif hangover > 0:
+                hangover -= seconds_per_frame
+            else:
+                continue
+
+            self.frames_scored += 1
+            if self.detector.accept(frame):
+                self.detections += 1
+                return True
+        return False
+
+    def stats(self):
+        return {
+            "frames_read": self.frames_read,
+            "frames_scored": self.frames_scored,
+            "detections": self.detections
+        }
+
+
+def create_wake_word_detector(wake_word, engine=None):
+    """
+    Build the detector selected by name or the WAKE_WORD_ENGINE environment
+    variable; returns None when wake word gating is not configured.
+    """
+    engine = (engine or os.getenv("WAKE_WORD_ENGINE") or "").lower()
+    if not engine:
+        return None
+    if engine == "vosk":
+        return VoskWakeWordDetector(wake_word, os.getenv("VOSK_MODEL_PATH", "model"))
+    raise ValueError(f"Unknown wake word engine '{engine}'. Choose: vosk")
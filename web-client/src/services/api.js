@@ -66,6 +66,89 @@ class APIService {
         }
     }
 
+    /**
+     * Send a chat message and receive the AI response as it is generated
+     * @param {string} message - User's message
+     * @param {Function} onChunk - Called with each partial text chunk
+     * @returns {Promise<Object>} Final response from AI
+     */
+    async streamMessage(message, onChunk) {
+        try {
+            const response = await fetch(`${this.baseURL}/api/chat/stream`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    message: message,
+                    conversation_id: this.conversationId
+                })
+            });
+
+            if (!response.ok) {
+                const data = await response.json().catch(() => ({}));
+                return {
+                    success: false,
+                    error: data.error || 'Server error occurred',
+                    details: data.details
+                };
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                // SSE events are separated by a blank line
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const block = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+
+                    const event = block.match(/^event: (.*)$/m)?.[1];
+                    const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] || '{}');
+
+                    if (data.conversation_id) {
+                        this.conversationId = data.conversation_id;
+                    }
+
+                    if (event === 'chunk') {
+                        onChunk?.(data.delta);
+                    } else if (event === 'done') {
+                        return {
+                            success: true,
+                            response: data.response,
+                            conversationId: data.conversation_id,
+                            model: data.model,
+                            timestamp: data.timestamp
+                        };
+                    } else if (event === 'error') {
+                        return {
+                            success: false,
+                            error: data.error,
+                            details: data.details
+                        };
+                    }
+                }
+            }
+
+            return {
+                success: false,
+                error: 'Stream ended unexpectedly'
+            };
+        } catch (error) {
+            console.error('API Error:', error);
+            return {
+                success: false,
+                error: 'Cannot connect to server. Please check if the backend is running.'
+            };
+        }
+    }
+
     /**
      * Reset the current conversation
      * @returns {Promise<boolean>} Success status